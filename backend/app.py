@@ -1,12 +1,23 @@
 # app.py
-from flask import Flask, request, jsonify, send_file
+from flask import Flask, request, jsonify, Response, stream_with_context
 from flask_cors import CORS
+from config import Config
 from modules.blockchain import BlockchainManager
 from modules.abe_crypto import ABEManager
 from modules.ipfs_storage import IPFSManager
 from modules.database import DatabaseManager
-from io import BytesIO
-from datetime import datetime
+from modules.sqlite_database import SQLiteDatabaseManager
+from modules.policy import compile_policy
+from modules.compression import CODEC_NAMES
+from modules.dedup import DedupStore, pack_manifest, unpack_manifest, sealed_size
+from modules.sweeper import ExpirySweeper
+from modules.access_log_writer import AccessLogWriter
+from modules.anchor import MerkleAnchor
+from modules.stats import parse_window
+from datetime import datetime, timedelta
+import atexit
+import itertools
+import json
 import time
 
 app = Flask(__name__)
@@ -15,15 +26,118 @@ CORS(app)
 # Initialize managers
 print("\n=== Initializing Backend Services ===\n")
 try:
-    blockchain = BlockchainManager()
-    abe = ABEManager()
-    ipfs = IPFSManager()
-    db = DatabaseManager()
+    blockchain = BlockchainManager(
+        tx_poll_interval=Config.TX_POLL_INTERVAL,
+        tx_timeout=Config.TX_TIMEOUT,
+        private_key=Config.BLOCKCHAIN_PRIVATE_KEY,
+        index_events=Config.EVENT_INDEX_ENABLED,
+        index_poll_interval=Config.EVENT_INDEX_POLL_INTERVAL,
+        index_start_block=Config.EVENT_INDEX_START_BLOCK,
+        index_confirmations=Config.EVENT_INDEX_CONFIRMATIONS,
+        view_cache_size=Config.VIEW_CACHE_SIZE,
+        view_cache_block_check=Config.VIEW_CACHE_BLOCK_CHECK
+    )
+    abe = ABEManager(
+        key_cache_size=Config.KEY_CACHE_SIZE,
+        key_cache_ttl=Config.KEY_CACHE_TTL,
+        workers=Config.ABE_WORKERS,
+        parallel_threshold=Config.ABE_PARALLEL_THRESHOLD,
+        pool=Config.ABE_POOL,
+        mode=Config.ABE_MODE,
+        key_path=Config.ABE_KEY_PATH,
+        compression=Config.ABE_COMPRESSION,
+        codec=Config.ABE_CODEC
+    )
+    ipfs = IPFSManager(
+        backend=Config.IPFS_BACKEND,
+        root=Config.BLOB_STORE_PATH,
+        host=Config.IPFS_HOST,
+        port=Config.IPFS_PORT,
+        pool_size=Config.IPFS_POOL_SIZE,
+        connect_timeout=Config.IPFS_CONNECT_TIMEOUT,
+        read_timeout=Config.IPFS_READ_TIMEOUT,
+        cache_bytes=Config.IPFS_CACHE_BYTES,
+        cache_object_bytes=Config.IPFS_CACHE_OBJECT_BYTES
+    )
+    if Config.DATABASE_BACKEND == 'sqlite':
+        db = SQLiteDatabaseManager(Config.SQLITE_PATH, pool_size=Config.SQLITE_POOL_SIZE)
+    else:
+        db = DatabaseManager()
+    if Config.DEDUP_ENABLED and not Config.DEDUP_SECRET:
+        raise ValueError("DEDUP_SECRET must be set when DEDUP_ENABLED is true")
+    # Always available so dedup files stay readable after DEDUP_ENABLED is turned off
+    dedup = DedupStore(
+        ipfs,
+        Config.DEDUP_SECRET,
+        min_size=Config.DEDUP_MIN_CHUNK,
+        avg_size=Config.DEDUP_AVG_CHUNK,
+        max_size=Config.DEDUP_MAX_CHUNK
+    )
+    sweeper = ExpirySweeper(
+        db,
+        ipfs,
+        dedup,
+        interval=Config.SWEEP_INTERVAL,
+        batch_size=Config.SWEEP_BATCH_SIZE,
+        budget_ms=Config.SWEEP_BUDGET_MS
+    )
+    # A persistent database outlives the process: rebuild expiries, blob and chunk references
+    for file_record in db.iter_file_records():
+        sweeper.track(file_record)
+        dedup.restore(file_record)
+    sweeper.start()
+    access_log = AccessLogWriter(
+        db,
+        batch_size=Config.ACCESS_LOG_BATCH_SIZE,
+        flush_interval=Config.ACCESS_LOG_FLUSH_INTERVAL,
+        max_queue=Config.ACCESS_LOG_QUEUE_SIZE
+    )
+    atexit.register(access_log.close)
+    anchor = MerkleAnchor(
+        db,
+        blockchain.anchor_root,
+        batch_size=Config.ANCHOR_BATCH_SIZE,
+        interval=Config.ANCHOR_INTERVAL,
+        anchored_fn=blockchain.is_anchored
+    )
+    # Records stored before a restart but never anchored go into the first batch
+    for file_record in db.iter_file_records():
+        if not file_record.get('anchor'):
+            anchor.add(file_record)
+    atexit.register(anchor.close)
     print("\n✅ All services initialized successfully!\n")
 except Exception as e:
     print(f"\n✗ Failed to initialize services: {e}\n")
     exit(1)
 
+def encrypted_chunks(header_data, payload_chunks):
+    """Ciphertext chunks for a file: separately stored header first, then the payload"""
+    if header_data is not None:
+        yield header_data
+    yield from payload_chunks
+
+def logged_download(chunks, event):
+    """
+    Yield a download's plaintext chunks and log the access when the stream ends:
+    'success' after the last chunk, 'failed' if fetching or decryption breaks
+    mid-stream, 'aborted' if the client goes away
+    """
+    status = 'failed'
+    try:
+        yield from chunks
+        status = 'success'
+    except GeneratorExit:
+        status = 'aborted'
+        raise
+    except Exception as e:
+        # Headers are already sent; all we can do is cut the response short and record it
+        print(f"❌ Download of {event['access_code']} failed mid-stream: {e}")
+        raise
+    finally:
+        if status != 'success':
+            event.pop('bytes', None)
+        access_log.log(dict(event, status=status, timestamp=datetime.now().isoformat()))
+
 # ============== Health Check ==============
 @app.route('/')
 def home():
@@ -36,6 +150,14 @@ def health():
 # ============== File Upload with Encryption ==============
 @app.route('/api/upload', methods=['POST'])
 def upload_file():
+    # Blobs this upload holds a sweeper reference on until its record takes them over
+    held = []
+    
+    def hold(store, *args):
+        ipfs_hash = sweeper.hold(store, *args)
+        held.append(ipfs_hash)
+        return ipfs_hash
+    
     try:
         print("\n" + "="*60)
         print("📁 FILE UPLOAD & ENCRYPTION PROCESS (BACKEND)")
@@ -58,37 +180,71 @@ def upload_file():
         print(f"🎯 Access Code: {access_code}")
         print(f"👥 User Role: {user_role}")
         
-        # Step 1: Read file data
+        # Steps 1-3: Read, encrypt and store in a single streaming pass
         print("\n[STEP 1] Reading file data...")
-        file_data = file.read()
-        print(f"✅ File read successfully: {len(file_data)} bytes")
-        
-        # Step 2: Encrypt file with ABE
         print("\n[STEP 2] Encrypting file with ABE...")
-        print(f"⏳ Using Attribute-Based Encryption")
-        
-        start_encryption = time.time()
+        parallel = abe.use_parallel(request.content_length)
+        chunk_size = abe.stream_chunk_size(parallel)
+        print(f"⏳ Using Attribute-Based Encryption (streamed in {chunk_size // 1024} KB chunks, parallel={parallel})")
         
         # FIX: Create policy that allows manager AND hr roles
         policy = {
             'role': ['manager', 'hr']
         }
         
-        encrypted_data = abe.encrypt(file_data, policy)
+        encryptor = abe.encryptor(policy, parallel=parallel, detached_header=True)
+        encryption_seconds = [0.0]
         
-        encryption_time = (time.time() - start_encryption) * 1000
-        print(f"✅ Encryption completed in {encryption_time:.2f}ms")
-        print(f"📦 Encrypted Size: {len(encrypted_data) / 1024 / 1024:.2f} MB")
+        def read_blocks():
+            while True:
+                chunk = file.stream.read(chunk_size)
+                if not chunk:
+                    break
+                yield chunk
+        
+        source = read_blocks()
+        storage = 'stream'
+        if Config.DEDUP_ENABLED:
+            # Chunks are sealed convergently and shared across files; only the manifest
+            # (which holds the chunk keys) goes through the ABE envelope
+            started = time.time()
+            manifest = dedup.put(source, store=lambda sealed: hold(ipfs.add, sealed))
+            encryption_seconds[0] += time.time() - started
+            source = [pack_manifest(manifest)]
+            storage = 'dedup'
+            print(f"✅ Dedup: {len(manifest['chunks'])} chunks, store ratio {dedup.stats()['dedup_ratio']}x")
+        
+        def payload_chunks():
+            for chunk in source:
+                started = time.time()
+                out = encryptor.update(chunk)
+                encryption_seconds[0] += time.time() - started
+                if out:
+                    yield out
+            started = time.time()
+            out = encryptor.finalize()
+            encryption_seconds[0] += time.time() - started
+            yield out
         
-        # Step 3: Store encrypted file in IPFS
         print("\n[STEP 3] Storing encrypted file in IPFS...")
         start_upload = time.time()
         
-        ipfs_hash = ipfs.add(encrypted_data)
-        
-        upload_time = (time.time() - start_upload) * 1000
+        # Payload streams straight into storage; the header is its own object so policy changes only rewrite it
+        ipfs_hash = hold(ipfs.add_stream, payload_chunks())
+        header_hash = hold(ipfs.add, encryptor.header)
+        original_size = manifest['size'] if storage == 'dedup' else encryptor.bytes_in
+        encrypted_size = encryptor.bytes_out
+        if storage == 'dedup':
+            encrypted_size += sealed_size(manifest)
+        
+        encryption_time = encryption_seconds[0] * 1000
+        upload_time = (time.time() - start_upload) * 1000 - encryption_time
+        print(f"✅ File read successfully: {original_size} bytes")
+        print(f"✅ Encryption completed in {encryption_time:.2f}ms")
+        print(f"📦 Encrypted Size: {encrypted_size / 1024 / 1024:.2f} MB")
         print(f"✅ File stored in IPFS in {upload_time:.2f}ms")
         print(f"🔗 IPFS Hash: {ipfs_hash}")
+        print(f"🔗 Header Hash: {header_hash}")
         
         # Step 4: Record on blockchain
         print("\n[STEP 4] Recording metadata on blockchain...")
@@ -98,7 +254,7 @@ def upload_file():
             user_id=user_id,
             file_name=file.filename,
             ipfs_hash=ipfs_hash,
-            file_size=len(encrypted_data),
+            file_size=encrypted_size,
             access_code=access_code
         )
         
@@ -108,16 +264,31 @@ def upload_file():
         
         # Step 5: Store metadata in database
         print("\n[STEP 5] Storing metadata in database...")
+        expires_at = (datetime.now() + timedelta(days=Config.FILE_TTL_DAYS)).isoformat()
         db_result = db.insert_file_record({
             'user_id': user_id,
             'file_name': file.filename,
             'ipfs_hash': ipfs_hash,
+            'header_hash': header_hash,
             'access_code': access_code,
-            'file_size': len(encrypted_data),
+            'file_size': encrypted_size,
+            'original_size': original_size,
             'tx_hash': tx_hash,
             'encryption_type': 'ABE',
+            'compression': CODEC_NAMES[encryptor.codec],
+            'storage': storage,
+            'chunks': [entry[0] for entry in manifest['chunks']] if storage == 'dedup' else [],
+            'chunk_sizes': [entry[2] for entry in manifest['chunks']] if storage == 'dedup' else [],
+            'expires_at': expires_at,
             'policy': policy
         })
+        sweeper.track(db_result, held=True)
+        held.clear()
+        anchor.add(db_result)
+        db.stats.observe('upload.encrypt', encryption_time)
+        db.stats.observe('upload.store', upload_time)
+        db.stats.observe('upload.blockchain', blockchain_time)
+        db.stats.observe('upload.total', encryption_time + upload_time + blockchain_time)
         print(f"✅ Metadata stored in database")
         print(f"📊 Record ID: {db_result.get('id', 'N/A')}")
         
@@ -127,11 +298,13 @@ def upload_file():
         print("="*60)
         print(f"\n📊 Summary:")
         print(f"   ├─ File: {file.filename}")
-        print(f"   ├─ Original Size: {len(file_data) / 1024 / 1024:.2f} MB")
-        print(f"   ├─ Encrypted Size: {len(encrypted_data) / 1024 / 1024:.2f} MB")
+        print(f"   ├─ Original Size: {original_size / 1024 / 1024:.2f} MB")
+        print(f"   ├─ Encrypted Size: {encrypted_size / 1024 / 1024:.2f} MB")
         print(f"   ├─ Access Code: {access_code}")
+        print(f"   ├─ Expires At: {expires_at}")
         print(f"   ├─ Policy: {policy}")
         print(f"   ├─ Encryption: ABE (Attribute-Based)")
+        print(f"   ├─ Compression: {CODEC_NAMES[encryptor.codec]}")
         print(f"   ├─ Encryption Time: {encryption_time:.2f}ms")
         print(f"   ├─ Upload Time: {upload_time:.2f}ms")
         print(f"   ├─ Blockchain Time: {blockchain_time:.2f}ms")
@@ -143,12 +316,15 @@ def upload_file():
             "success": True,
             "access_code": access_code,
             "ipfs_hash": ipfs_hash,
+            "header_hash": header_hash,
             "tx_hash": tx_hash,
-            "file_size": len(encrypted_data),
+            "file_size": encrypted_size,
+            "expires_at": expires_at,
             "policy": policy
         }), 200
         
     except Exception as e:
+        sweeper.release(held)
         print(f"\n❌ UPLOAD ERROR: {str(e)}")
         print("="*60 + "\n")
         return jsonify({"error": str(e)}), 500
@@ -176,6 +352,11 @@ def download_file(access_code):
             print(f"❌ Access code not found: {access_code}")
             return jsonify({"error": "Invalid access code"}), 404
         
+        # The sweeper removes expired records in the background; don't serve them meanwhile
+        if file_record.get('expires_at') and datetime.fromisoformat(file_record['expires_at']) <= datetime.now():
+            print(f"❌ File share expired at {file_record['expires_at']}")
+            return jsonify({"error": "File share has expired"}), 410
+        
         print(f"✅ Access code verified")
         print(f"📄 File: {file_record['file_name']}")
         print(f"🔗 IPFS Hash: {file_record['ipfs_hash']}")
@@ -184,11 +365,24 @@ def download_file(access_code):
         print("\n[STEP 2] Retrieving encrypted file from IPFS...")
         start_download = time.time()
         
-        encrypted_data = ipfs.get(file_record['ipfs_hash'])
+        encrypted_size = file_record.get('file_size', 0)
+        parallel = abe.use_parallel(encrypted_size)
+        chunk_size = abe.stream_chunk_size(parallel)
+        
+        # The payload is streamed from IPFS as the response is sent, never held whole.
+        # Its first chunk is fetched now, so a missing or unreachable payload fails
+        # here with an error status rather than after a 200 has gone out
+        payload_chunks = ipfs.cat(file_record['ipfs_hash'], chunk_size)
+        first_chunk = next(payload_chunks, b"")
+        payload_chunks = itertools.chain([first_chunk], payload_chunks)
+        # Files uploaded before header/payload separation have no header_hash;
+        # their header sits at the front of the payload, well inside the first chunk
+        header_data = ipfs.get(file_record['header_hash']) if file_record.get('header_hash') else None
+        header_head = first_chunk if header_data is None else header_data
         
         download_time = (time.time() - start_download) * 1000
-        print(f"✅ File retrieved from IPFS in {download_time:.2f}ms")
-        print(f"📦 Encrypted Size: {len(encrypted_data) / 1024 / 1024:.2f} MB")
+        print(f"✅ File stream opened from IPFS in {download_time:.2f}ms")
+        print(f"📦 Encrypted Size: {encrypted_size / 1024 / 1024:.2f} MB")
         
         # Step 3: Verify access policy on blockchain
         print("\n[STEP 3] Verifying access policy on blockchain...")
@@ -220,15 +414,22 @@ def download_file(access_code):
                 user_attributes = {'role': 'manager'}  # Default to manager for owner
                 access_verified = True
         
-        # Also allow if user has the required role from the policy
-        elif not access_verified and user_attributes.get('role') in file_record.get('policy', {}).get('role', []):
-            print(f"✅ User role matches policy requirement")
+        # Also allow if user attributes satisfy the file's policy
+        elif not access_verified and compile_policy(file_record.get('policy', {})).evaluate(user_attributes):
+            print(f"✅ User attributes satisfy policy requirement")
             access_verified = True
         
         if not access_verified:
             print(f"❌ Access denied for user: {user_id}")
-            print(f"   Required roles: {file_record.get('policy', {}).get('role', [])}")
+            print(f"   Required policy: {file_record.get('policy', {})}")
             print(f"   User role: {user_attributes.get('role', 'user')}")
+            access_log.log({
+                'user_id': user_id,
+                'access_code': access_code,
+                'file_name': file_record['file_name'],
+                'status': 'denied',
+                'timestamp': datetime.now().isoformat()
+            })
             return jsonify({"error": "Access denied"}), 403
         
         print(f"✅ Access policy verified")
@@ -239,53 +440,58 @@ def download_file(access_code):
         
         start_decryption = time.time()
         
-        try:
-            decrypted_data = abe.decrypt(encrypted_data, user_attributes)
-        except Exception as decrypt_error:
-            print(f"⚠️ Decryption with user attributes failed: {decrypt_error}")
-            print(f"   Attempting with policy roles...")
-            
-            # Fallback: try decrypting with each role from the policy
-            policy_roles = file_record.get('policy', {}).get('role', ['manager'])
-            decrypted_data = None
-            
-            for role in policy_roles:
-                try:
-                    fallback_attributes = {'role': role}
-                    print(f"   Trying role: {role}")
-                    decrypted_data = abe.decrypt(encrypted_data, fallback_attributes)
-                    print(f"   ✅ Decryption successful with role: {role}")
-                    break
-                except Exception as e:
-                    print(f"   ✗ Failed with role {role}: {e}")
-                    continue
-            
-            if decrypted_data is None:
-                raise Exception("Could not decrypt file with any available role")
+        # Resolve which attribute set satisfies the header policy before touching the ciphertext:
+        # the requester's own attributes first, then each role listed in the file's policy
+        policy_roles = []
+        if isinstance(file_record.get('policy'), dict):
+            policy_roles = file_record['policy'].get('role', ['manager'])
+            policy_roles = policy_roles if isinstance(policy_roles, list) else [policy_roles]
+        candidates = [user_attributes] + [{'role': role} for role in policy_roles]
+        
+        decrypt_attributes = abe.resolve_attributes(header_head, candidates)
+        if decrypt_attributes is None:
+            raise Exception("Could not decrypt file with any available role")
+        if decrypt_attributes is not user_attributes:
+            print(f"⚠️ User attributes do not satisfy the header policy; using role: {decrypt_attributes['role']}")
+        
+        # Exactly one decryption pass; segments are decrypted as the response streams
+        decrypted_chunks = abe.decrypt_stream(
+            encrypted_chunks(header_data, payload_chunks), decrypt_attributes, parallel
+        )
+        
+        if file_record.get('storage') == 'dedup':
+            # The envelope holds the chunk manifest; chunks are fetched and opened as the response streams
+            manifest = unpack_manifest(b"".join(decrypted_chunks))
+            decrypted_chunks = dedup.get(manifest)
+        
+        # Likewise open the first segment before responding: a corrupt start is a 500, not a truncated 200
+        first_plain = next(decrypted_chunks, None)
+        if first_plain is not None:
+            decrypted_chunks = itertools.chain([first_plain], decrypted_chunks)
         
         decryption_time = (time.time() - start_decryption) * 1000
-        print(f"✅ Decryption completed in {decryption_time:.2f}ms")
-        print(f"📦 Decrypted Size: {len(decrypted_data) / 1024 / 1024:.2f} MB")
+        print(f"✅ Decryption started in {decryption_time:.2f}ms (streaming {chunk_size // 1024} KB chunks, parallel={parallel})")
         
         # Step 5: Log access event
         print("\n[STEP 5] Logging access event...")
-        db.log_access({
+        # Logged once the stream has ended, with how it ended
+        decrypted_chunks = logged_download(decrypted_chunks, {
             'user_id': user_id,
             'access_code': access_code,
             'file_name': file_record['file_name'],
-            'status': 'success',
-            'timestamp': datetime.now().isoformat()
+            'bytes': file_record.get('original_size', encrypted_size)
         })
-        print(f"✅ Access logged to database")
+        db.stats.observe('download.fetch', download_time)
+        db.stats.observe('download.decrypt', decryption_time)
+        print(f"✅ Access event will be queued when the transfer ends")
         
         # Summary
         print("\n" + "="*60)
-        print("✅ FILE DOWNLOAD COMPLETED SUCCESSFULLY")
+        print("✅ FILE DOWNLOAD STARTED SUCCESSFULLY")
         print("="*60)
         print(f"\n📊 Summary:")
         print(f"   ├─ File: {file_record['file_name']}")
-        print(f"   ├─ Encrypted Size: {len(encrypted_data) / 1024 / 1024:.2f} MB")
-        print(f"   ├─ Decrypted Size: {len(decrypted_data) / 1024 / 1024:.2f} MB")
+        print(f"   ├─ Encrypted Size: {encrypted_size / 1024 / 1024:.2f} MB")
         print(f"   ├─ Access Code: {access_code}")
         print(f"   ├─ User ID: {user_id}")
         print(f"   ├─ User Role: {user_attributes.get('role', 'user')}")
@@ -295,22 +501,67 @@ def download_file(access_code):
         print(f"   ├─ Decryption Time: {decryption_time:.2f}ms")
         print(f"   └─ Total Time: {(download_time + decryption_time):.2f}ms\n")
         
-        return send_file(
-            BytesIO(decrypted_data),
-            as_attachment=True,
-            download_name=file_record['file_name'],
-            mimetype='application/octet-stream'
-        ), 200
+        response = Response(stream_with_context(decrypted_chunks), mimetype='application/octet-stream')
+        response.headers.set('Content-Disposition', 'attachment', filename=file_record['file_name'])
+        return response, 200
         
     except PermissionError as pe:
         print(f"\n❌ PERMISSION ERROR: {str(pe)}")
         print("="*60 + "\n")
         return jsonify({"error": str(pe)}), 403
+    except FileNotFoundError as nf:
+        print(f"\n❌ STORED DATA MISSING: {str(nf)}")
+        print("="*60 + "\n")
+        return jsonify({"error": str(nf)}), 404
     except Exception as e:
         print(f"\n❌ DOWNLOAD ERROR: {str(e)}")
         print("="*60 + "\n")
         return jsonify({"error": str(e)}), 500
 
+# ============== Policy Rewrap ==============
+@app.route('/api/policy/<access_code>', methods=['POST'])
+def update_policy(access_code):
+    """Change who can read a file by rewriting only its envelope header"""
+    try:
+        user_id = request.json.get('user_id')
+        new_policy = request.json.get('policy')
+        
+        if not user_id or new_policy is None:
+            return jsonify({"error": "Missing required fields"}), 400
+        
+        file_record = db.get_file_by_access_code(access_code)
+        if not file_record:
+            return jsonify({"error": "Invalid access code"}), 404
+        if user_id != file_record.get('user_id'):
+            return jsonify({"error": "Only the file owner can change its policy"}), 403
+        if not file_record.get('header_hash'):
+            return jsonify({"error": "File predates header rewrap support; re-upload to change its policy"}), 409
+        
+        start_rewrap = time.time()
+        old_header_hash = file_record['header_hash']
+        new_header = abe.rewrap(ipfs.get(old_header_hash), new_policy)
+        # Swaps the header and drops the old one's reference (or the new one's, if the swap fails)
+        header_hash = sweeper.rewrap(access_code, ipfs.add, new_header, {'policy': new_policy})
+        if header_hash is None:
+            return jsonify({"error": "Invalid access code"}), 404
+        rewrap_time = (time.time() - start_rewrap) * 1000
+        
+        print(f"✅ Policy for {access_code} rewrapped in {rewrap_time:.2f}ms ({len(new_header)} byte header)")
+        
+        return jsonify({
+            "success": True,
+            "access_code": access_code,
+            "ipfs_hash": file_record['ipfs_hash'],
+            "header_hash": header_hash,
+            "policy": new_policy
+        }), 200
+    except FileNotFoundError as nf:
+        return jsonify({"error": str(nf)}), 404
+    except ValueError as ve:
+        return jsonify({"error": str(ve)}), 400
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
 # ============== User Management ==============
 @app.route('/api/register', methods=['POST'])
 def register_user():
@@ -318,6 +569,11 @@ def register_user():
         data = request.json
         user_id = blockchain.register_user(data['username'], data.get('attributes', {}))
         db.insert_user(user_id, data)
+        # Derive attribute keys off the request path so later requests hit the cache
+        try:
+            abe.warm_user_keys(data.get('attributes', {}))
+        except Exception as e:
+            print(f"⚠️ Key warm-up skipped: {e}")
         return jsonify({"user_id": user_id, "status": "registered"}), 201
     except Exception as e:
         return jsonify({"error": str(e)}), 500
@@ -331,31 +587,114 @@ def get_user(user_id):
         return jsonify({"error": str(e)}), 500
 
 # ============== File Listing ==============
+def page_args():
+    """(limit, after) from ?limit=&after=; raises ValueError on bad values"""
+    limit = int(request.args.get('limit', Config.LIST_PAGE_SIZE))
+    if not 1 <= limit <= Config.LIST_PAGE_MAX:
+        raise ValueError(f"limit must be between 1 and {Config.LIST_PAGE_MAX}")
+    after = request.args.get('after')
+    return limit, (int(after) if after not in (None, '') else None)
+
+def listing_response(key, fetch_page, limit, after):
+    """
+    One page as {key: [...], "next_cursor": ...}, or with ?format=ndjson every
+    page from the cursor on, streamed one record per line as pages are read
+    """
+    if request.args.get('format') != 'ndjson':
+        items, next_cursor = fetch_page(after, limit)
+        return jsonify({key: items, "next_cursor": next_cursor}), 200
+    
+    def lines():
+        cursor = after
+        while True:
+            items, cursor = fetch_page(cursor, limit)
+            for item in items:
+                yield json.dumps(item) + "\n"
+            if cursor is None:
+                return
+    
+    return Response(stream_with_context(lines()), mimetype='application/x-ndjson')
+
 @app.route('/api/files/<user_id>', methods=['GET'])
 def list_user_files(user_id):
+    """Files uploaded by user_id, oldest first (?limit=, ?after=<next_cursor>, ?format=ndjson)"""
     try:
-        files = db.get_user_files(user_id)
-        return jsonify({"files": files}), 200
+        try:
+            limit, after = page_args()
+        except ValueError as ve:
+            return jsonify({"error": str(ve)}), 400
+        return listing_response(
+            "files", lambda cursor, size: db.get_user_files_page(user_id, cursor, size), limit, after)
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
 # ============== Access Logs ==============
 @app.route('/api/logs/<access_code>', methods=['GET'])
 def get_access_logs(access_code):
+    """Access logs for a file, oldest first (?limit=, ?after=<next_cursor>, ?format=ndjson)"""
     try:
-        logs = db.get_access_logs(access_code)
-        return jsonify({"logs": logs}), 200
+        try:
+            limit, after = page_args()
+        except ValueError as ve:
+            return jsonify({"error": str(ve)}), 400
+        return listing_response(
+            "logs", lambda cursor, size: access_log.get_access_logs_page(access_code, cursor, size), limit, after)
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+# ============== Anchoring ==============
+@app.route('/api/verify/<access_code>', methods=['GET'])
+def verify_anchor(access_code):
+    """Check a file record against its Merkle inclusion proof, the root on chain and the anchoring transaction"""
+    try:
+        file_record = db.get_file_by_access_code(access_code)
+        if not file_record:
+            return jsonify({"error": "File not found"}), 404
+        result = MerkleAnchor.verify(file_record)
+        if not result['anchored']:
+            # Still waiting for its batch
+            return jsonify(result), 202
+        # A valid proof only counts if its root really is on chain and the anchor didn't fail
+        result['on_chain'] = blockchain.is_anchored(result['root'])
+        if result['tx_hash']:
+            result['tx'] = blockchain.transaction_status(result['tx_hash'])
+        tx_failed = result.get('tx', {}).get('status') == 'failed'
+        result['verified'] = result['verified'] and result['on_chain'] and not tx_failed
+        return jsonify(result), 200
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+# ============== Transactions ==============
+@app.route('/api/tx/<tx_hash>', methods=['GET'])
+def get_transaction_status(tx_hash):
+    """Whether an on-chain write sent by this server is pending, confirmed or failed"""
+    try:
+        return jsonify(blockchain.transaction_status(tx_hash)), 200
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
 # ============== Statistics ==============
 @app.route('/api/stats', methods=['GET'])
 def get_statistics():
+    """Totals and a rolled-up window (?window=15m, 1h, 24h, 7d; default 1h), all served from memory"""
     try:
+        try:
+            window = db.stats.window(parse_window(request.args.get('window', '1h')))
+        except ValueError as ve:
+            return jsonify({"error": str(ve)}), 400
         stats = {
             "total_files": db.get_total_files(),
             "total_users": db.get_total_users(),
-            "total_access_logs": db.get_total_access_logs()
+            "total_access_logs": access_log.get_total_access_logs(),
+            "dedup": dedup.stats(),
+            "ipfs_cache": ipfs.cache.stats() if ipfs.cache is not None else None,
+            "sweeper": sweeper.stats(),
+            "anchor": anchor.stats(),
+            "event_index": blockchain.index_stats(),
+            "view_cache": blockchain.view_cache_stats(),
+            "access_log": access_log.stats(),
+            "totals": db.stats.snapshot(),
+            "window": window
         }
         return jsonify(stats), 200
     except Exception as e:
@@ -365,4 +704,4 @@ if __name__ == '__main__':
     print("\n" + "="*50)
     print("🚀 Starting File Sharing Backend Server")
     print("="*50 + "\n")
-    app.run(host='0.0.0.0', port=5000, debug=True)
+    app.run(host='0.0.0.0', port=5000, debug=True, threaded=True)
@@ -0,0 +1,72 @@
+# bench_ipfs_http.py - IPFS add/cat throughput through the pooled HTTP client
+#
+#   python bench_ipfs_http.py                      # offline, against the in-process stand-in
+#   python bench_ipfs_http.py --port 5001 --host ipfs   # against a real kubo daemon
+#
+# Compares a fresh connection per request with the shared keep-alive pool.
+
+import argparse
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.append('/app')
+
+from modules.ipfs_http import IPFSHTTPClient
+from modules.ipfs_standin import StandInIPFSServer
+
+
+def run(make_client, blobs, concurrency):
+    clients = []
+
+    def roundtrip(blob):
+        client = make_client()
+        clients.append(client)
+        cid = client.add(blob)
+        assert len(client.get(cid)) == len(blob)
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        list(pool.map(roundtrip, blobs))
+    elapsed = time.perf_counter() - start
+    for client in set(clients):
+        client.close()
+    return elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description='IPFS HTTP client add/cat benchmark')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=None, help='daemon port (default: start the stand-in)')
+    parser.add_argument('--count', type=int, default=200)
+    parser.add_argument('--size-kb', type=int, default=64)
+    parser.add_argument('--concurrency', type=int, default=8)
+    args = parser.parse_args()
+
+    server = None
+    port = args.port
+    if port is None:
+        server = StandInIPFSServer().start()
+        port = server.port
+
+    blobs = [os.urandom(args.size_kb * 1024) for _ in range(args.count)]
+    total_mb = 2 * args.count * args.size_kb / 1024
+
+    print(f"\n=== IPFS HTTP benchmark ({args.count} x {args.size_kb} KB, {args.concurrency} threads) ===\n")
+    pooled = IPFSHTTPClient(args.host, port, pool_size=args.concurrency)
+    for label, make_client in [
+        ('new connection per request', lambda: IPFSHTTPClient(args.host, port, pool_size=1)),
+        ('shared keep-alive pool', lambda: pooled),
+    ]:
+        elapsed = run(make_client, blobs, args.concurrency)
+        print(f"{label:>28}: {elapsed * 1000:9.1f} ms  {args.count * 2 / elapsed:8.0f} req/s  {total_mb / elapsed:7.1f} MB/s")
+
+    if server is not None:
+        server.stop()
+    print()
+    return 0
+
+
+if __name__ == '__main__':
+    exit(main())
@@ -0,0 +1,68 @@
+# bench_parallel_crypto.py - Throughput of segment-parallel ABE encryption, 1..N workers
+#
+#   python bench_parallel_crypto.py --size-mb 256 --max-workers 8 --pool thread
+#
+# Each row encrypts and decrypts the same buffer; speedup is relative to 1 worker.
+
+import argparse
+import contextlib
+import io
+import os
+import sys
+import time
+
+sys.path.append('/app')
+
+from modules.abe_crypto import ABEManager
+
+
+def run(abe, data, policy, attributes, repeats):
+    best_enc = best_dec = float('inf')
+    for _ in range(repeats):
+        with contextlib.redirect_stdout(io.StringIO()):
+            start = time.perf_counter()
+            blob = abe.encrypt(data, policy)
+            best_enc = min(best_enc, time.perf_counter() - start)
+
+            start = time.perf_counter()
+            plain = abe.decrypt(blob, attributes)
+            best_dec = min(best_dec, time.perf_counter() - start)
+    assert len(plain) == len(data)
+    return best_enc, best_dec
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Segment-parallel ABE throughput')
+    parser.add_argument('--size-mb', type=int, default=256)
+    parser.add_argument('--max-workers', type=int, default=os.cpu_count() or 1)
+    parser.add_argument('--pool', choices=['thread', 'process'], default='thread')
+    parser.add_argument('--repeats', type=int, default=3)
+    args = parser.parse_args()
+
+    size = args.size_mb * 1024 * 1024
+    data = os.urandom(size)
+    policy = {'role': ['manager', 'hr']}
+    attributes = {'role': 'manager'}
+
+    print(f"\n=== Parallel ABE benchmark: {args.size_mb} MB, {args.pool} pool, {os.cpu_count()} CPUs ===\n")
+    print(f"{'workers':>8} {'encrypt MB/s':>14} {'decrypt MB/s':>14} {'speedup':>9}")
+
+    counts = sorted({2 ** i for i in range(args.max_workers.bit_length())} | {args.max_workers})
+    baseline = None
+    for workers in counts:
+        with contextlib.redirect_stdout(io.StringIO()):
+            abe = ABEManager(workers=workers, parallel_threshold=0, pool=args.pool)
+        enc, dec = run(abe, data, policy, attributes, args.repeats)
+        enc_rate = args.size_mb / enc
+        dec_rate = args.size_mb / dec
+        if baseline is None:
+            baseline = enc_rate + dec_rate
+        print(f"{workers:>8} {enc_rate:>14.1f} {dec_rate:>14.1f} {(enc_rate + dec_rate) / baseline:>8.2f}x")
+        if abe.segment_pool is not None:
+            abe.segment_pool.shutdown()
+
+    print()
+
+
+if __name__ == '__main__':
+    main()
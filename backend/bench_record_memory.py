@@ -0,0 +1,99 @@
+# bench_record_memory.py - Memory held per file record and access-log row
+#
+#   python bench_record_memory.py
+#   python bench_record_memory.py --files 100000 --logs 1000000
+#
+# Compares plain dicts (how DatabaseManager used to store rows) with the
+# __slots__ file records and columnar access log in modules/records.py.
+
+import argparse
+import sys
+import tracemalloc
+from datetime import datetime, timedelta
+
+sys.path.append('/app')
+
+from modules.records import FileRecord, AccessLogTable
+
+
+def make_file(i, start):
+    return {
+        'id': i,
+        'user_id': f'user{i % 500}',
+        'file_name': f'report-{i}.pdf',
+        'ipfs_hash': f'{i:064x}',
+        'header_hash': f'{i + 1:064x}',
+        'access_code': f'AC{i:08d}',
+        'file_size': 1048576 + i,
+        'original_size': 1048000 + i,
+        'tx_hash': f'0x{i:064x}',
+        'encryption_type': 'ABE',
+        'compression': 'zstd',
+        'storage': 'stream',
+        'chunks': [],
+        'expires_at': (start + timedelta(days=7, seconds=i)).isoformat(),
+        'policy': 'role:hr or role:admin',
+        'created_at': (start + timedelta(seconds=i)).isoformat()
+    }
+
+
+def make_log(i, start):
+    success = i % 10 != 0
+    event = {
+        'user_id': f'user{i % 500}',
+        'access_code': f'AC{i % 20000:08d}',
+        'file_name': f'report-{i % 20000}.pdf',
+        'status': 'success' if success else 'denied',
+        'timestamp': (start + timedelta(seconds=i, microseconds=i % 999983)).isoformat(),
+        'logged_at': (start + timedelta(seconds=i, microseconds=i % 999983 + 40)).isoformat()
+    }
+    if success:
+        event['bytes'] = 1048000 + i % 20000
+    return event
+
+
+def measure(build):
+    """Bytes still allocated once build() has returned its result"""
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    result = build()
+    after = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return after - before, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Record storage memory benchmark')
+    parser.add_argument('--files', type=int, default=20000)
+    parser.add_argument('--logs', type=int, default=200000)
+    args = parser.parse_args()
+    start = datetime.now()
+
+    print(f"\n=== Record memory ({args.files} file records, {args.logs} access logs) ===\n")
+    for label, count, make, compact in [
+        ('file records', args.files, make_file, lambda rows: [FileRecord(row) for row in rows]),
+        ('access logs', args.logs, make_log, None),
+    ]:
+        # Rows are built fresh for each layout, and the source dicts dropped for the compact one,
+        # so each measurement only counts what the store itself keeps alive
+        dict_bytes, rows = measure(lambda: [make(i, start) for i in range(count)])
+        del rows
+
+        def build_compact():
+            if compact is not None:
+                return compact(make(i, start) for i in range(count))
+            table = AccessLogTable()
+            for i in range(count):
+                table.append(make(i, start))
+            return table
+
+        compact_bytes, store = measure(build_compact)
+        del store
+        print(f"{label:>13}: dict {dict_bytes / count:7.1f} B/row   compact {compact_bytes / count:7.1f} B/row"
+              f"   ({dict_bytes / max(compact_bytes, 1):.1f}x smaller)")
+    print()
+    return 0
+
+
+if __name__ == '__main__':
+    exit(main())
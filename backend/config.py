@@ -10,11 +10,87 @@ class Config:
     DATABASE_USER = os.getenv('DATABASE_USER', 'root')
     DATABASE_PASSWORD = os.getenv('DATABASE_PASSWORD', 'password123')
     DATABASE_NAME = os.getenv('DATABASE_NAME', 'file_sharing_db')
+    # 'memory' (stub, lost on restart) or 'sqlite' (WAL-mode file at SQLITE_PATH)
+    DATABASE_BACKEND = os.getenv('DATABASE_BACKEND', 'memory')
+    SQLITE_PATH = os.getenv('SQLITE_PATH', 'data/metadata.db')
+    # Connections shared by all request threads; extra requests wait for a free one
+    SQLITE_POOL_SIZE = int(os.getenv('SQLITE_POOL_SIZE', '8'))
     
     # Blockchain settings
     GANACHE_URL = os.getenv('GANACHE_URL', 'http://ganache:8545')
     CONTRACT_ADDRESS = os.getenv('CONTRACT_ADDRESS', '')
     
+    # On-chain writes are sent without waiting for a block; a poller tracks their receipts.
+    # Leave the key empty to have Ganache sign with its unlocked default account
+    BLOCKCHAIN_PRIVATE_KEY = os.getenv('BLOCKCHAIN_PRIVATE_KEY', '')
+    TX_POLL_INTERVAL = float(os.getenv('TX_POLL_INTERVAL', '0.5'))
+    TX_TIMEOUT = float(os.getenv('TX_TIMEOUT', '120'))
+    # Uploads are anchored on chain as Merkle roots, one transaction per batch
+    ANCHOR_BATCH_SIZE = int(os.getenv('ANCHOR_BATCH_SIZE', '256'))
+    ANCHOR_INTERVAL = float(os.getenv('ANCHOR_INTERVAL', '10'))
+    # Contract events are indexed locally so metadata reads skip the node
+    EVENT_INDEX_ENABLED = os.getenv('EVENT_INDEX_ENABLED', 'true').lower() == 'true'
+    EVENT_INDEX_POLL_INTERVAL = float(os.getenv('EVENT_INDEX_POLL_INTERVAL', '1.0'))
+    EVENT_INDEX_START_BLOCK = int(os.getenv('EVENT_INDEX_START_BLOCK', '0'))
+    EVENT_INDEX_CONFIRMATIONS = int(os.getenv('EVENT_INDEX_CONFIRMATIONS', '0'))
+    # Remaining contract view calls are cached until the next block (0 disables)
+    VIEW_CACHE_SIZE = int(os.getenv('VIEW_CACHE_SIZE', '10000'))
+    VIEW_CACHE_BLOCK_CHECK = float(os.getenv('VIEW_CACHE_BLOCK_CHECK', '0.5'))
+    
     # IPFS settings
     IPFS_HOST = os.getenv('IPFS_HOST', 'ipfs')
     IPFS_PORT = int(os.getenv('IPFS_PORT', '5001'))
+    # 'memory' (stub dict), 'disk' (content-addressed files under BLOB_STORE_PATH)
+    # or 'http' (kubo daemon at IPFS_HOST:IPFS_PORT)
+    IPFS_BACKEND = os.getenv('IPFS_BACKEND', 'memory')
+    BLOB_STORE_PATH = os.getenv('BLOB_STORE_PATH', 'data/blobs')
+    # Max concurrent requests to the daemon (keep-alive connections in the pool)
+    IPFS_POOL_SIZE = int(os.getenv('IPFS_POOL_SIZE', '10'))
+    IPFS_CONNECT_TIMEOUT = float(os.getenv('IPFS_CONNECT_TIMEOUT', '5'))
+    IPFS_READ_TIMEOUT = float(os.getenv('IPFS_READ_TIMEOUT', '60'))
+    # Read-through cache for the http backend, bounded by total bytes (0 disables it)
+    IPFS_CACHE_BYTES = int(os.getenv('IPFS_CACHE_BYTES', str(256 * 1024 * 1024)))
+    IPFS_CACHE_OBJECT_BYTES = int(os.getenv('IPFS_CACHE_OBJECT_BYTES', str(64 * 1024 * 1024)))
+    
+    # ABE key derivation cache
+    KEY_CACHE_SIZE = int(os.getenv('KEY_CACHE_SIZE', '1024'))
+    KEY_CACHE_TTL = int(os.getenv('KEY_CACHE_TTL', '3600'))
+    
+    # Segment-parallel encryption ('thread' or 'process' pool)
+    ABE_WORKERS = int(os.getenv('ABE_WORKERS', str(min(4, os.cpu_count() or 1))))
+    ABE_PARALLEL_THRESHOLD = int(os.getenv('ABE_PARALLEL_THRESHOLD', str(8 * 1024 * 1024)))
+    ABE_POOL = os.getenv('ABE_POOL', 'thread')
+    
+    # 'symmetric' (raw data key in header) or 'hybrid' (CP-ABE-wrapped data key, needs Charm)
+    ABE_MODE = os.getenv('ABE_MODE', 'symmetric')
+    # CP-ABE public + master key, created on first start; hybrid blobs need it to decrypt
+    ABE_KEY_PATH = os.getenv('ABE_KEY_PATH', 'data/cpabe_keys')
+    
+    # Compression ahead of encryption: 'auto' samples the first block, 'off' disables it
+    ABE_COMPRESSION = os.getenv('ABE_COMPRESSION', 'auto')
+    ABE_CODEC = os.getenv('ABE_CODEC', 'zstd')
+    
+    # Opt-in cross-file dedup: FastCDC chunks sealed with content-derived keys
+    DEDUP_ENABLED = os.getenv('DEDUP_ENABLED', 'false').lower() == 'true'
+    # Keys every convergent chunk key; must be identical on all nodes and never change.
+    # No default: a known secret would make chunk keys guessable. Required with DEDUP_ENABLED
+    DEDUP_SECRET = os.getenv('DEDUP_SECRET', '')
+    DEDUP_MIN_CHUNK = int(os.getenv('DEDUP_MIN_CHUNK', str(16 * 1024)))
+    DEDUP_AVG_CHUNK = int(os.getenv('DEDUP_AVG_CHUNK', str(64 * 1024)))
+    DEDUP_MAX_CHUNK = int(os.getenv('DEDUP_MAX_CHUNK', str(256 * 1024)))
+    
+    # File shares expire after FILE_TTL_DAYS (matches file_shares.expires_at); the sweeper
+    # removes expired records and deletes blobs no record references, in bounded ticks
+    FILE_TTL_DAYS = float(os.getenv('FILE_TTL_DAYS', '7'))
+    SWEEP_INTERVAL = float(os.getenv('SWEEP_INTERVAL', '60'))
+    SWEEP_BATCH_SIZE = int(os.getenv('SWEEP_BATCH_SIZE', '100'))
+    SWEEP_BUDGET_MS = float(os.getenv('SWEEP_BUDGET_MS', '50'))
+    
+    # Access logs are written in the background, in batches by size or age
+    ACCESS_LOG_BATCH_SIZE = int(os.getenv('ACCESS_LOG_BATCH_SIZE', '100'))
+    ACCESS_LOG_FLUSH_INTERVAL = float(os.getenv('ACCESS_LOG_FLUSH_INTERVAL', '1.0'))
+    ACCESS_LOG_QUEUE_SIZE = int(os.getenv('ACCESS_LOG_QUEUE_SIZE', '10000'))
+    
+    # File and access-log listings are keyset-paginated (?limit=&after=)
+    LIST_PAGE_SIZE = int(os.getenv('LIST_PAGE_SIZE', '100'))
+    LIST_PAGE_MAX = int(os.getenv('LIST_PAGE_MAX', '1000'))
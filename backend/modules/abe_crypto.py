@@ -7,30 +7,296 @@ from cryptography.hazmat.primitives.ciphers import Cipher, algorithms, modes
 from cryptography.hazmat.backends import default_backend
 import os
 import json
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+
+from modules.stream_cipher import SEGMENT_SIZE, NONCE_PREFIX_SIZE, SegmentEncryptor, SegmentDecryptor
+from modules.key_cache import KeyCache
+from modules.policy import compile_policy
+from modules.envelope import EnvelopeHeader, parse_header, MAGIC, MAX_HEADER_SIZE, KEY_SCHEME_CPABE
+from modules.cpabe_hybrid import CPABEKeyWrapper
+from modules.compression import CODEC_NONE, CODEC_NAMES, SAMPLE_SIZE, Compressor, Decompressor, choose_codec, codec_from_name
+
+# Pre-envelope blobs: JSON metadata + b"|||" + ciphertext
+LEGACY_SEPARATOR = b"|||"
+LEGACY_STREAM_SCHEME = "aes-256-gcm-stream"
+STREAM_CHUNK_SIZE = 1024 * 1024
+
+
+def iter_chunks(data, chunk_size=STREAM_CHUNK_SIZE):
+    """Yield zero-copy memoryview slices of data"""
+    view = memoryview(data)
+    for offset in range(0, len(view), chunk_size):
+        yield view[offset:offset + chunk_size]
+
+
+def check_policy(policy, user_attributes):
+    """Raise PermissionError unless user_attributes satisfy policy"""
+    compile_policy(policy).enforce(user_attributes)
+
+
+def read_policy(data):
+    """Return the policy from the header at the start of data; the payload is never touched"""
+    view = memoryview(data)
+    if bytes(view[:1]) == b"{":
+        end = bytes(view[:MAX_HEADER_SIZE]).find(LEGACY_SEPARATOR)
+        if end < 0:
+            raise ValueError("Invalid encrypted format")
+        return json.loads(bytes(view[:end]).decode()).get("policy", {})
+    parsed = parse_header(view)
+    if parsed is None:
+        raise ValueError("Invalid encrypted format: truncated envelope header")
+    return parsed[0].policy
+
+
+class Encryptor:
+    """
+    Incremental encryptor: the envelope header goes out with the first chunk, then sealed segments.
+    With a codec, the first SAMPLE_SIZE bytes decide whether compressing is worth it, and the
+    choice is recorded in the header before any payload is emitted.
+    """
+
+    def __init__(self, policy, segment_size=SEGMENT_SIZE, executor=None, workers=1, key_wrapper=None,
+                 codec=CODEC_NONE, detached_header=False):
+        self.key = os.urandom(32)   # AES-256 key
+        self.nonce_prefix = os.urandom(NONCE_PREFIX_SIZE)
+        self.segment_size = segment_size
+        self.key_wrapper = key_wrapper
+        self.policy = policy
+        self.segments = SegmentEncryptor(self.key, self.nonce_prefix, segment_size, executor, workers)
+        self.codec = codec
+        self.compressor = None
+        self.pending_header = None
+        self.header = None   # packed envelope header, available once the first output is produced
+        self.detached_header = detached_header
+        self.sample = bytearray() if codec != CODEC_NONE else None
+        self.bytes_in = 0
+        self.bytes_out = 0
+        if self.sample is None:
+            self._start(CODEC_NONE)
+
+    def _start(self, codec):
+        self.codec = codec
+        if self.key_wrapper is not None:
+            header = EnvelopeHeader(self.key_wrapper.wrap(self.key, self.policy), self.nonce_prefix,
+                                    self.segment_size, self.policy, key_scheme=KEY_SCHEME_CPABE, codec=codec)
+        else:
+            header = EnvelopeHeader(self.key, self.nonce_prefix, self.segment_size, self.policy, codec=codec)
+        self.header = header.pack()
+        self.pending_header = None if self.detached_header else self.header
+        self.bytes_out += len(self.header)
+        if codec != CODEC_NONE:
+            self.compressor = Compressor(codec)
+
+    def _seal(self, chunk):
+        if self.compressor is not None:
+            chunk = self.compressor.compress(chunk)
+        return self.segments.update(chunk)
+
+    def _emit(self, out):
+        self.bytes_out += len(out)
+        if self.pending_header is not None:
+            out = self.pending_header + out
+            self.pending_header = None
+        return out
+
+    def update(self, chunk):
+        self.bytes_in += len(chunk)
+        if self.sample is not None:
+            if not self.sample and len(chunk) >= SAMPLE_SIZE:
+                # Usual case: the first chunk holds a whole sample, so look at a slice of it
+                self.sample = None
+                self._start(choose_codec(memoryview(chunk)[:SAMPLE_SIZE], self.codec))
+                return self._emit(self._seal(chunk))
+            self.sample += chunk
+            if len(self.sample) < SAMPLE_SIZE:
+                return b""
+            chunk, self.sample = self.sample, None
+            self._start(choose_codec(chunk, self.codec))
+        return self._emit(self._seal(chunk))
+
+    def finalize(self):
+        out = []
+        if self.sample is not None:
+            sample, self.sample = self.sample, None
+            self._start(choose_codec(sample, self.codec))
+            out.append(self._seal(sample))
+        if self.compressor is not None:
+            out.append(self.segments.update(self.compressor.flush()))
+        out.append(self.segments.finalize())
+        return self._emit(b"".join(out))
+
+
+class _DecompressingBody:
+    """Runs segment plaintext through the codec recorded in the envelope, yielding bounded pieces"""
+
+    def __init__(self, body, codec):
+        self.body = body
+        self.decompressor = Decompressor(codec)
+
+    def update(self, chunk):
+        return self.decompressor.decompress(self.body.update(chunk))
+
+    def finalize(self):
+        yield from self.decompressor.decompress(self.body.finalize())
+        out = self.decompressor.flush()
+        if out:
+            yield out
+
+
+def _open_legacy(metadata, key):
+    """Body decryptor for blobs written before the binary envelope"""
+    if metadata.get("scheme") == LEGACY_STREAM_SCHEME:
+        return SegmentDecryptor(key, bytes.fromhex(metadata["nonce_prefix"]), metadata["segment_size"])
+    # Original format: one GCM stream, tag kept in the header
+    iv = bytes.fromhex(metadata["iv"])
+    tag = bytes.fromhex(metadata["tag"])
+    return Cipher(algorithms.AES(key), modes.GCM(iv, tag), backend=default_backend()).decryptor()
+
+
+class Decryptor:
+    """Incremental decryptor: parses the header, checks the policy, then opens segments"""
+
+    def __init__(self, user_attributes, executor=None, workers=1, key_wrapper=None):
+        self.user_attributes = user_attributes
+        self.executor = executor
+        self.workers = workers
+        self.key_wrapper = key_wrapper
+        self.header = None
+        self.policy = None
+        self.buffer = bytearray()
+        self.body = None
+
+    def _parse_envelope(self, data):
+        parsed = parse_header(data)
+        if parsed is None:
+            return None
+        header, offset = parsed
+        check_policy(header.policy, self.user_attributes)
+        if header.key_scheme == KEY_SCHEME_CPABE:
+            if self.key_wrapper is None:
+                raise ValueError("Blob was encrypted in hybrid CP-ABE mode, which is not enabled")
+            key = self.key_wrapper.unwrap(header.key, self.user_attributes)
+        else:
+            key = header.key
+        self.body = SegmentDecryptor(key, header.nonce_prefix, header.segment_size,
+                                     self.executor, self.workers)
+        if header.codec != CODEC_NONE:
+            self.body = _DecompressingBody(self.body, header.codec)
+        self.header = header
+        self.policy = header.policy
+        return offset
+
+    def _parse_legacy(self, data):
+        end = bytes(data[:MAX_HEADER_SIZE]).find(LEGACY_SEPARATOR)
+        if end < 0:
+            if len(data) > MAX_HEADER_SIZE:
+                raise ValueError("Invalid encrypted format")
+            return None
+        metadata = json.loads(bytes(data[:end]).decode())
+        check_policy(metadata.get("policy", {}), self.user_attributes)
+        self.body = _open_legacy(metadata, bytes.fromhex(metadata["key"]))
+        self.header = metadata
+        self.policy = metadata.get("policy", {})
+        return end + len(LEGACY_SEPARATOR)
+
+    def _parse_header(self, data):
+        """Return the payload offset in data once the full header is present, else None"""
+        if len(data) < len(MAGIC):
+            return None
+        if bytes(data[:1]) == b"{":
+            return self._parse_legacy(data)
+        return self._parse_envelope(data)
+
+    def _payload(self, chunk):
+        """The payload part of chunk, or None while the header is still incomplete"""
+        if self.header is not None:
+            return chunk
+
+        if not self.buffer:
+            # Fast path: the whole header is in this chunk, so the payload is sliced, not copied
+            view = memoryview(chunk)
+            offset = self._parse_header(view)
+            if offset is not None:
+                return view[offset:]
+
+        self.buffer += chunk
+        offset = self._parse_header(self.buffer)
+        if offset is None:
+            return None
+        rest = bytes(self.buffer[offset:])
+        self.buffer = None
+        return rest
+
+    def _pieces(self, out):
+        # Compressed bodies already yield pieces; the others return one bytes object
+        return out if isinstance(self.body, _DecompressingBody) else (out,)
+
+    def update_pieces(self, chunk):
+        """
+        Like update(), as an iterator of plaintext pieces so decompressed output stays
+        bounded. The header is parsed right away; exhaust the iterator before the next call.
+        """
+        payload = self._payload(chunk)
+        if payload is None:
+            return iter(())
+        return self._pieces(self.body.update(payload))
+
+    def finalize_pieces(self):
+        if self.header is None:
+            raise ValueError("Invalid encrypted format")
+        return self._pieces(self.body.finalize())
+
+    def update(self, chunk):
+        return b"".join(self.update_pieces(chunk))
+
+    def finalize(self):
+        return b"".join(self.finalize_pieces())
+
 
 class ABEManager:
     """Simplified ABE Manager using symmetric encryption"""
     
-    def __init__(self):
+    def __init__(self, key_cache_size=1024, key_cache_ttl=3600,
+                 workers=1, parallel_threshold=8 * 1024 * 1024, pool='thread', mode='symmetric',
+                 compression='auto', codec='zstd', key_path=None, key_wrapper=None):
         print("✅ ABE Encryption Manager initialized")
         self.backend = default_backend()
         self.master_key = Fernet.generate_key()
         self.master_cipher = Fernet(self.master_key)
         print("✓ Master keys generated")
+        # Derived attribute keys, keyed by the canonical sorted tag set
+        self.key_cache = KeyCache(max_entries=key_cache_size, ttl_seconds=key_cache_ttl)
+        self.warmup_pool = ThreadPoolExecutor(max_workers=1, thread_name_prefix="abe-key-warmup")
+        # Segment-parallel encryption for inputs at or above parallel_threshold bytes
+        self.workers = max(1, workers)
+        self.parallel_threshold = parallel_threshold
+        self.segment_pool = None
+        if self.workers > 1:
+            if pool == 'process':
+                self.segment_pool = ProcessPoolExecutor(max_workers=self.workers)
+            else:
+                self.segment_pool = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="abe-segment")
+            print(f"✓ Parallel segment encryption: {self.workers} {pool} workers, threshold {parallel_threshold} bytes")
+        # 'hybrid': per-file AES keys are wrapped with CP-ABE instead of stored raw in the header
+        self.mode = mode
+        self.key_wrapper = None
+        if mode == 'hybrid':
+            self.key_wrapper = key_wrapper or CPABEKeyWrapper(
+                key_cache_size=key_cache_size, key_cache_ttl=key_cache_ttl, key_path=key_path
+            )
+        # 'auto': compress before encrypting unless the first block shows the data won't shrink
+        self.codec = codec_from_name(codec) if compression == 'auto' else CODEC_NONE
+        print(f"✓ Pre-encryption compression: {CODEC_NAMES[self.codec] if compression == 'auto' else 'off'}")
     
     def _attributes_to_tags(self, attributes):
         """Convert attribute dict to unique tags"""
         tags = [f"{k.upper()}-{v.upper()}" for k, v in attributes.items()]
         return tags
     
-    def generate_user_keys(self, attributes):
-        """Generate encryption keys for user based on their attributes"""
-        attr_tags = self._attributes_to_tags(attributes)
-        
-        print(f"Generating keys for attributes: {attr_tags}")
-        
+    def _derive_private_key(self, attr_tags):
+        """Run the KDF for a canonical (sorted) tag tuple"""
         # Create deterministic key from attributes
-        attr_string = "|".join(sorted(attr_tags))
+        attr_string = "|".join(attr_tags)
         
         # Derive key using hashlib.pbkdf2_hmac (built-in, no cryptography needed)
         key_material = hashlib.pbkdf2_hmac(
@@ -39,7 +305,15 @@ class ABEManager:
             b'secure_file_share',
             100000
         )
-        private_key = base64.b64encode(key_material).decode('utf-8')
+        return base64.b64encode(key_material).decode('utf-8')
+    
+    def generate_user_keys(self, attributes):
+        """Generate encryption keys for user based on their attributes"""
+        attr_tags = tuple(sorted(self._attributes_to_tags(attributes)))
+        
+        print(f"Generating keys for attributes: {list(attr_tags)}")
+        
+        private_key = self.key_cache.get_or_compute(attr_tags, lambda: self._derive_private_key(attr_tags))
         
         # Master public key
         public_key = base64.b64encode(self.master_key).decode('utf-8')
@@ -52,28 +326,88 @@ class ABEManager:
             'attributes': attributes
         }
     
+    def warm_user_keys(self, attributes):
+        """Derive and cache keys for attributes in the background (called at registration)"""
+        attr_tags = tuple(sorted(self._attributes_to_tags(attributes)))
+        if self.key_cache.get(attr_tags) is not None:
+            return None
+        print(f"⏳ Warming key cache for attributes: {list(attr_tags)}")
+        return self.warmup_pool.submit(
+            self.key_cache.get_or_compute, attr_tags, lambda: self._derive_private_key(attr_tags)
+        )
+    
+    def use_parallel(self, size):
+        """True if an input of size bytes should be processed on the segment pool"""
+        return self.segment_pool is not None and size is not None and size >= self.parallel_threshold
+    
+    def stream_chunk_size(self, parallel=False):
+        """Read size for streaming callers: one chunk per worker keeps the whole pool busy"""
+        return STREAM_CHUNK_SIZE * self.workers if parallel else STREAM_CHUNK_SIZE
+    
+    def encryptor(self, policy: dict, segment_size: int = SEGMENT_SIZE, parallel: bool = False,
+                  detached_header: bool = False) -> "Encryptor":
+        """
+        Start an incremental encryption under policy. With detached_header the output is
+        payload only and the header is read from encryptor.header after finalize().
+        """
+        if parallel and self.segment_pool is not None:
+            return Encryptor(policy, segment_size, self.segment_pool, self.workers, self.key_wrapper,
+                             self.codec, detached_header)
+        return Encryptor(policy, segment_size, key_wrapper=self.key_wrapper, codec=self.codec,
+                         detached_header=detached_header)
+
+    def decryptor(self, user_attributes: dict, parallel: bool = False) -> "Decryptor":
+        """Start an incremental decryption for a user with user_attributes"""
+        if parallel and self.segment_pool is not None:
+            return Decryptor(user_attributes, self.segment_pool, self.workers, self.key_wrapper)
+        return Decryptor(user_attributes, key_wrapper=self.key_wrapper)
+
+    def encrypt_stream(self, fileobj, policy: dict, chunk_size: int = None, parallel: bool = False):
+        """Encrypt a file-like object chunk by chunk, yielding ciphertext chunks"""
+        encryptor = self.encryptor(policy, parallel=parallel)
+        chunk_size = chunk_size or self.stream_chunk_size(parallel)
+        while True:
+            chunk = fileobj.read(chunk_size)
+            if not chunk:
+                break
+            out = encryptor.update(chunk)
+            if out:
+                yield out
+        yield encryptor.finalize()
+        print(f"✅ ABE.encrypt_stream: encrypted {encryptor.bytes_in} bytes -> {encryptor.bytes_out} bytes (codec: {CODEC_NAMES[encryptor.codec]})")
+
+    def decrypt_stream(self, chunks, user_attributes: dict, parallel: bool = False):
+        """
+        Decrypt an iterable of ciphertext chunks, returning an iterator of plaintext chunks.
+        The header is read eagerly so policy violations raise here rather than mid-stream.
+        """
+        decryptor = self.decryptor(user_attributes, parallel)
+        chunks = iter(chunks)
+        head = []
+        for chunk in chunks:
+            head.append(decryptor.update_pieces(chunk))
+            if decryptor.header is not None:
+                break
+        if decryptor.header is None:
+            raise ValueError("Invalid encrypted format")
+        return self._drain(decryptor, head, chunks)
+
+    def _drain(self, decryptor, head, chunks):
+        for pieces in head:
+            yield from (out for out in pieces if out)
+        for chunk in chunks:
+            yield from (out for out in decryptor.update_pieces(chunk) if out)
+        yield from (out for out in decryptor.finalize_pieces() if out)
+
     def encrypt(self, data: bytes, policy: dict) -> bytes:
         try:
-            if not isinstance(data, (bytes, bytearray)):
+            if not isinstance(data, (bytes, bytearray, memoryview)):
                 data = str(data).encode()
 
-            key = os.urandom(32)   # AES-256 key
-            iv = os.urandom(12)    # GCM IV
-            cipher = Cipher(algorithms.AES(key), modes.GCM(iv), backend=self.backend)
-            encryptor = cipher.encryptor()
-            ciphertext = encryptor.update(data) + encryptor.finalize()
-            tag = encryptor.tag
-
-            metadata = {
-                "key": key.hex(),
-                "iv": iv.hex(),
-                "tag": tag.hex(),
-                "policy": policy
-            }
-
-            result = json.dumps(metadata).encode() + b"|||" + ciphertext
+            encryptor = self.encryptor(policy, parallel=self.use_parallel(len(data)))
+            result = b"".join([encryptor.update(data), encryptor.finalize()])
 
-            print(f"✅ ABE.encrypt: encrypted {len(data)} bytes -> ciphertext {len(ciphertext)} bytes")
+            print(f"✅ ABE.encrypt: encrypted {encryptor.bytes_in} bytes -> ciphertext {encryptor.bytes_out} bytes (codec: {CODEC_NAMES[encryptor.codec]})")
             print(f"   policy: {policy}")
 
             return result
@@ -87,57 +421,79 @@ class ABEManager:
         The second parameter user_attributes is required and used to verify policy.
         """
         try:
-            if not isinstance(encrypted_blob, (bytes, bytearray)):
+            if not isinstance(encrypted_blob, (bytes, bytearray, memoryview)):
                 raise ValueError("encrypted_blob must be bytes")
 
-            parts = encrypted_blob.split(b"|||", 1)
-            if len(parts) != 2:
-                raise ValueError("Invalid encrypted format")
+            # One memoryview in: the header is parsed in place and segments are opened without copying
+            parallel = self.use_parallel(len(encrypted_blob))
+            plaintext = b"".join(self.decrypt_stream([memoryview(encrypted_blob)], user_attributes, parallel))
 
-            metadata = json.loads(parts[0].decode())
-            ciphertext = parts[1]
-
-            policy = metadata.get("policy", {})
-            # Check if policy allows current user
-            for k, v in policy.items():
-                user_val = user_attributes.get(k)
-                if user_val is None:
-                    raise PermissionError(f"Access policy not satisfied: missing required attribute '{k}'")
-                
-                # Support both single value and list of allowed values
-                allowed_values = v if isinstance(v, list) else [v]
-                if str(user_val).lower() not in [str(av).lower() for av in allowed_values]:
-                    raise PermissionError(f"Access policy not satisfied: required {k} in {allowed_values}, but got {k}={user_val}")
-
-            key = bytes.fromhex(metadata["key"])
-            iv = bytes.fromhex(metadata["iv"])
-            tag = bytes.fromhex(metadata["tag"])
-
-            cipher = Cipher(algorithms.AES(key), modes.GCM(iv, tag), backend=self.backend)
-            decryptor = cipher.decryptor()
-            plaintext = decryptor.update(ciphertext) + decryptor.finalize()
-
-            print(f"✅ ABE.decrypt: decrypted ciphertext {len(ciphertext)} bytes -> {len(plaintext)} bytes")
+            print(f"✅ ABE.decrypt: decrypted ciphertext {len(encrypted_blob)} bytes -> {len(plaintext)} bytes")
             print(f"   user_attributes: {user_attributes}")
-            print(f"   policy: {policy}")
 
             return plaintext
         except Exception as e:
             print(f"❌ ABE.decrypt error: {e}")
             raise
     
+    def resolve_attributes(self, encrypted_head, candidates):
+        """
+        Read the header once and return the first attribute set in candidates that
+        satisfies its policy, or None. encrypted_head may be a separately stored
+        header or any prefix of a blob that contains the whole header.
+        """
+        compiled = compile_policy(read_policy(encrypted_head))
+        for attributes in candidates:
+            if compiled.evaluate(attributes):
+                return attributes
+        return None
+    
+    def split_envelope(self, encrypted_blob):
+        """Split an envelope blob into (header, payload) memoryviews without copying"""
+        view = memoryview(encrypted_blob)
+        parsed = parse_header(view)
+        if parsed is None:
+            raise ValueError("Invalid encrypted format: truncated envelope header")
+        _, offset = parsed
+        return view[:offset], view[offset:]
+    
+    def rewrap(self, header_bytes, new_policy):
+        """
+        Re-issue an envelope header under new_policy. The data key and cipher
+        parameters are carried over, so the stored payload stays valid as-is.
+        """
+        parsed = parse_header(header_bytes)
+        if parsed is None or parsed[1] != len(header_bytes):
+            raise ValueError("Invalid envelope header")
+        header, _ = parsed
+        compile_policy(new_policy)  # reject malformed policies before they are stored
+        key_material = header.key
+        if header.key_scheme == KEY_SCHEME_CPABE:
+            if self.key_wrapper is None:
+                raise ValueError("Blob was encrypted in hybrid CP-ABE mode, which is not enabled")
+            data_key = self.key_wrapper.authority_unwrap(header.key, header.policy)
+            key_material = self.key_wrapper.wrap(data_key, new_policy)
+        new_header = EnvelopeHeader(key_material, header.nonce_prefix, header.segment_size, new_policy,
+                                    key_scheme=header.key_scheme, cipher=header.cipher, flags=header.flags,
+                                    codec=header.codec)
+        print(f"✅ ABE.rewrap: policy {header.policy} -> {new_policy}")
+        return new_header.pack()
+    
     def check_access(self, user_attributes, access_policy):
         """Check if user attributes satisfy access policy"""
         if not access_policy:
             return True
-            
-        for key, value in access_policy.items():
-            if key not in user_attributes or user_attributes[key] != value:
-                print(f"Access denied: missing or mismatched attribute {key}")
-                return False
+        
+        if not compile_policy(access_policy).evaluate(user_attributes):
+            print(f"Access denied: attributes do not satisfy policy {access_policy}")
+            return False
         
         print(f"Access granted: attributes match policy")
         return True
+    
+    def check_access_many(self, attribute_sets, access_policy):
+        """Evaluate one policy against many attribute sets, returning a list of bools"""
+        return compile_policy(access_policy).evaluate_many(attribute_sets)
 
 # Example usage
 if __name__ == "__main__":
@@ -0,0 +1,181 @@
+# modules/access_log_writer.py - Buffered, batched access-log writes off the request path
+#
+# log() stamps the event and puts it on a bounded queue; a background thread
+# commits events with db.log_access_many() once batch_size have arrived or
+# flush_interval seconds after the first one, whichever is sooner. A full
+# queue blocks the caller (backpressure) for up to put_timeout seconds, after
+# which the event is dropped and counted; so is one logged after close(). The
+# request thread never writes to the DB itself.
+#
+# A failed batch stays in pending (still readable) and is retried with
+# exponential backoff; only after retry_attempts failures is it dropped, and
+# drops are counted in stats(). The DB write runs outside the lock so log()
+# never waits on it; readers wait for an in-flight commit instead, so they
+# never see an event both committed and pending.
+
+import queue
+import threading
+import time
+from datetime import datetime
+
+_STOP = object()
+
+
+class AccessLogWriter:
+    """Asynchronous batching front for DatabaseManager.log_access"""
+
+    def __init__(self, db, batch_size=100, flush_interval=1.0, max_queue=10000, put_timeout=1.0,
+                 retry_attempts=5, retry_backoff=0.5):
+        self.db = db
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.put_timeout = put_timeout
+        self.retry_attempts = retry_attempts
+        self.retry_backoff = retry_backoff
+        self.queue = queue.Queue(maxsize=max_queue)
+        # Events accepted but not yet committed (keyed by identity), so reads can include them
+        self.pending = {}
+        self.lock = threading.Lock()
+        # Readers wait on this while a commit is in flight (committing > 0)
+        self.commit_done = threading.Condition(self.lock)
+        self.committing = 0
+        self.closed = False
+        self.batches = 0
+        self.events_written = 0
+        self.retries = 0
+        self.events_dropped = 0
+        self.thread = threading.Thread(target=self._run, daemon=True, name="access-log-writer")
+        self.thread.start()
+        print(f"✅ Access log writer started (batches of {batch_size}, every {flush_interval}s, queue {max_queue})")
+
+    def log(self, data):
+        """Queue an access event, waiting up to put_timeout for space; returns False if it was dropped"""
+        if self.closed:
+            return self._drop(data, "writer is closed")
+        data.setdefault('logged_at', datetime.now().isoformat())
+        with self.lock:
+            self.pending[id(data)] = data
+        try:
+            self.queue.put(data, timeout=self.put_timeout)
+        except queue.Full:
+            with self.lock:
+                self.pending.pop(id(data), None)
+            return self._drop(data, "queue full")
+        return True
+
+    def _drop(self, data, reason):
+        with self.lock:
+            self.events_dropped += 1
+        print(f"⚠️ Access event for {data.get('access_code')} dropped ({reason})")
+        return False
+
+    def _write(self, batch):
+        """One attempt at committing batch; on success it leaves pending"""
+        with self.lock:
+            self.committing += 1
+        try:
+            self.db.log_access_many(batch)
+        except BaseException:
+            with self.lock:
+                self.committing -= 1
+                self.commit_done.notify_all()
+            raise
+        with self.lock:
+            for event in batch:
+                self.pending.pop(id(event), None)
+            self.committing -= 1
+            self.batches += 1
+            self.events_written += len(batch)
+            self.commit_done.notify_all()
+
+    def _commit(self, batch):
+        """Commit batch, retrying with backoff; dropped (and counted) only when every attempt fails"""
+        delay = self.retry_backoff
+        for attempt in range(1, self.retry_attempts + 1):
+            try:
+                self._write(batch)
+                return True
+            except Exception as e:
+                if attempt == self.retry_attempts:
+                    print(f"❌ Access log batch of {len(batch)} dropped after {attempt} attempts: {e}")
+                    break
+                print(f"⚠️ Access log batch of {len(batch)} failed ({e}); retrying in {delay:.1f}s")
+                with self.lock:
+                    self.retries += 1
+                time.sleep(delay)
+                delay *= 2
+        with self.lock:
+            for event in batch:
+                self.pending.pop(id(event), None)
+            self.events_dropped += len(batch)
+        return False
+
+    def _run(self):
+        while True:
+            first = self.queue.get()
+            if first is _STOP:
+                return
+            batch = [first]
+            deadline = time.monotonic() + self.flush_interval
+            stopping = False
+            while len(batch) < self.batch_size:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    event = self.queue.get(timeout=remaining)
+                except queue.Empty:
+                    break
+                if event is _STOP:
+                    stopping = True
+                    break
+                batch.append(event)
+            self._commit(batch)
+            if stopping:
+                return
+
+    def get_access_logs(self, access_code):
+        """Committed and still-queued events for access_code, oldest first"""
+        with self.lock:
+            while self.committing:
+                self.commit_done.wait()
+            logs = self.db.get_access_logs(access_code)
+            return logs + [event for event in self.pending.values() if event.get('access_code') == access_code]
+
+    def get_access_logs_page(self, access_code, after=None, limit=100):
+        """
+        Keyset page of committed logs. Queued events have no cursor position yet,
+        so they are appended to the last page (which may then exceed limit).
+        """
+        with self.lock:
+            while self.committing:
+                self.commit_done.wait()
+            logs, next_cursor = self.db.get_access_logs_page(access_code, after, limit)
+            if next_cursor is None:
+                logs = logs + [event for event in self.pending.values() if event.get('access_code') == access_code]
+            return logs, next_cursor
+
+    def get_total_access_logs(self):
+        with self.lock:
+            while self.committing:
+                self.commit_done.wait()
+            return self.db.get_total_access_logs() + len(self.pending)
+
+    def close(self):
+        """Stop accepting events and flush everything queued"""
+        if self.closed:
+            return
+        self.closed = True
+        self.queue.put(_STOP)
+        self.thread.join()
+        print(f"✅ Access log writer drained ({self.events_written} events in {self.batches} batches)")
+
+    def stats(self):
+        with self.lock:
+            return {
+                'queued': len(self.pending),
+                'batches': self.batches,
+                'events_written': self.events_written,
+                'retries': self.retries,
+                'events_dropped': self.events_dropped
+            }
@@ -0,0 +1,162 @@
+# modules/anchor.py - Batch uploads into Merkle trees and anchor only the roots on chain
+#
+# Each stored file record becomes a leaf (a hash of its immutable fields). Leaves
+# are collected until batch_size have arrived or interval seconds have passed
+# since the first one; then one tree is built, its root is sent in a single
+# transaction, and once that transaction is mined every record in the batch gets
+# its inclusion proof and the root's tx_hash. A reverted or timed-out transaction
+# puts the batch back in the queue, unless the root turns out to be on chain
+# already (an earlier send whose outcome was lost, e.g. across a restart). A
+# record can later be checked by recomputing its leaf and walking the proof up
+# to the anchored root.
+
+import json
+import threading
+import time
+
+from modules.merkle import leaf_hash, build_levels, merkle_root, inclusion_proof, verify_proof
+
+# Fields that never change after upload; a policy rewrap only replaces header_hash
+ANCHORED_FIELDS = ('id', 'access_code', 'user_id', 'file_name', 'ipfs_hash', 'file_size', 'created_at')
+
+
+def record_leaf(record):
+    payload = json.dumps({field: record.get(field) for field in ANCHORED_FIELDS}, sort_keys=True, separators=(',', ':'))
+    return leaf_hash(payload.encode())
+
+
+class MerkleAnchor:
+    """Background batcher: one on-chain transaction per batch of uploads"""
+
+    def __init__(self, db, anchor_fn, batch_size=256, interval=10.0, anchored_fn=None):
+        self.db = db
+        # anchor_fn(root_hex, leaf_count) -> tx_hash once mined; raises if the transaction failed
+        self.anchor_fn = anchor_fn
+        # anchored_fn(root_hex) -> whether the root is already on chain
+        self.anchored_fn = anchored_fn
+        self.batch_size = batch_size
+        self.interval = interval
+        self.pending = []          # (record id, leaf hash), in arrival order
+        self.pending_since = None  # when the oldest pending leaf arrived (or the last failed attempt)
+        self.lock = threading.Lock()
+        self.cond = threading.Condition(self.lock)
+        self.stopped = False
+        self.batches = 0
+        self.leaves_anchored = 0
+        self.failures = 0
+        self.last_root = None
+        self.thread = threading.Thread(target=self._run, daemon=True, name="merkle-anchor")
+        self.thread.start()
+        print(f"✅ Merkle anchor started (batches of up to {batch_size}, every {interval}s)")
+
+    def add(self, record):
+        """Queue a stored file record for the next batch"""
+        with self.cond:
+            if not self.pending:
+                self.pending_since = time.monotonic()
+            self.pending.append((record['id'], record_leaf(record)))
+            # The first leaf starts the interval timer; a full batch goes out right away
+            if len(self.pending) == 1 or len(self.pending) >= self.batch_size:
+                self.cond.notify()
+
+    def flush(self):
+        """Anchor up to batch_size pending leaves now; returns the root, or None if nothing was anchored"""
+        with self.lock:
+            batch = self.pending[:self.batch_size]
+            del self.pending[:len(batch)]
+            if self.pending:
+                self.pending_since = time.monotonic()
+        if not batch:
+            return None
+        levels = build_levels([leaf for _, leaf in batch])
+        root = merkle_root(levels).hex()
+        try:
+            tx_hash = self.anchor_fn(root, len(batch))
+        except Exception as e:
+            with self.lock:
+                self.failures += 1
+            if not self._on_chain(root):
+                print(f"❌ Anchoring {len(batch)} records failed, will retry: {e}")
+                with self.lock:
+                    self.pending[:0] = batch
+                    self.pending_since = time.monotonic()
+                return None
+            # Same batch already anchored by an earlier transaction; its hash isn't known here
+            print(f"⚠️ Merkle root {root[:16]}… is already on chain ({e}); recording proofs")
+            tx_hash = None
+        # By id: access codes can repeat, and the code would find the oldest record
+        for index, (record_id, _) in enumerate(batch):
+            self.db.update_file_record_by_id(record_id, {'anchor': {
+                'root': root,
+                'tx_hash': tx_hash,
+                'index': index,
+                'batch_size': len(batch),
+                'proof': inclusion_proof(levels, index)
+            }})
+        with self.lock:
+            self.batches += 1
+            self.leaves_anchored += len(batch)
+            self.last_root = root
+        print(f"⛓️  Anchored {len(batch)} records under Merkle root {root[:16]}… (tx {tx_hash})")
+        return root
+
+    def _on_chain(self, root):
+        if self.anchored_fn is None:
+            return False
+        try:
+            return self.anchored_fn(root)
+        except Exception as e:
+            print(f"⚠️ Could not look up Merkle root {root[:16]}…: {e}")
+            return False
+
+    def _due(self):
+        if not self.pending:
+            return None
+        if len(self.pending) >= self.batch_size:
+            return 0
+        return max(0.0, self.pending_since + self.interval - time.monotonic())
+
+    def _run(self):
+        while True:
+            with self.cond:
+                while not self.stopped and self._due() != 0:
+                    self.cond.wait(self._due())
+                if self.stopped:
+                    return
+            self.flush()
+
+    @staticmethod
+    def verify(record):
+        """Check a record against its stored proof and root"""
+        anchor = record.get('anchor')
+        if not anchor:
+            return {'anchored': False, 'verified': False}
+        return {
+            'anchored': True,
+            'verified': verify_proof(record_leaf(record), anchor['proof'], anchor['root']),
+            'root': anchor['root'],
+            'tx_hash': anchor['tx_hash'],
+            'index': anchor['index'],
+            'batch_size': anchor['batch_size']
+        }
+
+    def close(self):
+        """Stop the batcher and anchor whatever is still pending"""
+        with self.cond:
+            if self.stopped:
+                return
+            self.stopped = True
+            self.cond.notify()
+        self.thread.join()
+        while self.pending and self.flush() is not None:
+            pass
+
+    def stats(self):
+        with self.lock:
+            return {
+                'pending': len(self.pending),
+                'batches': self.batches,
+                'leaves_anchored': self.leaves_anchored,
+                'failures': self.failures,
+                'last_root': self.last_root
+            }
@@ -0,0 +1,170 @@
+# modules/blob_cache.py - Byte-budgeted 2Q cache for immutable IPFS objects
+#
+# 2Q keeps first-time objects in a small FIFO (A1in). Only objects requested again
+# after they fell out of it (remembered by key in the ghost list A1out) are promoted
+# to the main LRU (Am), so one pass over many cold files can't flush the hot set.
+# Objects are content-addressed, so entries never go stale and there is no TTL.
+#
+# Streamed reads can fill the cache as they pass through (begin_fill/reserve_fill/
+# end_fill): one stream per key, and the copies buffered by all of them together
+# stay within fill_bytes, so concurrent cold reads can't each hold a whole object.
+
+import threading
+from collections import OrderedDict
+from concurrent.futures import Future
+
+
+class BlobCache:
+    """
+    Thread-safe 2Q cache bounded by total value bytes, with single-flight fetches.
+    Objects larger than max_object_bytes are passed through uncached.
+    """
+
+    def __init__(self, max_bytes=256 * 1024 * 1024, max_object_bytes=None, in_fraction=0.25, ghost_fraction=0.5,
+                 fill_bytes=None):
+        self.max_bytes = max_bytes
+        self.max_object_bytes = max_object_bytes or max_bytes // 4
+        self.fill_bytes_max = fill_bytes or self.max_object_bytes
+        self.fill_bytes = 0          # buffered by streams filling the cache
+        self.filling = set()         # keys a stream is filling
+        self.in_bytes_target = int(max_bytes * in_fraction)
+        self.ghost_bytes_target = int(max_bytes * ghost_fraction)
+        self.a1in = OrderedDict()    # key -> value, FIFO
+        self.a1out = OrderedDict()   # key -> size, ghost FIFO (keys only)
+        self.am = OrderedDict()      # key -> value, LRU
+        self.in_bytes = 0
+        self.am_bytes = 0
+        self.ghost_bytes = 0
+        self.inflight = {}           # key -> Future
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def _lookup(self, key):
+        value = self.am.get(key)
+        if value is not None:
+            self.am.move_to_end(key)
+            return value
+        # A1in hits don't reorder: a burst of requests right after upload is not "hot"
+        return self.a1in.get(key)
+
+    def get(self, key):
+        """Return the cached object or None, counting a hit or miss"""
+        with self.lock:
+            value = self._lookup(key)
+            if value is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+            return value
+
+    def put(self, key, value):
+        with self.lock:
+            self._store(key, value)
+
+    def _store(self, key, value):
+        size = len(value)
+        if size > self.max_object_bytes or key in self.am or key in self.a1in:
+            return
+        if key in self.a1out:
+            # Seen before and evicted from A1in: it's being reused, keep it in the main LRU
+            self.ghost_bytes -= self.a1out.pop(key)
+            self.am[key] = value
+            self.am_bytes += size
+        else:
+            self.a1in[key] = value
+            self.in_bytes += size
+        self._reclaim()
+
+    def _reclaim(self):
+        while self.in_bytes + self.am_bytes > self.max_bytes:
+            if self.a1in and (self.in_bytes > self.in_bytes_target or not self.am):
+                key, value = self.a1in.popitem(last=False)
+                self.in_bytes -= len(value)
+                self.a1out[key] = len(value)
+                self.ghost_bytes += len(value)
+            else:
+                _, value = self.am.popitem(last=False)
+                self.am_bytes -= len(value)
+            self.evictions += 1
+        while self.ghost_bytes > self.ghost_bytes_target and self.a1out:
+            _, size = self.a1out.popitem(last=False)
+            self.ghost_bytes -= size
+
+    def discard(self, key):
+        """Forget key entirely (e.g. after the object is deleted)"""
+        with self.lock:
+            if key in self.am:
+                self.am_bytes -= len(self.am.pop(key))
+            elif key in self.a1in:
+                self.in_bytes -= len(self.a1in.pop(key))
+            if key in self.a1out:
+                self.ghost_bytes -= self.a1out.pop(key)
+
+    def begin_fill(self, key):
+        """Claim key for a streamed fill; False if it is cached or another stream has it"""
+        with self.lock:
+            if key in self.filling or key in self.am or key in self.a1in:
+                return False
+            self.filling.add(key)
+            return True
+
+    def reserve_fill(self, size):
+        """Take size bytes of the shared fill budget; False (nothing taken) if it doesn't fit"""
+        with self.lock:
+            if self.fill_bytes + size > self.fill_bytes_max:
+                return False
+            self.fill_bytes += size
+            return True
+
+    def end_fill(self, key, reserved, value=None):
+        """Give back a fill's reservation and cache value if the stream completed"""
+        with self.lock:
+            self.filling.discard(key)
+            self.fill_bytes -= reserved
+            if value is not None:
+                self._store(key, value)
+
+    def get_or_fetch(self, key, fetch):
+        """Return the cached object for key, calling fetch() at most once across threads"""
+        with self.lock:
+            value = self._lookup(key)
+            if value is not None:
+                self.hits += 1
+                return value
+            self.misses += 1
+            future = self.inflight.get(key)
+            owner = future is None
+            if owner:
+                future = self.inflight[key] = Future()
+
+        if not owner:
+            return future.result()
+
+        try:
+            value = fetch()
+        except BaseException as e:
+            with self.lock:
+                del self.inflight[key]
+            future.set_exception(e)
+            raise
+        with self.lock:
+            self._store(key, value)
+            del self.inflight[key]
+        future.set_result(value)
+        return value
+
+    def stats(self):
+        with self.lock:
+            lookups = self.hits + self.misses
+            return {
+                'entries': len(self.a1in) + len(self.am),
+                'bytes': self.in_bytes + self.am_bytes,
+                'max_bytes': self.max_bytes,
+                'fill_bytes': self.fill_bytes,
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'hit_ratio': round(self.hits / lookups, 3) if lookups else 0.0
+            }
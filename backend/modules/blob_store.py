@@ -0,0 +1,82 @@
+# modules/blob_store.py - Disk-backed content-addressed blob store
+#
+# Layout: <root>/objects/<aa>/<bb>/<full sha256 hex>, written via <root>/tmp + rename.
+# Reads are mmap-backed, so resident memory does not grow with the stored corpus.
+
+import hashlib
+import mmap
+import os
+import tempfile
+
+
+class DiskBlobStore:
+    """Content-addressed store keyed by the full SHA-256 of each blob"""
+
+    def __init__(self, root):
+        self.root = os.path.abspath(root)
+        self.objects_dir = os.path.join(self.root, 'objects')
+        self.tmp_dir = os.path.join(self.root, 'tmp')
+        os.makedirs(self.objects_dir, exist_ok=True)
+        os.makedirs(self.tmp_dir, exist_ok=True)
+        print(f"✅ Disk blob store at {self.root}")
+
+    def path(self, digest):
+        """Sharded object path for a hex digest"""
+        if len(digest) != 64 or any(c not in '0123456789abcdef' for c in digest):
+            raise ValueError(f"Invalid blob digest: {digest}")
+        return os.path.join(self.objects_dir, digest[:2], digest[2:4], digest)
+
+    def add(self, data):
+        """Store bytes-like data, return its hex digest"""
+        return self.add_stream([data])
+
+    def add_stream(self, chunks):
+        """Store an iterable of byte chunks without holding them all in memory, return the digest"""
+        hasher = hashlib.sha256()
+        fd, tmp_path = tempfile.mkstemp(dir=self.tmp_dir)
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                for chunk in chunks:
+                    hasher.update(chunk)
+                    f.write(chunk)
+                f.flush()
+                os.fsync(f.fileno())
+            digest = hasher.hexdigest()
+            final_path = self.path(digest)
+            if os.path.exists(final_path):
+                # Same content already stored; keep the existing object
+                os.unlink(tmp_path)
+            else:
+                os.makedirs(os.path.dirname(final_path), exist_ok=True)
+                os.replace(tmp_path, final_path)
+            return digest
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.unlink(tmp_path)
+            raise
+
+    def has(self, digest):
+        return os.path.exists(self.path(digest))
+
+    def size(self, digest):
+        return os.path.getsize(self.path(digest))
+
+    def get(self, digest):
+        """Read-only memoryview over an mmap of the blob; pages load on demand"""
+        with open(self.path(digest), 'rb') as f:
+            if os.fstat(f.fileno()).st_size == 0:
+                return memoryview(b"")
+            mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        return memoryview(mapped)
+
+    def open(self, digest):
+        """File object for sequential streaming reads"""
+        return open(self.path(digest), 'rb')
+
+    def delete(self, digest):
+        """Remove a blob; returns False if it was not stored"""
+        try:
+            os.unlink(self.path(digest))
+            return True
+        except FileNotFoundError:
+            return False
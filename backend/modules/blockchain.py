@@ -2,10 +2,35 @@ from web3 import Web3
 import json
 import os
 import hashlib
+import threading
 from datetime import datetime
 
+from modules.tx_submitter import TransactionSubmitter
+from modules.event_indexer import EventIndexer
+from modules.view_cache import ViewCache, cached_view
+
+
+def _checksum_args(address):
+    return (Web3.to_checksum_address(address),)
+
+
+def _file_metadata(result):
+    """getFileMetadata's (owner, cid, accessPolicy, timestamp, isActive) as a dict, None for an unknown cid"""
+    if result and result[0] != '0x0000000000000000000000000000000000000000':
+        return {
+            'owner': result[0],
+            'cid': result[1],
+            'access_policy': result[2],
+            'timestamp': result[3],
+            'is_active': result[4]
+        }
+    return None
+
+
 class BlockchainManager:
-    def __init__(self):
+    def __init__(self, tx_poll_interval=0.5, tx_timeout=120, private_key=None,
+                 index_events=True, index_poll_interval=1.0, index_start_block=0, index_confirmations=0,
+                 view_cache_size=10000, view_cache_block_check=0.5):
         # Connect to Ganache
         ganache_url = os.getenv('GANACHE_URL', 'http://localhost:8545')
         self.w3 = Web3(Web3.HTTPProvider(ganache_url))
@@ -28,10 +53,40 @@ class BlockchainManager:
             abi=contract_abi
         )
         
-        # Default account for transactions
-        self.default_account = self.w3.eth.accounts[0]
+        # Default account for transactions; with a private key, transactions are signed locally
+        self.private_key = private_key or None
+        if self.private_key:
+            self.default_account = self.w3.eth.account.from_key(self.private_key).address
+        else:
+            self.default_account = self.w3.eth.accounts[0]
         print(f"✓ Using account: {self.default_account}")
         
+        # One submitter (local nonce counter + receipt poller) per sending account
+        self.tx_poll_interval = tx_poll_interval
+        self.tx_timeout = tx_timeout
+        self.submitters = {}
+        self.submitters_lock = threading.Lock()
+        self.anchor_registered = False
+        
+        # Metadata reads are served from a local index of contract events once it has caught up
+        self.indexer = None
+        if index_events:
+            self.indexer = EventIndexer(
+                self.w3, self.contract,
+                start_block=index_start_block,
+                poll_interval=index_poll_interval,
+                confirmations=index_confirmations
+            ).start()
+        
+        # Other view calls are cached for the current block; 0 disables the cache
+        self.view_cache = None
+        if view_cache_size > 0:
+            self.view_cache = ViewCache(
+                lambda: self.w3.eth.block_number,
+                max_entries=view_cache_size,
+                block_check_interval=view_cache_block_check
+            )
+        
         print("✅ Blockchain Manager initialized")
         self.ledger = []
         self.users = {}
@@ -87,59 +142,107 @@ class BlockchainManager:
             print(f"❌ User registration error: {str(e)}")
             raise
     
-    def register_user(self, bcid, public_key, user_address=None):
-        """Register user on blockchain"""
-        if user_address is None:
-            user_address = self.default_account
-        
-        tx_hash = self.contract.functions.registerUser(
-            bcid,
-            public_key
-        ).transact({
-            'from': user_address,
-            'gas': 300000
-        })
-        
-        receipt = self.w3.eth.wait_for_transaction_receipt(tx_hash)
-        return receipt.transactionHash.hex()
+    def submitter(self, address=None):
+        """TransactionSubmitter for address (default account), created on first use"""
+        address = address or self.default_account
+        with self.submitters_lock:
+            submitter = self.submitters.get(address)
+            if submitter is None:
+                key = self.private_key if address == self.default_account else None
+                submitter = self.submitters[address] = TransactionSubmitter(
+                    self.w3, address, private_key=key,
+                    poll_interval=self.tx_poll_interval, timeout=self.tx_timeout
+                )
+            return submitter
     
-    def share_file(self, cid, encrypted_key, access_policy, from_address=None):
-        """Store file metadata on blockchain"""
-        if from_address is None:
-            from_address = self.default_account
-        
-        tx_hash = self.contract.functions.shareFile(
-            cid,
-            encrypted_key,
-            access_policy
-        ).transact({
-            'from': from_address,
-            'gas': 500000
-        })
-        
-        receipt = self.w3.eth.wait_for_transaction_receipt(tx_hash)
-        return receipt.transactionHash.hex()
+    def _send(self, call, gas, address, wait):
+        future = self.submitter(address).submit(call, gas)
+        if wait:
+            future.result(timeout=self.tx_timeout)
+        return future.tx_hash
+    
+    def _invalidate(self, function, *args):
+        if self.view_cache is not None:
+            self.view_cache.invalidate(function, *args)
+    
+    def register_user_onchain(self, bcid, public_key, user_address=None, wait=False):
+        """
+        Register user on blockchain. Returns the transaction hash as soon as the node
+        accepts it; pass wait=True to block until it is mined (or use transaction_status)
+        """
+        self._invalidate('users', *_checksum_args(user_address or self.default_account))
+        return self._send(self.contract.functions.registerUser(bcid, public_key), 300000, user_address, wait)
+    
+    def share_file(self, cid, encrypted_key, access_policy, from_address=None, wait=False):
+        """Store file metadata on blockchain; returns the transaction hash without waiting by default"""
+        self._invalidate('getFileMetadata', cid)
+        return self._send(self.contract.functions.shareFile(cid, encrypted_key, access_policy), 500000, from_address, wait)
+    
+    def anchor_root(self, root, leaf_count):
+        """
+        Anchor a Merkle root of uploads in one shareFile transaction (cid = root hex).
+        shareFile only accepts registered senders, so the account registers itself first.
+        Waits for the transaction to be mined and raises TransactionFailed if it reverted
+        or timed out, so callers only ever record proofs against a root that is on chain.
+        """
+        if not self.anchor_registered:
+            info = self.get_user_info(self.default_account)
+            if not (info and info['isRegistered']):
+                self.register_user_onchain('merkle-anchor', '', wait=True)
+            self.anchor_registered = True
+        policy = json.dumps({'type': 'merkle-root', 'leaves': leaf_count})
+        return self.share_file(root, '', policy, wait=True)
+    
+    def is_anchored(self, root):
+        """Whether root is on chain as an active Merkle-root entry (asks the contract, not the index)"""
+        metadata = _file_metadata(self.contract.functions.getFileMetadata(root).call())
+        if not metadata or not metadata['is_active']:
+            return False
+        try:
+            policy = json.loads(metadata['access_policy'] or '')
+        except ValueError:
+            return False
+        return isinstance(policy, dict) and policy.get('type') == 'merkle-root'
+    
+    def transaction_status(self, tx_hash):
+        """Status of a transaction sent through this manager"""
+        with self.submitters_lock:
+            submitters = list(self.submitters.values())
+        for submitter in submitters:
+            status = submitter.status(tx_hash)
+            if status['status'] != 'unknown':
+                return status
+        return {'tx_hash': tx_hash, 'status': 'unknown'}
+    
+    def index_stats(self):
+        return self.indexer.stats() if self.indexer is not None else None
+    
+    def view_cache_stats(self):
+        return self.view_cache.stats() if self.view_cache is not None else None
+    
+    def tx_stats(self):
+        with self.submitters_lock:
+            return [submitter.stats() for submitter in self.submitters.values()]
+    
+    @cached_view('getFileMetadata')
+    def _file_metadata_call(self, cid):
+        return self.contract.functions.getFileMetadata(cid).call()
+    
+    @cached_view('users', normalize=_checksum_args)
+    def _user_call(self, address):
+        return self.contract.functions.users(address).call()
     
     def get_file_metadata(self, cid):
         """
         Get file metadata from blockchain
-        Returns: dict with file info or None
+        Returns: dict with file info or None. Answers from the event index when it is
+        synced; 'indexed_block' then says how fresh the answer is
         """
+        if self.indexer is not None and self.indexer.synced:
+            return self.indexer.get_file(cid)
         try:
-            # Call view function - no transaction needed
-            result = self.contract.functions.getFileMetadata(cid).call()
-            
-            # Unpack the tuple returned by Solidity
-            # Returns: (owner, cid, accessPolicy, timestamp, isActive)
-            if result and result[0] != '0x0000000000000000000000000000000000000000':
-                return {
-                    'owner': result[0],
-                    'cid': result[1],
-                    'access_policy': result[2],
-                    'timestamp': result[3],
-                    'is_active': result[4]
-                }
-            return None
+            # Call view function - no transaction needed (cached for the current block)
+            return _file_metadata(self._file_metadata_call(cid))
             
         except Exception as e:
             print(f"Error getting file metadata: {str(e)}")
@@ -176,9 +279,14 @@ class BlockchainManager:
 
 
     def get_user_info(self, address):
-        """Get user information from blockchain"""
+        """Get user information from blockchain (from the event index when synced)"""
+        if self.indexer is not None and self.indexer.synced:
+            return self.indexer.get_user(address) or {
+                'bcid': '', 'publicKey': '', 'isRegistered': False, 'timestamp': 0,
+                'indexed_block': self.indexer.last_block
+            }
         try:
-            user = self.contract.functions.users(address).call()
+            user = self._user_call(address)
             return {
                 'bcid': user[0],
                 'publicKey': user[1],
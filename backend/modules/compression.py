@@ -0,0 +1,219 @@
+# modules/compression.py - Adaptive pre-encryption compression (zstd or zlib)
+
+import zlib
+
+try:
+    import zstandard
+    ZSTD_AVAILABLE = True
+except ImportError:
+    ZSTD_AVAILABLE = False
+
+CODEC_NONE = 0
+CODEC_ZLIB = 1
+CODEC_ZSTD = 2
+
+CODEC_NAMES = {CODEC_NONE: 'none', CODEC_ZLIB: 'zlib', CODEC_ZSTD: 'zstd'}
+
+SAMPLE_SIZE = 64 * 1024
+# Only compress if the sample shrinks to at most this fraction of its size
+MIN_RATIO = 0.9
+
+# Most plaintext one decompress step may produce, so a small compressed segment
+# can't expand into gigabytes at once. zlib caps its output directly. zstd's
+# decompressobj can't, so the frame's block headers are read as the input goes
+# by: every block regenerates at most ZSTD_BLOCK_MAX bytes (raw and RLE blocks
+# say exactly how many), and input is handed over in runs of whole blocks whose
+# output can't exceed the bound. Ordinary data goes through in a few large
+# calls; only a stream of tiny high-ratio blocks ends up in many small ones.
+MAX_OUTPUT_CHUNK = 8 * 1024 * 1024
+ZSTD_BLOCK_MAX = 128 * 1024
+ZSTD_MAGIC = b"\x28\xb5\x2f\xfd"
+_ZSTD_BLOCK_RAW, _ZSTD_BLOCK_RLE = 0, 1
+
+# Formats that are already compressed; no point spending CPU on a trial run
+_COMPRESSED_MAGIC = [
+    b"\xff\xd8\xff",          # JPEG
+    b"\x89PNG",               # PNG
+    b"GIF8",                  # GIF
+    b"PK\x03\x04",            # ZIP, DOCX/XLSX/PPTX, JAR
+    b"\x1f\x8b",              # gzip
+    b"\x28\xb5\x2f\xfd",      # zstd
+    b"BZh",                   # bzip2
+    b"\xfd7zXZ\x00",          # xz
+    b"7z\xbc\xaf\x27\x1c",    # 7z
+    b"Rar!",                  # RAR
+    b"RIFF",                  # WebP, AVI, WAV
+    b"OggS",                  # Ogg
+    b"\x1aE\xdf\xa3",         # Matroska / WebM
+    b"ID3",                   # MP3
+]
+
+
+def _looks_compressed(sample):
+    head = bytes(sample[:12])
+    if any(head.startswith(magic) for magic in _COMPRESSED_MAGIC):
+        return True
+    return head[4:8] == b"ftyp"   # MP4 / MOV / HEIC
+
+
+def default_codec():
+    return CODEC_ZSTD if ZSTD_AVAILABLE else CODEC_ZLIB
+
+
+def codec_from_name(name):
+    """Map a config value ('zstd', 'zlib') to a codec id, falling back to zlib without zstandard"""
+    if name == 'zstd':
+        return CODEC_ZSTD if ZSTD_AVAILABLE else CODEC_ZLIB
+    if name == 'zlib':
+        return CODEC_ZLIB
+    raise ValueError(f"Unknown compression codec: {name}")
+
+
+def choose_codec(sample, codec):
+    """Return codec if a fast trial compression of sample pays off, else CODEC_NONE"""
+    if not sample or _looks_compressed(sample):
+        return CODEC_NONE
+    trial = zlib.compress(bytes(sample[:SAMPLE_SIZE]), 1)
+    if len(trial) > MIN_RATIO * min(len(sample), SAMPLE_SIZE):
+        return CODEC_NONE
+    return codec
+
+
+class Compressor:
+    """Streaming compressor for one codec; compress() may buffer internally"""
+
+    def __init__(self, codec, level=3):
+        self.codec = codec
+        if codec == CODEC_ZSTD:
+            self.stream = zstandard.ZstdCompressor(level=level).compressobj()
+        elif codec == CODEC_ZLIB:
+            self.stream = zlib.compressobj(level)
+        else:
+            raise ValueError(f"Unsupported codec: {codec}")
+
+    def compress(self, data):
+        return self.stream.compress(data)
+
+    def flush(self):
+        return self.stream.flush()
+
+
+class _ZstdBlockWalker:
+    """Follows zstd frame and block headers across calls to split input at block boundaries"""
+
+    def __init__(self):
+        self.state = 'frame_header'
+        self.head = bytearray()     # header bytes seen so far (headers may straddle calls)
+        self.remaining = 0          # body bytes left in the current block
+        self.last = False
+        self.checksum = False
+
+    def _header_size(self):
+        """Bytes the pending header needs in total (5 until the frame descriptor is in)"""
+        if self.state == 'block_header':
+            return 3
+        if self.state == 'checksum':
+            return 4
+        if len(self.head) < 5:
+            return 5
+        if bytes(self.head[:4]) != ZSTD_MAGIC:
+            raise ValueError("Corrupt compressed stream: not a zstd frame")
+        descriptor = self.head[4]
+        single_segment = (descriptor >> 5) & 1
+        content_size = (single_segment, 2, 4, 8)[descriptor >> 6]
+        return 5 + (0 if single_segment else 1) + (0, 1, 2, 4)[descriptor & 3] + content_size
+
+    def _parse(self):
+        """Act on a complete header; returns the most output the block it opens can produce"""
+        if self.state == 'frame_header':
+            self.checksum = bool((self.head[4] >> 2) & 1)
+            self.state = 'block_header'
+            return 0
+        if self.state == 'checksum':
+            self.state = 'done'
+            return 0
+        value = int.from_bytes(self.head[:3], 'little')
+        self.last = bool(value & 1)
+        block_type, size = (value >> 1) & 3, value >> 3
+        self.remaining = 1 if block_type == _ZSTD_BLOCK_RLE else size
+        self.state = 'block'
+        return size if block_type in (_ZSTD_BLOCK_RAW, _ZSTD_BLOCK_RLE) else ZSTD_BLOCK_MAX
+
+    def _end_block(self):
+        if not self.last:
+            self.state = 'block_header'
+        else:
+            self.state = 'checksum' if self.checksum else 'done'
+
+    def slices(self, view):
+        """Split view into runs whose decompressed output stays within MAX_OUTPUT_CHUNK"""
+        start = pos = 0
+        # A block opened in an earlier call may still produce its output here
+        budget = ZSTD_BLOCK_MAX
+        while pos < len(view) and self.state != 'done':
+            if self.state == 'block':
+                step = min(self.remaining, len(view) - pos)
+                pos += step
+                self.remaining -= step
+                if not self.remaining:
+                    self._end_block()
+                continue
+            header_start = pos - len(self.head)
+            need = self._header_size()
+            while len(self.head) < need and pos < len(view):
+                take = min(need - len(self.head), len(view) - pos)
+                self.head += view[pos:pos + take]
+                pos += take
+                need = self._header_size()
+            if len(self.head) < need:
+                break
+            most = self._parse()
+            self.head.clear()
+            if budget + most > MAX_OUTPUT_CHUNK and header_start > start:
+                yield view[start:header_start]
+                start, budget = header_start, ZSTD_BLOCK_MAX
+            budget += most
+            if self.state == 'block' and not self.remaining:
+                self._end_block()
+        if start < len(view):
+            yield view[start:]
+
+
+class Decompressor:
+    """Streaming decompressor matching Compressor; output comes in pieces of at most MAX_OUTPUT_CHUNK"""
+
+    def __init__(self, codec):
+        self.codec = codec
+        if codec == CODEC_ZSTD:
+            if not ZSTD_AVAILABLE:
+                raise ValueError("Blob is zstd-compressed but the zstandard package is not installed")
+            self.stream = zstandard.ZstdDecompressor().decompressobj()
+            self.walker = _ZstdBlockWalker()
+        elif codec == CODEC_ZLIB:
+            self.stream = zlib.decompressobj()
+        else:
+            raise ValueError(f"Unsupported codec: {codec}")
+
+    def decompress(self, data):
+        """Generator of plaintext pieces for data; consume it before the next call"""
+        if not data:
+            return
+        if self.codec == CODEC_ZLIB:
+            out = self.stream.decompress(data, MAX_OUTPUT_CHUNK)
+            while True:
+                if out:
+                    yield out
+                if not self.stream.unconsumed_tail:
+                    return
+                out = self.stream.decompress(self.stream.unconsumed_tail, MAX_OUTPUT_CHUNK)
+        for piece in self.walker.slices(memoryview(data)):
+            out = self.stream.decompress(piece)
+            if out:
+                yield out
+
+    def flush(self):
+        """Check the stream ended where the compressed data says it should"""
+        out = self.stream.flush() if self.codec == CODEC_ZLIB else b""
+        if not self.stream.eof:
+            raise ValueError("Truncated compressed stream")
+        return out
@@ -0,0 +1,177 @@
+# modules/cpabe_hybrid.py - Hybrid CP-ABE key wrapping (Charm BSW07 KEM + AES-GCM data)
+#
+# CP-ABE only ever encrypts a random GT element per file. The AES key that
+# protects the payload is wrapped under a KEK hashed from that element, so the
+# pairing cost is per file and independent of file size.
+#
+# The public and master keys are saved to key_path on first start and loaded
+# from it afterwards; without them, no hybrid blob survives a restart.
+
+import base64
+import hashlib
+import os
+import re
+import struct
+import tempfile
+
+from cryptography.hazmat.primitives.keywrap import aes_key_wrap, aes_key_unwrap
+
+from modules.key_cache import KeyCache
+
+try:
+    from charm.toolbox.pairinggroup import PairingGroup, GT
+    from charm.schemes.abenc.abenc_bsw07 import CPabe_BSW07
+    from charm.core.engine.util import objectToBytes, bytesToObject
+    CHARM_AVAILABLE = True
+except ImportError:
+    CHARM_AVAILABLE = False
+
+_UNSAFE = re.compile(r"[^A-Z0-9]")
+_ATTRIBUTE = re.compile(r"([^\s()]+):([^\s()]+)")
+
+
+def _b32(text):
+    return base64.b32encode(str(text).upper().encode()).decode().rstrip('=')
+
+
+def attribute_tag(key, value):
+    """
+    Charm attribute name for key=value: unpadded base32 of each upper-cased half,
+    e.g. OJXWYZI-NVQW4YLHMVZA for role:manager. Charm reserves '_' for duplicate-
+    attribute indices, and base32 stays within A-Z2-7 without merging distinct pairs.
+    """
+    return f"{_b32(key)}-{_b32(value)}"
+
+
+def legacy_attribute_tag(key, value):
+    """Tag used before base32 (A-Z0-9 only, so dept:r-d and dept:rd collided); read-only"""
+    return f"{_UNSAFE.sub('', str(key).upper())}-{_UNSAFE.sub('', str(value).upper())}"
+
+
+def user_tags(attributes, tag=attribute_tag):
+    """Canonical sorted tag tuple for a user's attributes"""
+    tags = set()
+    for key, value in attributes.items():
+        for v in (value if isinstance(value, list) else [value]):
+            tags.add(tag(key, v))
+    return tuple(sorted(tags))
+
+
+def policy_to_cpabe(policy):
+    """Translate a dict or key:value expression policy into a Charm policy string"""
+    if isinstance(policy, str):
+        return _ATTRIBUTE.sub(lambda m: attribute_tag(m.group(1), m.group(2)), policy)
+    clauses = []
+    for key, value in policy.items():
+        values = value if isinstance(value, list) else [value]
+        clauses.append("(" + " or ".join(attribute_tag(key, v) for v in values) + ")")
+    return " and ".join(clauses)
+
+
+def policy_tags(policy, tag=attribute_tag):
+    """Every attribute a policy mentions; a key over all of them satisfies any monotone policy"""
+    if isinstance(policy, str):
+        return tuple(sorted({tag(k, v) for k, v in _ATTRIBUTE.findall(policy)}))
+    return user_tags(policy, tag)
+
+
+def load_or_create_keys(path, setup, dumps, loads):
+    """
+    (public_key, master_key) read from path, or made by setup() and saved there.
+    The file is created 0600 and published with a no-clobber link, so concurrent
+    first starts agree on one key pair. path=None keeps the keys in memory only.
+    """
+    if not path:
+        print("⚠️ CP-ABE keys are not persisted; hybrid blobs will not decrypt after a restart")
+        return setup()
+    if not os.path.exists(path):
+        public_key, master_key = setup()
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=directory)   # mkstemp files are 0600
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                f.write(dumps({'pk': public_key, 'mk': master_key}))
+                f.flush()
+                os.fsync(f.fileno())
+            os.link(tmp_path, path)
+            print(f"✓ CP-ABE keys saved to {path}")
+            return public_key, master_key
+        except FileExistsError:
+            pass   # another process saved its pair first; use that one
+        finally:
+            os.unlink(tmp_path)
+    with open(path, 'rb') as f:
+        keys = loads(f.read())
+    print(f"✓ CP-ABE keys loaded from {path}")
+    return keys['pk'], keys['mk']
+
+
+class CPABEKeyWrapper:
+    """Wraps per-file AES keys under CP-ABE, with precomputed tables and cached user keys"""
+
+    def __init__(self, curve='SS512', key_cache_size=1024, key_cache_ttl=3600, key_path=None):
+        if not CHARM_AVAILABLE:
+            raise RuntimeError("Charm-crypto is not installed; hybrid CP-ABE mode is unavailable")
+        self.group = PairingGroup(curve)
+        self.cpabe = CPabe_BSW07(self.group)
+        (self.public_key, self.master_key) = load_or_create_keys(
+            key_path, self.cpabe.setup,
+            lambda keys: objectToBytes(keys, self.group),
+            lambda data: bytesToObject(data, self.group)
+        )
+        self._precompute()
+        # keygen is one exponentiation per attribute; cache the resulting key objects
+        self.secret_keys = KeyCache(max_entries=key_cache_size, ttl_seconds=key_cache_ttl)
+        print(f"✓ CP-ABE hybrid key wrapping ready ({curve})")
+
+    def _precompute(self):
+        """
+        Fixed-base exponentiation tables for the public parameters. encrypt()
+        raises g, h and e(g,g)^alpha to a fresh exponent for every file.
+        """
+        for name in ('g', 'g2', 'h', 'f', 'e_gg_alpha'):
+            element = self.public_key.get(name)
+            if element is not None:
+                element.initPP()
+
+    def _kek(self, element):
+        return hashlib.sha256(self.group.serialize(element)).digest()
+
+    def secret_key(self, tags):
+        """CP-ABE secret key for a canonical tag tuple, generated once per tag set"""
+        return self.secret_keys.get_or_compute(
+            tags, lambda: self.cpabe.keygen(self.public_key, self.master_key, list(tags))
+        )
+
+    def wrap(self, data_key, policy):
+        """Return CP-ABE ciphertext of a random element + data_key wrapped under its hash"""
+        element = self.group.random(GT)
+        ciphertext = self.cpabe.encrypt(self.public_key, element, policy_to_cpabe(policy))
+        encoded = objectToBytes(ciphertext, self.group)
+        return struct.pack(">I", len(encoded)) + encoded + aes_key_wrap(self._kek(element), data_key)
+
+    def _unwrap_with(self, wrapped, secret_key):
+        (length,) = struct.unpack_from(">I", wrapped, 0)
+        ciphertext = bytesToObject(bytes(wrapped[4:4 + length]), self.group)
+        element = self.cpabe.decrypt(self.public_key, secret_key, ciphertext)
+        if element is False or element is None:
+            raise PermissionError("Access policy not satisfied: CP-ABE key does not match ciphertext policy")
+        return aes_key_unwrap(self._kek(element), bytes(wrapped[4 + length:]))
+
+    def unwrap(self, wrapped, user_attributes):
+        """Recover the data key with the user's (cached) CP-ABE secret key"""
+        return self._unwrap_with(wrapped, self.secret_key(user_tags(user_attributes)))
+
+    def authority_unwrap(self, wrapped, policy):
+        """
+        Recover the data key as the key authority, e.g. to rewrap under a new policy.
+        Keys wrapped under legacy tags are still opened here, so a rewrap upgrades them.
+        """
+        try:
+            return self._unwrap_with(wrapped, self.secret_key(policy_tags(policy)))
+        except PermissionError:
+            legacy = policy_tags(policy, legacy_attribute_tag)
+            if legacy == policy_tags(policy):
+                raise
+            return self._unwrap_with(wrapped, self.secret_key(legacy))
@@ -1,58 +1,195 @@
 # modules/database.py - Stub Implementation for Local Testing
 
 import json
+import threading
+from bisect import bisect_left, bisect_right, insort
 from datetime import datetime
 
+from modules.records import FileRecord, AccessLogTable, compact_user
+from modules.rwlock import ReadWriteLock
+from modules.stats import StatsRollup, count_upload, count_access
+
 class DatabaseManager:
-    """Stub database manager for local testing"""
+    """
+    Stub database manager for local testing. Safe to share between request threads:
+    files and access logs each have a reader-writer lock covering the table and its
+    indexes, so lookups run side by side and only writes to the same table serialize.
+    """
     
     def __init__(self):
         print("✅ Database Manager initialized")
-        self.files = {}
+        # Rows are held compactly (see records.py); every getter returns a fresh dict
+        self.files = {}                       # record id -> FileRecord
         self.users = {}
-        self.access_logs = []
+        self.access_logs = AccessLogTable()
+        # Ids are handed out under files_lock, so they are unique and ascend in insertion order
+        self.next_file_id = 1
+        self.files_lock = ReadWriteLock()     # files, ids_by_access_code, ids_by_user, next_file_id
+        self.logs_lock = ReadWriteLock()      # access_logs, logs_by_access_code
+        self.users_lock = threading.Lock()
+        # Secondary indexes, kept in step with files/access_logs on every write. Id and
+        # position lists are sorted, which is what keyset pagination seeks on
+        self.ids_by_access_code = {}    # access_code -> [record id]
+        self.ids_by_user = {}           # user_id -> [record id]
+        self.logs_by_access_code = {}   # access_code -> [position in access_logs]
+        # Upload/download/denied counters and latency rollups, updated as records are written
+        self.stats = StatsRollup()
+    
+    def _index_file(self, record):
+        insort(self.ids_by_access_code.setdefault(record.get('access_code'), []), record.id)
+        insort(self.ids_by_user.setdefault(record.get('user_id'), []), record.id)
+    
+    @staticmethod
+    def _remove_id(index, key, record_id):
+        ids = index.get(key, [])
+        i = bisect_left(ids, record_id)
+        if i < len(ids) and ids[i] == record_id:
+            del ids[i]
+            if not ids:
+                del index[key]
+    
+    def _unindex_file(self, record):
+        self._remove_id(self.ids_by_access_code, record.get('access_code'), record.id)
+        self._remove_id(self.ids_by_user, record.get('user_id'), record.id)
+    
+    @staticmethod
+    def _page(keys, after, limit):
+        """Keys after the cursor, and the cursor for the next page (None on the last page)"""
+        start = bisect_right(keys, after) if after is not None else 0
+        page = keys[start:start + limit]
+        return page, (page[-1] if start + limit < len(keys) else None)
     
     def insert_file_record(self, data):
         """Insert file record into database"""
         try:
-            record_id = len(self.files) + 1
-            data['id'] = record_id
             data['created_at'] = datetime.now().isoformat()
-            self.files[record_id] = data
+            record = FileRecord(data)
+            with self.files_lock.write():
+                # Not len(files) + 1: records can be deleted, ids must not repeat
+                record_id = record.id = self.next_file_id
+                self.next_file_id += 1
+                self.files[record_id] = record
+                self._index_file(record)
+            data['id'] = record_id
+            self.stats.adjust('files', 1)
+            count_upload(self.stats, data)
             print(f"✅ File record saved to database (ID: {record_id})")
             return data
         except Exception as e:
             print(f"❌ Database insert error: {str(e)}")
             raise
     
+    def _find(self, access_code):
+        """FileRecord for access_code; caller holds files_lock"""
+        ids = self.ids_by_access_code.get(access_code)
+        return self.files[ids[0]] if ids else None
+    
     def get_file_by_access_code(self, access_code):
         """Get file record by access code"""
         try:
-            for file_record in self.files.values():
-                if file_record.get('access_code') == access_code:
-                    print(f"✅ File found in database for access code: {access_code}")
-                    return file_record
+            with self.files_lock.read():
+                record = self._find(access_code)
+                record = record.to_dict() if record is not None else None
+            if record is not None:
+                print(f"✅ File found in database for access code: {access_code}")
+                return record
             print(f"⚠️  No file found for access code: {access_code}")
             return None
         except Exception as e:
             print(f"❌ Database query error: {str(e)}")
             raise
     
+    def update_file_record(self, access_code, fields):
+        """Update fields of the file record with access_code; returns the record or None"""
+        return self._update(lambda: self._find(access_code), fields)
+    
+    def update_file_record_by_id(self, record_id, fields):
+        """Update fields of the file record with this id; returns the record or None"""
+        return self._update(lambda: self.files.get(record_id), fields)
+    
+    def _update(self, find, fields):
+        try:
+            with self.files_lock.write():
+                file_record = find()
+                if file_record is None:
+                    return None
+                reindex = 'access_code' in fields or 'user_id' in fields
+                if reindex:
+                    self._unindex_file(file_record)
+                file_record.update(fields)
+                if reindex:
+                    self._index_file(file_record)
+                file_record.update({'updated_at': datetime.now().isoformat()})
+                result = file_record.to_dict()
+            print(f"✅ File record updated (ID: {result['id']})")
+            return result
+        except Exception as e:
+            print(f"❌ Database update error: {str(e)}")
+            raise
+    
+    def delete_file_record(self, access_code):
+        """Delete the file record with access_code; returns the removed record or None"""
+        try:
+            with self.files_lock.write():
+                file_record = self._find(access_code)
+                if file_record is None:
+                    return None
+                del self.files[file_record.id]
+                self._unindex_file(file_record)
+            self.stats.adjust('files', -1)
+            print(f"✅ File record deleted (ID: {file_record.id})")
+            return file_record.to_dict()
+        except Exception as e:
+            print(f"❌ Database delete error: {str(e)}")
+            raise
+    
+    def iter_file_records(self):
+        """All file records, oldest first"""
+        with self.files_lock.read():
+            return [record.to_dict() for record in self.files.values()]
+    
     def log_access(self, data):
         """Log file access event"""
         try:
             data['logged_at'] = datetime.now().isoformat()
-            self.access_logs.append(data)
+            with self.logs_lock.write():
+                position = self.access_logs.append(data)
+                self.logs_by_access_code.setdefault(data.get('access_code'), []).append(position)
+            self.stats.adjust('access_logs', 1)
+            count_access(self.stats, data)
             print(f"✅ Access event logged for user: {data['user_id']}")
             return True
         except Exception as e:
             print(f"❌ Access logging error: {str(e)}")
             raise
     
+    def log_access_many(self, events):
+        """Append a batch of access events (keeps logged_at if already set)"""
+        try:
+            now = datetime.now().isoformat()
+            with self.logs_lock.write():
+                for data in events:
+                    data.setdefault('logged_at', now)
+                    position = self.access_logs.append(data)
+                    self.logs_by_access_code.setdefault(data.get('access_code'), []).append(position)
+            self.stats.adjust('access_logs', len(events))
+            for data in events:
+                count_access(self.stats, data)
+            print(f"✅ {len(events)} access events logged")
+            return True
+        except Exception as e:
+            print(f"❌ Access logging error: {str(e)}")
+            raise
+    
     def insert_user(self, user_id, data):
         """Insert user into database"""
         try:
-            self.users[user_id] = data
+            data = compact_user(data)
+            with self.users_lock:
+                is_new = user_id not in self.users
+                self.users[user_id] = data
+            if is_new:
+                self.stats.adjust('users', 1)
             print(f"✅ User inserted into database: {user_id}")
             return True
         except Exception as e:
@@ -61,21 +198,39 @@ class DatabaseManager:
     
     def get_user(self, user_id):
         """Get user from database"""
-        return self.users.get(user_id, {})
+        with self.users_lock:
+            return self.users.get(user_id, {})
     
     def get_user_files(self, user_id):
         """Get all files uploaded by user"""
-        return [f for f in self.files.values() if f.get('user_id') == user_id]
+        with self.files_lock.read():
+            return [self.files[record_id].to_dict() for record_id in self.ids_by_user.get(user_id, [])]
+    
+    def get_user_files_page(self, user_id, after=None, limit=100):
+        """Up to limit files of user_id with id > after; returns (files, next_cursor)"""
+        with self.files_lock.read():
+            ids, next_cursor = self._page(self.ids_by_user.get(user_id, []), after, limit)
+            return [self.files[record_id].to_dict() for record_id in ids], next_cursor
     
     def get_access_logs(self, access_code):
         """Get access logs for a file"""
-        return [l for l in self.access_logs if l.get('access_code') == access_code]
+        with self.logs_lock.read():
+            return [self.access_logs[i] for i in self.logs_by_access_code.get(access_code, [])]
+    
+    def get_access_logs_page(self, access_code, after=None, limit=100):
+        """Up to limit logs for access_code after the cursor; returns (logs, next_cursor)"""
+        with self.logs_lock.read():
+            positions, next_cursor = self._page(self.logs_by_access_code.get(access_code, []), after, limit)
+            return [self.access_logs[i] for i in positions], next_cursor
     
     def get_total_files(self):
-        return len(self.files)
+        with self.files_lock.read():
+            return len(self.files)
     
     def get_total_users(self):
-        return len(self.users)
+        with self.users_lock:
+            return len(self.users)
     
     def get_total_access_logs(self):
-        return len(self.access_logs)
+        with self.logs_lock.read():
+            return len(self.access_logs)
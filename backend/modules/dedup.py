@@ -0,0 +1,303 @@
+# modules/dedup.py - Content-defined chunking + convergent encryption for cross-file dedup
+#
+# Plaintext is split with FastCDC (gear rolling hash, normalized chunking), so an
+# insertion only moves the boundaries next to it. Each chunk is sealed with a key
+# derived from its own content (keyed with a deployment secret), which makes the
+# ciphertext, and therefore its IPFS hash, identical for identical chunks. A
+# per-file manifest lists (chunk hash, chunk key, size); it holds every key, so
+# callers must store it under the file's ABE policy.
+#
+# With numpy the gear fingerprints of a whole buffer are computed at once: the
+# 64-bit hash at byte i only depends on the 64 bytes ending there, so it is the
+# sum of 64 shifted gear values, built in 6 doubling steps over cache-sized
+# blocks. Only the (sparse) positions where a mask clears are kept, and each cut
+# is a bisect into them. Boundaries are the same as the byte-at-a-time loop,
+# which remains as the fallback.
+
+import bisect
+import hashlib
+import hmac
+import json
+import threading
+
+from cryptography.hazmat.primitives.ciphers.aead import AESGCM
+
+try:
+    import numpy as np
+    NUMPY_AVAILABLE = True
+except ImportError:
+    NUMPY_AVAILABLE = False
+
+MIN_CHUNK_SIZE = 16 * 1024
+AVG_CHUNK_SIZE = 64 * 1024
+MAX_CHUNK_SIZE = 256 * 1024
+
+MANIFEST_VERSION = 1
+CHUNK_TAG_SIZE = 16
+# One key per content, so a fixed nonce never repeats under the same key
+CHUNK_NONCE = bytes(12)
+_U64 = (1 << 64) - 1
+# With numpy, input is gathered into scans of this size so fingerprints are computed once per scan
+SCAN_SIZE = 4 * 1024 * 1024
+# Fingerprint block (elements); 256 KB of uint64 stays in L2 through the doubling steps
+_FP_BLOCK = 32 * 1024
+
+# Fixed pseudo-random gear table: boundaries must be identical on every node
+GEAR = tuple(
+    int.from_bytes(hashlib.sha256(b"sfse-gear" + bytes([i])).digest()[:8], "big")
+    for i in range(256)
+)
+GEAR_ARRAY = np.array(GEAR, dtype=np.uint64) if NUMPY_AVAILABLE else None
+
+
+def _mask(bits):
+    """bits one-bits at the top of the 64-bit fingerprint (they cover the last 64 bytes)"""
+    return ((1 << bits) - 1) << (64 - bits)
+
+
+def gear_candidates(data, mask_small, mask_large):
+    """
+    Sorted positions i where the gear hash of the (up to) 64 bytes ending at data[i]
+    has none of mask_small's bits set, and the same for mask_large. mask_large's bits
+    must be a subset of mask_small's.
+    """
+    source = np.frombuffer(data, dtype=np.uint8)
+    small, large = [], []
+    shifted = np.empty(_FP_BLOCK + 63, dtype=np.uint64)
+    for start in range(0, len(source), _FP_BLOCK):
+        # 63 bytes of overlap so the block's first fingerprints see their whole window
+        lo = max(0, start - 63)
+        fps = GEAR_ARRAY.take(source[lo:start + _FP_BLOCK])
+        n = len(fps)
+        width = 1
+        while width < 64:
+            # fp over 2w bytes = fp over the last w + (fp over the w before) << w, wrapping at 64 bits
+            np.left_shift(fps[:n - width], np.uint64(width), out=shifted[:n - width])
+            np.add(fps[width:], shifted[:n - width], out=fps[width:])
+            width *= 2
+        fps = fps[start - lo:]
+        # Few positions pass the looser mask; the stricter one only has to look at those
+        hits = np.flatnonzero((fps & np.uint64(mask_large)) == 0)
+        large.append(hits + start)
+        small.append(hits[(fps[hits] & np.uint64(mask_small)) == 0] + start)
+    del source
+    return [np.concatenate(positions).tolist() if positions else [] for positions in (small, large)]
+
+
+def _first_at_least(positions, low, high):
+    """Smallest position in [low, high), or None"""
+    index = bisect.bisect_left(positions, low)
+    if index < len(positions) and positions[index] < high:
+        return positions[index]
+    return None
+
+
+class FastCDC:
+    """FastCDC chunker; split() turns an iterable of byte blocks into content-defined chunks"""
+
+    def __init__(self, min_size=MIN_CHUNK_SIZE, avg_size=AVG_CHUNK_SIZE, max_size=MAX_CHUNK_SIZE):
+        if not 0 < min_size <= avg_size <= max_size:
+            raise ValueError("Chunk sizes must satisfy 0 < min <= avg <= max")
+        self.min_size = min_size
+        self.avg_size = avg_size
+        self.max_size = max_size
+        bits = max(1, avg_size.bit_length() - 1)
+        # Normalized chunking: harder to cut before avg_size, easier after
+        self.mask_small = _mask(bits + 2)
+        self.mask_large = _mask(max(1, bits - 2))
+
+    def cut(self, data, start, end):
+        """Length of the chunk that starts at data[start], looking at most at data[start:end]"""
+        n = end - start
+        if n <= self.min_size:
+            return n
+        n = min(n, self.max_size)
+        normal = min(n, self.avg_size)
+        gear, mask_small, mask_large = GEAR, self.mask_small, self.mask_large
+        fp = 0
+        i = start + self.min_size
+        stop = start + normal
+        while i < stop:
+            fp = ((fp << 1) + gear[data[i]]) & _U64
+            if not fp & mask_small:
+                return i - start + 1
+            i += 1
+        stop = start + n
+        while i < stop:
+            fp = ((fp << 1) + gear[data[i]]) & _U64
+            if not fp & mask_large:
+                return i - start + 1
+            i += 1
+        return n
+
+    def cut_fast(self, data, candidates, start, end):
+        """cut() using gear_candidates(data, mask_small, mask_large)"""
+        n = end - start
+        if n <= self.min_size:
+            return n
+        n = min(n, self.max_size)
+        normal = start + min(n, self.avg_size)
+        stop = start + n
+        i = start + self.min_size
+        # Candidates use full 64-byte windows, but the chunk's hash starts at its first
+        # scanned byte; the first 63 positions are hashed one at a time
+        warm = min(i + 63, stop)
+        gear, fp = GEAR, 0
+        while i < warm:
+            fp = ((fp << 1) + gear[data[i]]) & _U64
+            if not fp & (self.mask_small if i < normal else self.mask_large):
+                return i - start + 1
+            i += 1
+        small, large = candidates
+        hit = _first_at_least(small, i, normal)
+        if hit is None:
+            hit = _first_at_least(large, max(i, normal), stop)
+        return hit - start + 1 if hit is not None else n
+
+    def split(self, blocks):
+        """Yield chunks (bytes) from an iterable of bytes-like blocks"""
+        buf = bytearray()
+        # Boundaries only depend on the max_size bytes after pos, so scanning in bigger batches changes nothing
+        batch = max(SCAN_SIZE, self.max_size) if NUMPY_AVAILABLE else self.max_size
+        for block in blocks:
+            buf += block
+            if len(buf) < batch:
+                continue
+            yield from self._cut_all(buf, final=False)
+        yield from self._cut_all(buf, final=True)
+
+    def _cut_all(self, buf, final):
+        """Yield the chunks in buf (all of them if final, else while max_size bytes remain) and drop them"""
+        pos = 0
+        candidates = None
+        if NUMPY_AVAILABLE and buf:
+            candidates = gear_candidates(buf, self.mask_small, self.mask_large)
+        while len(buf) - pos >= (1 if final else self.max_size):
+            if candidates is None:
+                size = self.cut(buf, pos, len(buf))
+            else:
+                size = self.cut_fast(buf, candidates, pos, len(buf))
+            yield bytes(buf[pos:pos + size])
+            pos += size
+        del buf[:pos]
+
+
+class DedupStore:
+    """Stores files as convergently encrypted chunks in IPFS, shared across uploads"""
+
+    def __init__(self, ipfs, secret, min_size=MIN_CHUNK_SIZE, avg_size=AVG_CHUNK_SIZE, max_size=MAX_CHUNK_SIZE):
+        if isinstance(secret, str):
+            secret = secret.encode()
+        self.ipfs = ipfs
+        # Reading needs no secret (manifests carry the chunk keys); storing does
+        self.secret = secret or None
+        self.chunker = FastCDC(min_size, avg_size, max_size)
+        # chunk hash -> number of manifests referencing it
+        self.chunk_refs = {}
+        self.lock = threading.Lock()
+        self.logical_bytes = 0
+        self.stored_bytes = 0
+        self.chunks_written = 0
+        self.chunks_reused = 0
+        print(f"✅ Dedup store initialized (FastCDC {min_size // 1024}/{avg_size // 1024}/{max_size // 1024} KB)")
+
+    def chunk_key(self, chunk):
+        """Convergent key: same content and secret, same key"""
+        if self.secret is None:
+            raise RuntimeError("Dedup secret is not configured; set DEDUP_SECRET")
+        return hmac.new(self.secret, chunk, hashlib.sha256).digest()
+
+    def _store_chunk(self, chunk, store):
+        key = self.chunk_key(chunk)
+        sealed = AESGCM(key).encrypt(CHUNK_NONCE, chunk, None)
+        chunk_hash = store(sealed)
+        with self.lock:
+            self.logical_bytes += len(chunk)
+            if chunk_hash in self.chunk_refs:
+                self.chunk_refs[chunk_hash] += 1
+                self.chunks_reused += 1
+            else:
+                self.chunk_refs[chunk_hash] = 1
+                self.chunks_written += 1
+                self.stored_bytes += len(sealed)
+        return [chunk_hash, key.hex(), len(chunk)]
+
+    def put(self, blocks, store=None):
+        """Chunk, seal and store an iterable of plaintext blocks; returns the manifest dict
+
+        store(sealed) -> hash replaces ipfs.add, e.g. to take a reference as each chunk lands.
+        """
+        store = store or self.ipfs.add
+        entries = [self._store_chunk(chunk, store) for chunk in self.chunker.split(blocks)]
+        return {
+            'version': MANIFEST_VERSION,
+            'size': sum(entry[2] for entry in entries),
+            'chunks': entries,
+        }
+
+    def get(self, manifest):
+        """Yield the plaintext chunks listed in manifest, in order"""
+        if manifest.get('version') != MANIFEST_VERSION:
+            raise ValueError(f"Unsupported dedup manifest version: {manifest.get('version')}")
+        for chunk_hash, key_hex, size in manifest['chunks']:
+            chunk = AESGCM(bytes.fromhex(key_hex)).decrypt(CHUNK_NONCE, bytes(self.ipfs.get(chunk_hash)), None)
+            if len(chunk) != size:
+                raise ValueError(f"Dedup chunk {chunk_hash} has unexpected size")
+            yield chunk
+
+    def restore(self, record):
+        """Count the chunks of a file record stored before a restart, as the sweeper does for blobs"""
+        chunk_hashes = record.get('chunks') or []
+        sizes = record.get('chunk_sizes')
+        with self.lock:
+            for index, chunk_hash in enumerate(chunk_hashes):
+                if chunk_hash in self.chunk_refs:
+                    self.chunk_refs[chunk_hash] += 1
+                else:
+                    self.chunk_refs[chunk_hash] = 1
+                    if sizes:
+                        self.stored_bytes += sizes[index] + CHUNK_TAG_SIZE
+            # Byte totals only from records that list their chunk sizes, so the ratio stays honest
+            if sizes:
+                self.logical_bytes += sum(sizes)
+
+    def release(self, manifest):
+        """Drop one reference per chunk in manifest; returns hashes no manifest uses any more"""
+        return self.release_chunks([entry[0] for entry in manifest['chunks']])
+
+    def release_chunks(self, chunk_hashes):
+        """release() for a list of chunk hashes, as kept in file records"""
+        orphaned = []
+        with self.lock:
+            for chunk_hash in chunk_hashes:
+                refs = self.chunk_refs.get(chunk_hash, 0) - 1
+                if refs > 0:
+                    self.chunk_refs[chunk_hash] = refs
+                elif chunk_hash in self.chunk_refs:
+                    del self.chunk_refs[chunk_hash]
+                    orphaned.append(chunk_hash)
+        return orphaned
+
+    def stats(self):
+        with self.lock:
+            return {
+                'logical_bytes': self.logical_bytes,
+                'stored_bytes': self.stored_bytes,
+                'unique_chunks': len(self.chunk_refs),
+                'chunks_written': self.chunks_written,
+                'chunks_reused': self.chunks_reused,
+                'dedup_ratio': round(self.logical_bytes / self.stored_bytes, 3) if self.stored_bytes else 1.0,
+            }
+
+
+def sealed_size(manifest):
+    """Bytes the manifest's chunks occupy in IPFS, counting shared chunks once per file"""
+    return manifest['size'] + CHUNK_TAG_SIZE * len(manifest['chunks'])
+
+
+def pack_manifest(manifest):
+    return json.dumps(manifest, separators=(",", ":")).encode()
+
+
+def unpack_manifest(data):
+    return json.loads(bytes(data).decode())
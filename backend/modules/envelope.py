@@ -0,0 +1,115 @@
+# modules/envelope.py - Versioned binary envelope for encrypted blobs
+#
+# Layout (all integers big-endian):
+#   magic "SFSE" | version u8 | flags u8 | header_len u32
+#   header: key_scheme u8 | cipher u8 | codec u8 (v2+) | segment_size u32
+#           | nonce_prefix_len u8 | nonce_prefix
+#           | key_len u16 | key
+#           | policy_len u32 | policy (UTF-8 JSON)
+#   payload: sealed segments (see stream_cipher.py) of the codec-compressed plaintext
+#
+# Version 1 headers have no codec byte and are read as uncompressed.
+
+import json
+import struct
+
+MAGIC = b"SFSE"
+VERSION = 2
+SUPPORTED_VERSIONS = (1, 2)
+
+KEY_SCHEME_RAW = 0
+KEY_SCHEME_CPABE = 1   # key field holds a CP-ABE-wrapped data key (cpabe_hybrid.py)
+CIPHER_AES_256_GCM_STREAM = 1
+
+PREFIX = struct.Struct(">4sBBI")
+FIXED_V1 = struct.Struct(">BBI")
+FIXED = struct.Struct(">BBBI")
+MAX_HEADER_SIZE = 64 * 1024
+
+
+class EnvelopeHeader:
+    """Decoded envelope header: data-key material, cipher parameters and policy"""
+
+    def __init__(self, key, nonce_prefix, segment_size, policy,
+                 key_scheme=KEY_SCHEME_RAW, cipher=CIPHER_AES_256_GCM_STREAM, flags=0, codec=0):
+        self.key = key
+        self.nonce_prefix = nonce_prefix
+        self.segment_size = segment_size
+        self.policy = policy
+        self.key_scheme = key_scheme
+        self.cipher = cipher
+        self.flags = flags
+        self.codec = codec
+
+    def pack(self):
+        """Serialize to bytes; the payload follows directly after"""
+        policy = json.dumps(self.policy, separators=(",", ":")).encode()
+        body = b"".join([
+            FIXED.pack(self.key_scheme, self.cipher, self.codec, self.segment_size),
+            struct.pack(">B", len(self.nonce_prefix)), self.nonce_prefix,
+            struct.pack(">H", len(self.key)), self.key,
+            struct.pack(">I", len(policy)), policy,
+        ])
+        return PREFIX.pack(MAGIC, VERSION, self.flags, len(body)) + body
+
+
+def is_envelope(data):
+    """True if data starts with the envelope magic"""
+    return bytes(data[:len(MAGIC)]) == MAGIC
+
+
+def parse_header(data):
+    """
+    Parse the envelope header at the start of data (bytes, bytearray or memoryview).
+    Returns (EnvelopeHeader, payload_offset), or None if more bytes are needed.
+    The payload itself is never touched, so callers can slice it out of a memoryview.
+    """
+    view = memoryview(data)
+    if len(view) < PREFIX.size:
+        return None
+
+    magic, version, flags, header_len = PREFIX.unpack_from(view, 0)
+    if magic != MAGIC:
+        raise ValueError("Invalid encrypted format: bad envelope magic")
+    if version not in SUPPORTED_VERSIONS:
+        raise ValueError(f"Unsupported envelope version: {version}")
+    if header_len > MAX_HEADER_SIZE:
+        raise ValueError("Invalid encrypted format: header too large")
+
+    end = PREFIX.size + header_len
+    if len(view) < end:
+        return None
+
+    try:
+        offset = PREFIX.size
+        if version == 1:
+            key_scheme, cipher, segment_size = FIXED_V1.unpack_from(view, offset)
+            codec = 0
+            offset += FIXED_V1.size
+        else:
+            key_scheme, cipher, codec, segment_size = FIXED.unpack_from(view, offset)
+            offset += FIXED.size
+
+        (prefix_len,) = struct.unpack_from(">B", view, offset)
+        offset += 1
+        nonce_prefix = bytes(view[offset:offset + prefix_len])
+        offset += prefix_len
+
+        (key_len,) = struct.unpack_from(">H", view, offset)
+        offset += 2
+        key = bytes(view[offset:offset + key_len])
+        offset += key_len
+
+        (policy_len,) = struct.unpack_from(">I", view, offset)
+        offset += 4
+        policy = json.loads(bytes(view[offset:offset + policy_len]).decode())
+        offset += policy_len
+    except struct.error:
+        raise ValueError("Invalid encrypted format: truncated envelope header")
+
+    if offset != end:
+        raise ValueError("Invalid encrypted format: header length mismatch")
+
+    header = EnvelopeHeader(key, nonce_prefix, segment_size, policy,
+                            key_scheme=key_scheme, cipher=cipher, flags=flags, codec=codec)
+    return header, end
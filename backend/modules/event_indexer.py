@@ -0,0 +1,247 @@
+# modules/event_indexer.py - Follow FileSharing contract events into a local index
+#
+# A background thread pulls FileShared / FileAccessed / UserRegistered logs with
+# eth_getLogs in block ranges and keeps them in dicts, so metadata lookups never
+# go to the node. Events carry only part of the state (indexed strings like the
+# cid are hashed, the access policy and public key aren't emitted), so each new
+# event's transaction is fetched once and its call arguments decoded.
+#
+# Reorgs: the hash of every indexed block that matters is remembered for the
+# last reorg_depth blocks. Before each sync the newest one is compared with the
+# chain; on a mismatch the indexer walks back to the newest block that still
+# matches, drops everything it indexed above it, and re-reads from there.
+#
+# The index only counts as synced while it is within max_lag blocks of the head
+# and the last successful poll is under stale_after seconds old; a failed poll
+# clears it at once. Callers fall back to the node whenever it isn't synced.
+
+import threading
+import time
+
+from eth_utils import event_abi_to_log_topic
+from web3 import Web3
+
+EVENT_NAMES = ('FileShared', 'FileAccessed', 'UserRegistered')
+
+
+def _hex(value):
+    return value if isinstance(value, str) else Web3.to_hex(value)
+
+
+class EventIndexer:
+    """Local, reorg-aware index of contract events; reads are dict lookups"""
+
+    def __init__(self, w3, contract, start_block=0, poll_interval=1.0, max_range=2000,
+                 confirmations=0, reorg_depth=64, max_lag=0, stale_after=10.0):
+        self.w3 = w3
+        self.contract = contract
+        self.start_block = start_block
+        self.poll_interval = poll_interval
+        self.max_range = max_range
+        self.confirmations = confirmations
+        self.reorg_depth = reorg_depth
+        self.max_lag = max_lag
+        self.stale_after = stale_after
+        self.topics = {}   # topic0 hex -> event name
+        for abi in contract.abi:
+            if abi.get('type') == 'event' and abi['name'] in EVENT_NAMES:
+                self.topics[_hex(event_abi_to_log_topic(abi))] = abi['name']
+        self.files = {}          # cid (or hashed-cid topic) -> metadata
+        self.users = {}          # address -> user info
+        self.accesses = {}       # cid -> [access events]
+        self.block_hashes = {}   # block number -> hash, recent indexed blocks
+        self.added = {}          # block number -> [(table, key, entry)] for rollback
+        self.last_block = start_block - 1
+        self.in_sync = False     # caught up as of synced_at
+        self.synced_at = 0.0
+        self.sync_failures = 0
+        self.reorgs = 0
+        self.events_indexed = 0
+        self.lock = threading.Lock()
+        self.stop_event = threading.Event()
+        self.thread = None
+
+    # ---- reads ----
+
+    @property
+    def synced(self):
+        """True while index reads can stand in for the node"""
+        return self.in_sync and time.monotonic() - self.synced_at <= self.stale_after
+
+    def get_file(self, cid):
+        with self.lock:
+            entry = self.files.get(cid) or self.files.get(_hex(Web3.keccak(text=cid)))
+            return dict(entry, indexed_block=self.last_block) if entry else None
+
+    def get_user(self, address):
+        with self.lock:
+            entry = self.users.get(Web3.to_checksum_address(address))
+            return dict(entry, indexed_block=self.last_block) if entry else None
+
+    def get_accesses(self, cid):
+        with self.lock:
+            return [dict(entry) for entry in self.accesses.get(cid, [])]
+
+    # ---- sync ----
+
+    def _block_hash(self, number):
+        try:
+            return _hex(self.w3.eth.get_block(number)['hash'])
+        except Exception:
+            return None   # beyond the head of a chain that got shorter
+
+    def _check_reorg(self):
+        """Roll back to the newest remembered block that is still on the chain"""
+        with self.lock:
+            remembered = sorted(self.block_hashes.items(), reverse=True)
+        if not remembered:
+            return
+        for number, block_hash in remembered:
+            if self._block_hash(number) == block_hash:
+                if number != self.last_block:
+                    self._rollback(number)
+                return
+        # Forked deeper than we remember: start over
+        self._rollback(self.start_block - 1)
+
+    def _rollback(self, number):
+        with self.lock:
+            for block in [b for b in self.added if b > number]:
+                for table, key, entry in self.added.pop(block):
+                    if table is self.accesses:
+                        self.accesses[key].remove(entry)
+                        if not self.accesses[key]:
+                            del self.accesses[key]
+                    else:
+                        table.pop(key, None)
+            if number < self.start_block:
+                self.files.clear()
+                self.users.clear()
+                self.accesses.clear()
+                self.added.clear()
+            for block in [b for b in self.block_hashes if b > number]:
+                del self.block_hashes[block]
+            self.last_block = number
+            self.reorgs += 1
+        print(f"⚠️ Chain reorganized: event index rolled back to block {number}")
+
+    def _call_args(self, tx_hash, cache):
+        """(sender, decoded call arguments) of the transaction that emitted a log"""
+        if tx_hash not in cache:
+            tx = self.w3.eth.get_transaction(tx_hash)
+            try:
+                _, params = self.contract.decode_function_input(tx['input'])
+            except Exception:
+                params = {}
+            cache[tx_hash] = (tx['from'], params)
+        return cache[tx_hash]
+
+    def _entries(self, logs):
+        """Decode a range's logs into (table, key, entry, block number, block hash) without touching the index"""
+        entries = []
+        cache = {}
+        for log in logs:
+            name = self.topics.get(_hex(log['topics'][0]))
+            if name is None:
+                continue
+            args = getattr(self.contract.events, name)().process_log(log)['args']
+            tx_hash = _hex(log['transactionHash'])
+            sender, params = self._call_args(tx_hash, cache)
+            block = (log['blockNumber'], _hex(log['blockHash']))
+            base = {'block_number': block[0], 'tx_hash': tx_hash}
+            if name == 'UserRegistered':
+                entries.append((self.users, args['userAddress'], dict(
+                    base, bcid=args['bcid'], publicKey=params.get('_publicKey'),
+                    isRegistered=True, timestamp=args['timestamp'])) + block)
+            else:
+                # Indexed strings arrive hashed; the call arguments give the cid back
+                cid = params.get('_cid') or _hex(args['cid'])
+                if name == 'FileShared':
+                    entries.append((self.files, cid, dict(
+                        base, owner=sender, owner_bcid=args['owner'], cid=cid,
+                        access_policy=params.get('_accessPolicy'), timestamp=args['timestamp'],
+                        is_active=True)) + block)
+                else:
+                    entries.append((self.accesses, cid, dict(
+                        base, accessor=args['accessor'], timestamp=args['timestamp'])) + block)
+        return entries
+
+    def sync_once(self):
+        """Index everything up to the current head (minus confirmations); returns events added"""
+        try:
+            return self._sync()
+        except Exception:
+            self.in_sync = False
+            self.sync_failures += 1
+            raise
+
+    def _sync(self):
+        self._check_reorg()
+        head = self.w3.eth.block_number - self.confirmations
+        added = 0
+        while self.last_block < head:
+            start = self.last_block + 1
+            end = min(head, start + self.max_range - 1)
+            end_hash = self._block_hash(end)
+            logs = self.w3.eth.get_logs({
+                'address': self.contract.address,
+                'fromBlock': start,
+                'toBlock': end,
+                'topics': [list(self.topics)]
+            })
+            # A reorg between the two reads would mix chains; re-check on the next pass
+            if end_hash is None or self._block_hash(end) != end_hash:
+                break
+            entries = self._entries(logs)
+            with self.lock:
+                for table, key, entry, block, block_hash in entries:
+                    if table is self.accesses:
+                        self.accesses.setdefault(key, []).append(entry)
+                    else:
+                        table[key] = entry
+                    self.added.setdefault(block, []).append((table, key, entry))
+                    self.block_hashes[block] = block_hash
+                self.block_hashes[end] = end_hash
+                self.last_block = end
+                for block in [b for b in self.block_hashes if b <= end - self.reorg_depth]:
+                    del self.block_hashes[block]
+                for block in [b for b in self.added if b <= end - self.reorg_depth]:
+                    del self.added[block]
+                self.events_indexed += len(entries)
+            added += len(entries)
+        # The chain kept moving while we read; measure lag against where it is now
+        head = self.w3.eth.block_number - self.confirmations
+        self.in_sync = head - self.last_block <= self.max_lag
+        if self.in_sync:
+            self.synced_at = time.monotonic()
+        return added
+
+    def _run(self):
+        while not self.stop_event.is_set():
+            try:
+                self.sync_once()
+            except Exception as e:
+                print(f"⚠️ Event index sync failed: {e}")
+            self.stop_event.wait(self.poll_interval)
+
+    def start(self):
+        self.thread = threading.Thread(target=self._run, daemon=True, name="event-indexer")
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.stop_event.set()
+        if self.thread is not None:
+            self.thread.join()
+
+    def stats(self):
+        with self.lock:
+            return {
+                'indexed_block': self.last_block,
+                'synced': self.synced,
+                'sync_failures': self.sync_failures,
+                'files': len(self.files),
+                'users': len(self.users),
+                'events_indexed': self.events_indexed,
+                'reorgs': self.reorgs
+            }
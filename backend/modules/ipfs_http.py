@@ -0,0 +1,102 @@
+# modules/ipfs_http.py - Client for the IPFS (kubo) HTTP RPC API
+#
+# One keep-alive requests.Session is shared by all threads; its connection pool is
+# blocking, so at most pool_size requests hit the daemon at once and the rest wait
+# for a free connection instead of opening new sockets.
+
+import json
+import uuid
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+DEFAULT_CHUNK_SIZE = 1024 * 1024
+
+
+class IPFSHTTPError(Exception):
+    """The IPFS daemon rejected a request"""
+
+
+class IPFSHTTPClient:
+    """Streaming add/cat against /api/v0 over a pooled HTTP session"""
+
+    def __init__(self, host='127.0.0.1', port=5001, pool_size=10, connect_timeout=5.0,
+                 read_timeout=60.0, chunk_size=DEFAULT_CHUNK_SIZE, scheme='http'):
+        self.base_url = f"{scheme}://{host}:{port}/api/v0"
+        self.timeout = (connect_timeout, read_timeout)
+        self.chunk_size = chunk_size
+        self.session = requests.Session()
+        # Retry only failed connects: a request body that was already streamed can't be replayed
+        adapter = HTTPAdapter(
+            pool_connections=1,
+            pool_maxsize=pool_size,
+            pool_block=True,
+            max_retries=Retry(total=3, connect=3, read=0, status=0, backoff_factor=0.2),
+        )
+        self.session.mount(f"{scheme}://", adapter)
+
+    def _post(self, command, **kwargs):
+        try:
+            response = self.session.post(f"{self.base_url}/{command}", timeout=self.timeout, **kwargs)
+        except requests.RequestException as e:
+            raise IPFSHTTPError(f"IPFS {command} failed: {e}") from e
+        if response.status_code != 200:
+            try:
+                message = response.json().get('Message', response.text)
+            except ValueError:
+                message = response.text
+            response.close()
+            raise IPFSHTTPError(f"IPFS {command} failed ({response.status_code}): {message}")
+        return response
+
+    def add_stream(self, chunks, name='blob'):
+        """Upload an iterable of byte chunks as one file (chunked transfer, never buffered); returns the CID"""
+        boundary = uuid.uuid4().hex
+
+        def body():
+            yield (f"--{boundary}\r\n"
+                   f"Content-Disposition: form-data; name=\"file\"; filename=\"{name}\"\r\n"
+                   f"Content-Type: application/octet-stream\r\n\r\n").encode()
+            for chunk in chunks:
+                if chunk:
+                    yield bytes(chunk)
+            yield f"\r\n--{boundary}--\r\n".encode()
+
+        response = self._post(
+            'add',
+            params={'pin': 'true', 'quieter': 'true'},
+            data=body(),
+            headers={'Content-Type': f'multipart/form-data; boundary={boundary}'},
+        )
+        with response:
+            # One JSON object per line; the last one describes the added root
+            lines = [line for line in response.text.splitlines() if line.strip()]
+        if not lines:
+            raise IPFSHTTPError("IPFS add returned no hash")
+        return json.loads(lines[-1])['Hash']
+
+    def add(self, data, name='blob'):
+        return self.add_stream([data], name=name)
+
+    def cat(self, cid, chunk_size=None):
+        """Yield the content of cid in chunk_size pieces as they arrive"""
+        response = self._post('cat', params={'arg': cid}, stream=True)
+        with response:
+            yield from response.iter_content(chunk_size=chunk_size or self.chunk_size)
+
+    def get(self, cid):
+        return b"".join(self.cat(cid))
+
+    def unpin(self, cid):
+        """Unpin cid so the daemon's GC can reclaim it; False if it was not pinned"""
+        try:
+            self._post('pin/rm', params={'arg': cid}).close()
+            return True
+        except IPFSHTTPError as e:
+            if 'not pinned' in str(e):
+                return False
+            raise
+
+    def close(self):
+        self.session.close()
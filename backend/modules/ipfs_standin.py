@@ -0,0 +1,142 @@
+# modules/ipfs_standin.py - Minimal offline stand-in for the kubo HTTP API
+#
+# Implements just POST /api/v0/add (multipart, plain or chunked body),
+# POST /api/v0/cat?arg=<hash> and POST /api/v0/pin/rm?arg=<hash> (which drops
+# the blob right away, as if GC ran), keeping blobs in memory, so IPFSHTTPClient can
+# be tested and benchmarked without a daemon:
+#
+#   python -m modules.ipfs_standin --port 5001
+
+import argparse
+import hashlib
+import json
+import sys
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse, parse_qs
+
+CAT_CHUNK_SIZE = 256 * 1024
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'   # keep-alive, like kubo
+    disable_nagle_algorithm = True  # Go sets TCP_NODELAY; without it reused connections stall on delayed ACKs
+
+    def log_message(self, format, *args):
+        pass
+
+    def _read_body(self):
+        if self.headers.get('Transfer-Encoding', '').lower() == 'chunked':
+            parts = []
+            while True:
+                size = int(self.rfile.readline().split(b";")[0].strip(), 16)
+                if size == 0:
+                    # Trailer section ends with an empty line
+                    while self.rfile.readline() not in (b"\r\n", b"\n", b""):
+                        pass
+                    return b"".join(parts)
+                parts.append(self.rfile.read(size))
+                self.rfile.readline()
+        return self.rfile.read(int(self.headers.get('Content-Length', 0)))
+
+    def _send_json(self, status, payload):
+        body = (json.dumps(payload) + "\n").encode()
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _error(self, status, message):
+        self._send_json(status, {'Message': message, 'Code': 0, 'Type': 'error'})
+
+    def _add(self, body):
+        content_type = self.headers.get('Content-Type', '')
+        if 'boundary=' not in content_type:
+            return self._error(400, 'expected multipart/form-data')
+        boundary = content_type.split('boundary=', 1)[1].strip('"').encode()
+        start = body.find(b"\r\n\r\n", body.find(b"--" + boundary))
+        end = body.rfind(b"\r\n--" + boundary)
+        if start < 0 or end < start:
+            return self._error(400, 'malformed multipart body')
+        data = body[start + 4:end]
+        cid = 'Qm' + hashlib.sha256(data).hexdigest()
+        with self.server.lock:
+            self.server.blobs[cid] = data
+        self._send_json(200, {'Name': cid, 'Hash': cid, 'Size': str(len(data))})
+
+    def _cat(self, cid):
+        with self.server.lock:
+            data = self.server.blobs.get(cid)
+        if data is None:
+            return self._error(500, f'block was not found locally (offline): {cid}')
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/plain')
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        view = memoryview(data)
+        for offset in range(0, len(view), CAT_CHUNK_SIZE):
+            self.wfile.write(view[offset:offset + CAT_CHUNK_SIZE])
+
+    def do_POST(self):
+        url = urlparse(self.path)
+        args = parse_qs(url.query)
+        body = self._read_body()
+        if url.path == '/api/v0/add':
+            self._add(body)
+        elif url.path == '/api/v0/cat':
+            if 'arg' not in args:
+                return self._error(400, 'argument "ipfs-path" is required')
+            self._cat(args['arg'][0])
+        elif url.path == '/api/v0/pin/rm':
+            cid = args.get('arg', [''])[0]
+            with self.server.lock:
+                removed = self.server.blobs.pop(cid, None)
+            if removed is None:
+                return self._error(500, 'not pinned or pinned indirectly')
+            self._send_json(200, {'Pins': [cid]})
+        else:
+            self._error(404, f'unknown command: {url.path}')
+
+
+class StandInIPFSServer(ThreadingHTTPServer):
+    """In-memory kubo stand-in; port 0 picks a free port (see .port)"""
+
+    daemon_threads = True
+
+    def __init__(self, host='127.0.0.1', port=0):
+        super().__init__((host, port), _Handler)
+        self.blobs = {}
+        self.lock = threading.Lock()
+
+    @property
+    def port(self):
+        return self.server_address[1]
+
+    def start(self):
+        """Serve from a daemon thread and return self"""
+        threading.Thread(target=self.serve_forever, daemon=True, name='ipfs-standin').start()
+        return self
+
+    def handle_error(self, request, client_address):
+        # A client that abandons a cat mid-stream resets its connection; that's not a server fault
+        if not isinstance(sys.exc_info()[1], ConnectionError):
+            super().handle_error(request, client_address)
+
+    def stop(self):
+        self.shutdown()
+        self.server_close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Offline stand-in for the IPFS add/cat HTTP API')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=5001)
+    args = parser.parse_args()
+    server = StandInIPFSServer(args.host, args.port)
+    print(f"✅ IPFS stand-in listening on http://{args.host}:{server.port}/api/v0")
+    server.serve_forever()
+
+
+if __name__ == '__main__':
+    main()
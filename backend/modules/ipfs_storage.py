@@ -1,47 +1,167 @@
-# modules/ipfs_storage.py - Stub Implementation for Local Testing
+# modules/ipfs_storage.py - Blob storage: in-memory stub, local disk store, or an IPFS daemon over HTTP
 
 import json
 import base64
 import hashlib
 from datetime import datetime
 
+from modules.blob_store import DiskBlobStore
+from modules.blob_cache import BlobCache
+
+CAT_CHUNK_SIZE = 1024 * 1024
+
 class IPFSManager:
-    """Stub IPFS manager for local testing"""
-    
-    def __init__(self):
-        print("✅ IPFS Storage Manager initialized")
+    """IPFS manager: in-memory stub (default), disk-backed ('disk') or a real daemon over HTTP ('http')"""
+
+    def __init__(self, backend='memory', root='data/blobs', host='127.0.0.1', port=5001,
+                 pool_size=10, connect_timeout=5.0, read_timeout=60.0, cache_bytes=0, cache_object_bytes=None):
         self.storage = {}
-    
+        self.blob_store = DiskBlobStore(root) if backend == 'disk' else None
+        self.client = None
+        self.cache = None
+        if backend == 'http':
+            # Imported lazily so the stub backends don't need requests
+            from modules.ipfs_http import IPFSHTTPClient
+            self.client = IPFSHTTPClient(host, port, pool_size=pool_size,
+                                         connect_timeout=connect_timeout, read_timeout=read_timeout)
+            print(f"✅ IPFS Storage Manager initialized ({self.client.base_url}, pool {pool_size})")
+            # Only remote reads are worth caching; the local backends already serve from memory/page cache
+            if cache_bytes > 0:
+                self.cache = BlobCache(cache_bytes, max_object_bytes=cache_object_bytes)
+                print(f"✓ Hot-object cache: {cache_bytes // (1024 * 1024)} MB")
+        else:
+            print("✅ IPFS Storage Manager initialized")
+
+    def _key(self, hash_value):
+        # Remove 'Qm' prefix if present
+        return hash_value[2:] if hash_value.startswith('Qm') else hash_value
+
     def add(self, data):
         """Add data to IPFS and return hash"""
         try:
-            if isinstance(data, bytes):
+            if self.client is not None or self.blob_store is not None:
+                if not isinstance(data, (bytes, bytearray, memoryview)):
+                    data = str(data).encode()
+            if self.client is not None:
+                ipfs_hash = self.client.add(data)
+                print(f"✅ Data stored with IPFS hash: {ipfs_hash}")
+                return ipfs_hash
+            if self.blob_store is not None:
+                file_hash = self.blob_store.add(data)
+                print(f"✅ Data stored with IPFS hash: Qm{file_hash}")
+                return f"Qm{file_hash}"
+
+            if isinstance(data, (bytes, bytearray, memoryview)):
                 file_hash = hashlib.sha256(data).hexdigest()[:16]
             else:
                 file_hash = hashlib.sha256(str(data).encode()).hexdigest()[:16]
-            
+
             self.storage[file_hash] = {
                 'data': data,
                 'timestamp': datetime.now().isoformat(),
-                'size': len(data) if isinstance(data, bytes) else len(str(data))
+                'size': len(data) if isinstance(data, (bytes, bytearray, memoryview)) else len(str(data))
             }
             print(f"✅ Data stored with IPFS hash: Qm{file_hash}")
             return f"Qm{file_hash}"
         except Exception as e:
             print(f"❌ Error storing in IPFS: {str(e)}")
             raise
-    
+
+    def add_stream(self, chunks):
+        """Add an iterable of byte chunks and return hash; the disk backend never buffers the whole blob"""
+        try:
+            if self.client is not None:
+                ipfs_hash = self.client.add_stream(chunks)
+                print(f"✅ Data streamed with IPFS hash: {ipfs_hash}")
+                return ipfs_hash
+            if self.blob_store is not None:
+                file_hash = self.blob_store.add_stream(chunks)
+                print(f"✅ Data streamed with IPFS hash: Qm{file_hash}")
+                return f"Qm{file_hash}"
+            return self.add(b"".join(chunks))
+        except Exception as e:
+            print(f"❌ Error storing in IPFS: {str(e)}")
+            raise
+
     def get(self, hash_value):
         """Retrieve data from IPFS"""
         try:
-            # Remove 'Qm' prefix if present
-            key = hash_value.replace('Qm', '') if hash_value.startswith('Qm') else hash_value
-            
-            if key in self.storage:
-                return self.storage[key]['data']
+            if self.client is not None:
+                if self.cache is not None:
+                    return self.cache.get_or_fetch(hash_value, lambda: self.client.get(hash_value))
+                return self.client.get(hash_value)
+
+            key = self._key(hash_value)
+
+            # Read directly rather than check first: the sweeper may delete a blob in between.
+            # A key that isn't a disk digest (e.g. a short stub hash) can't be stored either
+            if self.blob_store is not None:
+                try:
+                    return self.blob_store.get(key)
+                except (FileNotFoundError, ValueError):
+                    pass
             else:
-                print(f"❌ Hash not found in IPFS: {hash_value}")
-                raise Exception(f"IPFS hash not found: {hash_value}")
+                entry = self.storage.get(key)
+                if entry is not None:
+                    return entry['data']
+
+            print(f"❌ Hash not found in IPFS: {hash_value}")
+            raise FileNotFoundError(f"IPFS hash not found: {hash_value}")
         except Exception as e:
             print(f"❌ Error retrieving from IPFS: {str(e)}")
             raise
+
+    def delete(self, hash_value):
+        """Remove stored data (unpin it on a daemon); returns False if it was not stored"""
+        try:
+            if self.client is not None:
+                if self.cache is not None:
+                    self.cache.discard(hash_value)
+                removed = self.client.unpin(hash_value)
+            elif self.blob_store is not None:
+                removed = self.blob_store.delete(self._key(hash_value))
+            else:
+                removed = self.storage.pop(self._key(hash_value), None) is not None
+            if removed:
+                print(f"✅ Data removed from IPFS: {hash_value}")
+            return removed
+        except Exception as e:
+            print(f"❌ Error deleting from IPFS: {str(e)}")
+            raise
+
+    def cat(self, hash_value, chunk_size=CAT_CHUNK_SIZE):
+        """Yield stored data in chunks; the HTTP backend streams it as it arrives"""
+        if self.client is not None:
+            if self.cache is not None:
+                return self._cat_cached(hash_value, chunk_size)
+            return self.client.cat(hash_value, chunk_size)
+        data = memoryview(self.get(hash_value))
+        return (data[offset:offset + chunk_size] for offset in range(0, len(data), chunk_size))
+
+    def _cat_cached(self, hash_value, chunk_size):
+        data = self.cache.get(hash_value)
+        if data is not None:
+            view = memoryview(data)
+            for offset in range(0, len(view), chunk_size):
+                yield view[offset:offset + chunk_size]
+            return
+        # Stream from the daemon, teeing a copy into the cache. The copy gives up (and
+        # frees its share of the fill budget) as soon as the object outgrows what's left
+        parts = [] if self.cache.begin_fill(hash_value) else None
+        reserved = 0
+        complete = False
+        try:
+            for chunk in self.client.cat(hash_value, chunk_size):
+                if parts is not None:
+                    if reserved + len(chunk) <= self.cache.max_object_bytes and self.cache.reserve_fill(len(chunk)):
+                        reserved += len(chunk)
+                        parts.append(chunk)
+                    else:
+                        parts = None
+                        self.cache.end_fill(hash_value, reserved)
+                        reserved = 0
+                yield chunk
+            complete = True
+        finally:
+            if parts is not None:
+                self.cache.end_fill(hash_value, reserved, b"".join(parts) if complete else None)
@@ -0,0 +1,90 @@
+# modules/key_cache.py - Bounded LRU + TTL cache for derived attribute keys
+
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future
+
+
+class KeyCache:
+    """
+    Thread-safe LRU cache with per-entry TTL and single-flight computation.
+    Concurrent misses on the same key wait for one computation instead of repeating it.
+    """
+
+    def __init__(self, max_entries=1024, ttl_seconds=3600, clock=time.monotonic):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.clock = clock
+        self.entries = OrderedDict()   # key -> (expires_at, value)
+        self.inflight = {}             # key -> Future
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key):
+        """Return the cached value or None (expired entries are dropped)"""
+        with self.lock:
+            return self._lookup(key)
+
+    def _lookup(self, key):
+        entry = self.entries.get(key)
+        if entry is None:
+            return None
+        expires_at, value = entry
+        if expires_at <= self.clock():
+            del self.entries[key]
+            self.evictions += 1
+            return None
+        self.entries.move_to_end(key)
+        return value
+
+    def put(self, key, value):
+        with self.lock:
+            self._store(key, value)
+
+    def _store(self, key, value):
+        self.entries[key] = (self.clock() + self.ttl_seconds, value)
+        self.entries.move_to_end(key)
+        while len(self.entries) > self.max_entries:
+            self.entries.popitem(last=False)
+            self.evictions += 1
+
+    def get_or_compute(self, key, compute):
+        """Return the cached value for key, calling compute() at most once across threads"""
+        with self.lock:
+            value = self._lookup(key)
+            if value is not None:
+                self.hits += 1
+                return value
+            self.misses += 1
+            future = self.inflight.get(key)
+            owner = future is None
+            if owner:
+                future = self.inflight[key] = Future()
+
+        if not owner:
+            return future.result()
+
+        try:
+            value = compute()
+        except BaseException as e:
+            with self.lock:
+                del self.inflight[key]
+            future.set_exception(e)
+            raise
+        with self.lock:
+            self._store(key, value)
+            del self.inflight[key]
+        future.set_result(value)
+        return value
+
+    def stats(self):
+        with self.lock:
+            return {
+                'entries': len(self.entries),
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions
+            }
@@ -0,0 +1,57 @@
+# modules/merkle.py - Binary SHA-256 Merkle trees with inclusion proofs
+#
+# Leaves and interior nodes are hashed with different prefixes (0x00 / 0x01), so
+# an interior node can never be passed off as a leaf. A node without a sibling
+# is carried up unchanged rather than paired with itself, which keeps two
+# different leaf lists from producing the same root.
+
+import hashlib
+
+LEAF_PREFIX = b'\x00'
+NODE_PREFIX = b'\x01'
+
+
+def leaf_hash(data):
+    return hashlib.sha256(LEAF_PREFIX + data).digest()
+
+
+def node_hash(left, right):
+    return hashlib.sha256(NODE_PREFIX + left + right).digest()
+
+
+def build_levels(leaves):
+    """All levels of the tree over leaf hashes, leaves first and the root last"""
+    if not leaves:
+        raise ValueError("Merkle tree needs at least one leaf")
+    levels = [list(leaves)]
+    while len(levels[-1]) > 1:
+        level = levels[-1]
+        parent = [node_hash(level[i], level[i + 1]) for i in range(0, len(level) - 1, 2)]
+        if len(level) % 2:
+            parent.append(level[-1])
+        levels.append(parent)
+    return levels
+
+
+def merkle_root(levels):
+    return levels[-1][0]
+
+
+def inclusion_proof(levels, index):
+    """Sibling path for leaf index as [[side, hex hash], ...], side being where the sibling sits"""
+    proof = []
+    for level in levels[:-1]:
+        sibling = index ^ 1
+        if sibling < len(level):
+            proof.append(['L' if sibling < index else 'R', level[sibling].hex()])
+        index //= 2
+    return proof
+
+
+def verify_proof(leaf, proof, root):
+    """True if leaf (a leaf hash) is included under root (bytes or hex) via proof"""
+    node = leaf
+    for side, sibling in proof:
+        sibling = bytes.fromhex(sibling)
+        node = node_hash(sibling, node) if side == 'L' else node_hash(node, sibling)
+    return node == (bytes.fromhex(root) if isinstance(root, str) else root)
@@ -0,0 +1,283 @@
+# modules/policy.py - Compiled access policies over interned attribute bitsets
+#
+# Policies come in two shapes:
+#   dict:   {'role': ['manager', 'hr'], 'dept': 'IT'}   (every key must match one value)
+#   string: "(role:manager or role:hr) and dept:IT"
+# Both compile to the same predicate tree. Each compiled policy interns its own
+# attribute pairs to bit positions, so evaluation is a handful of integer AND
+# operations per request, and the table is bounded by the policy's size (at most
+# MAX_POLICY_ATTRIBUTES) and freed with it when it leaves the compile cache.
+
+import json
+import re
+from functools import lru_cache
+
+# Distinct key:value pairs one policy may name
+MAX_POLICY_ATTRIBUTES = 256
+
+
+def _normalize(key, value):
+    return f"{str(key).strip().lower()}:{str(value).strip().lower()}"
+
+
+class AttributeInterner:
+    """Assigns each distinct key:value pair of one policy a bit position"""
+
+    def __init__(self):
+        self.bits = {}
+
+    def intern(self, key, value):
+        name = _normalize(key, value)
+        bit = self.bits.get(name)
+        if bit is None:
+            if len(self.bits) >= MAX_POLICY_ATTRIBUTES:
+                raise ValueError(f"Policy names more than {MAX_POLICY_ATTRIBUTES} attributes")
+            bit = self.bits[name] = 1 << len(self.bits)
+        return bit
+
+    def mask(self, attributes):
+        """
+        Bitset for a user's attributes. Pairs the policy doesn't mention are skipped,
+        so user input never grows the table.
+        """
+        bits = 0
+        lookup = self.bits.get
+        for key, value in attributes.items():
+            values = value if isinstance(value, (list, tuple, set)) else [value]
+            for v in values:
+                bit = lookup(_normalize(key, v))
+                if bit is not None:
+                    bits |= bit
+        return bits
+
+
+# ============== Predicate nodes ==============
+
+class AllOf:
+    """Every bit in mask must be present"""
+    __slots__ = ('mask',)
+
+    def __init__(self, mask):
+        self.mask = mask
+
+    def matches(self, bits):
+        return bits & self.mask == self.mask
+
+
+class AnyOf:
+    """At least one bit in mask must be present"""
+    __slots__ = ('mask',)
+
+    def __init__(self, mask):
+        self.mask = mask
+
+    def matches(self, bits):
+        return bits & self.mask != 0
+
+
+class And:
+    __slots__ = ('children',)
+
+    def __init__(self, children):
+        self.children = children
+
+    def matches(self, bits):
+        return all(child.matches(bits) for child in self.children)
+
+
+class Or:
+    __slots__ = ('children',)
+
+    def __init__(self, children):
+        self.children = children
+
+    def matches(self, bits):
+        return any(child.matches(bits) for child in self.children)
+
+
+class Always:
+    __slots__ = ()
+
+    def matches(self, bits):
+        return True
+
+
+def _single_bit(mask):
+    return mask != 0 and mask & (mask - 1) == 0
+
+
+def _fold_and(children):
+    """Merge single-attribute children into one AllOf mask"""
+    mask = 0
+    rest = []
+    for child in children:
+        if isinstance(child, AllOf):
+            mask |= child.mask
+        elif isinstance(child, AnyOf) and _single_bit(child.mask):
+            mask |= child.mask
+        elif not isinstance(child, Always):
+            rest.append(child)
+    if mask:
+        rest.insert(0, AllOf(mask))
+    if not rest:
+        return Always()
+    return rest[0] if len(rest) == 1 else And(rest)
+
+
+def _fold_or(children):
+    """Merge single-attribute children into one AnyOf mask"""
+    if any(isinstance(child, Always) for child in children):
+        return Always()
+    mask = 0
+    rest = []
+    for child in children:
+        if isinstance(child, AnyOf) or (isinstance(child, AllOf) and _single_bit(child.mask)):
+            mask |= child.mask
+        else:
+            rest.append(child)
+    if mask:
+        rest.insert(0, AnyOf(mask))
+    return rest[0] if len(rest) == 1 else Or(rest)
+
+
+# ============== Compilation ==============
+
+_TOKEN = re.compile(r"\(|\)|[^\s()]+")
+
+
+class _ExpressionParser:
+    """Recursive descent: expr := term (or term)* ; term := factor (and factor)* ; factor := ( expr ) | key:value"""
+
+    def __init__(self, source, interner):
+        self.tokens = _TOKEN.findall(source)
+        self.pos = 0
+        self.interner = interner
+
+    def parse(self):
+        if not self.tokens:
+            return Always()
+        node = self._expr()
+        if self.pos != len(self.tokens):
+            raise ValueError(f"Invalid policy expression near '{self.tokens[self.pos]}'")
+        return node
+
+    def _peek(self):
+        return self.tokens[self.pos].lower() if self.pos < len(self.tokens) else None
+
+    def _expr(self):
+        children = [self._term()]
+        while self._peek() == 'or':
+            self.pos += 1
+            children.append(self._term())
+        return _fold_or(children)
+
+    def _term(self):
+        children = [self._factor()]
+        while self._peek() == 'and':
+            self.pos += 1
+            children.append(self._factor())
+        return _fold_and(children)
+
+    def _factor(self):
+        token = self._peek()
+        if token is None:
+            raise ValueError("Invalid policy expression: unexpected end")
+        if token == '(':
+            self.pos += 1
+            node = self._expr()
+            if self._peek() != ')':
+                raise ValueError("Invalid policy expression: missing ')'")
+            self.pos += 1
+            return node
+        if token in (')', 'and', 'or'):
+            raise ValueError(f"Invalid policy expression near '{token}'")
+        key, sep, value = self.tokens[self.pos].partition(':')
+        if not sep or not key or not value:
+            raise ValueError(f"Invalid policy attribute '{self.tokens[self.pos]}', expected key:value")
+        self.pos += 1
+        return AllOf(self.interner.intern(key, value))
+
+
+class CompiledPolicy:
+    """A policy compiled to a predicate tree; obtain instances through compile_policy()"""
+
+    def __init__(self, source, root, clauses, interner):
+        self.source = source
+        self.root = root
+        self.clauses = clauses   # dict policies: [(key, allowed_values, mask)] for error messages
+        self.interner = interner
+
+    def evaluate(self, user_attributes):
+        """True if user_attributes satisfy the policy"""
+        return self.root.matches(self.interner.mask(user_attributes or {}))
+
+    def evaluate_many(self, attribute_sets):
+        """
+        Evaluate against many attribute dicts at once. Sets that intern to the same
+        bitset share one evaluation, so large batches of similar users stay cheap.
+        """
+        mask = self.interner.mask
+        matches = self.root.matches
+        results = {}
+        out = []
+        for attributes in attribute_sets:
+            bits = mask(attributes or {})
+            result = results.get(bits)
+            if result is None:
+                result = results[bits] = matches(bits)
+            out.append(result)
+        return out
+
+    def enforce(self, user_attributes):
+        """Raise PermissionError with the first unmet requirement"""
+        user_attributes = user_attributes or {}
+        bits = self.interner.mask(user_attributes)
+        if self.root.matches(bits):
+            return
+        for key, allowed_values, clause_mask in self.clauses:
+            user_val = user_attributes.get(key)
+            if user_val is None:
+                raise PermissionError(f"Access policy not satisfied: missing required attribute '{key}'")
+            if bits & clause_mask == 0:
+                raise PermissionError(f"Access policy not satisfied: required {key} in {allowed_values}, but got {key}={user_val}")
+        raise PermissionError(f"Access policy not satisfied: {self.source}")
+
+
+def _compile(source, interner):
+    if isinstance(source, str):
+        return CompiledPolicy(source, _ExpressionParser(source, interner).parse(), [], interner)
+
+    clauses = []
+    children = []
+    for key, value in source.items():
+        allowed_values = value if isinstance(value, list) else [value]
+        mask = 0
+        for allowed in allowed_values:
+            mask |= interner.intern(key, allowed)
+        clauses.append((key, allowed_values, mask))
+        children.append(AnyOf(mask))
+    return CompiledPolicy(source, _fold_and(children), clauses, interner)
+
+
+@lru_cache(maxsize=4096)
+def _compile_canonical(canonical):
+    source = json.loads(canonical)
+    return _compile(source, AttributeInterner())
+
+
+def compile_policy(policy):
+    """Compile a dict or expression policy, reusing the cached predicate for equal policies"""
+    if policy is None:
+        policy = {}
+    if not isinstance(policy, (dict, str)):
+        raise ValueError(f"Unsupported policy type: {type(policy).__name__}")
+    try:
+        canonical = json.dumps(policy, sort_keys=True)
+    except TypeError as e:
+        raise ValueError(f"Invalid policy: {e}")
+    return _compile_canonical(canonical)
+
+
+def satisfies(policy, user_attributes):
+    """Shorthand for compile_policy(policy).evaluate(user_attributes)"""
+    return compile_policy(policy).evaluate(user_attributes)
@@ -0,0 +1,183 @@
+# modules/records.py - Compact in-memory storage for file records and access logs
+#
+# A dict per row costs a hash table plus a 26-character ISO string per timestamp.
+# File records are __slots__ objects instead, and access logs are stored as
+# columns: one list or array per field, one slot per row. Repeated strings
+# (user ids, access codes, status, policy, ...) are interned so every row shares
+# one copy, and timestamps are kept as integer microseconds since the epoch.
+# Values that don't fit a column (an unknown key, a timestamp that wouldn't
+# round-trip exactly) go into a per-row overflow dict, so to_dict() always
+# gives back what was stored.
+
+import sys
+from array import array
+from datetime import datetime, timedelta
+
+EPOCH = datetime(1970, 1, 1)
+MICROSECOND = timedelta(microseconds=1)
+MISSING = -2 ** 63   # empty slot in an int column
+
+# Marks a field the row never had (None is a legitimate stored value)
+_ABSENT = object()
+
+INTERNED_FIELDS = frozenset({'user_id', 'access_code', 'file_name', 'status', 'encryption_type',
+                             'compression', 'storage', 'policy', 'role'})
+TIMESTAMP_FIELDS = frozenset({'created_at', 'updated_at', 'expires_at', 'logged_at', 'timestamp'})
+
+
+def encode_timestamp(value):
+    """Naive ISO timestamp -> epoch microseconds, or None if it wouldn't round-trip"""
+    if type(value) is not str:
+        return None
+    try:
+        parsed = datetime.fromisoformat(value)
+    except ValueError:
+        return None
+    if parsed.tzinfo is not None:
+        return None
+    micros = (parsed - EPOCH) // MICROSECOND
+    return micros if decode_timestamp(micros) == value else None
+
+
+def decode_timestamp(micros):
+    return (EPOCH + micros * MICROSECOND).isoformat()
+
+
+def _intern(value):
+    return sys.intern(value) if type(value) is str else value
+
+
+FILE_FIELDS = ('id', 'user_id', 'access_code', 'file_name', 'ipfs_hash', 'header_hash', 'file_size',
+               'original_size', 'tx_hash', 'encryption_type', 'compression', 'storage', 'chunks',
+               'policy', 'created_at', 'updated_at', 'expires_at')
+
+
+class FileRecord:
+    """One file_shares row; holds the same data as the record dict in far less memory"""
+
+    __slots__ = FILE_FIELDS + ('extra',)
+
+    def __init__(self, data):
+        for field in FILE_FIELDS:
+            setattr(self, field, _ABSENT)
+        self.extra = None
+        self.update(data)
+
+    def update(self, fields):
+        for key, value in fields.items():
+            if key in TIMESTAMP_FIELDS and key in FILE_FIELDS:
+                micros = encode_timestamp(value)
+                if micros is not None:
+                    setattr(self, key, micros)
+                    self._pop_extra(key)
+                    continue
+                setattr(self, key, _ABSENT)
+            elif key == 'chunks' and type(value) is list:
+                # Dedup chunk hashes recur across files; interning shares them
+                self.chunks = tuple(_intern(h) for h in value)
+                self._pop_extra(key)
+                continue
+            elif key in FILE_FIELDS:
+                setattr(self, key, _intern(value) if key in INTERNED_FIELDS else value)
+                self._pop_extra(key)
+                continue
+            if self.extra is None:
+                self.extra = {}
+            self.extra[key] = value
+
+    def _pop_extra(self, key):
+        if self.extra is not None:
+            self.extra.pop(key, None)
+            if not self.extra:
+                self.extra = None
+
+    def get(self, key, default=None):
+        if key in FILE_FIELDS:
+            value = getattr(self, key)
+            if value is not _ABSENT:
+                return value
+        if self.extra is not None:
+            return self.extra.get(key, default)
+        return default
+
+    def to_dict(self):
+        data = {}
+        for field in FILE_FIELDS:
+            value = getattr(self, field)
+            if value is _ABSENT:
+                continue
+            if field in TIMESTAMP_FIELDS:
+                value = decode_timestamp(value)
+            elif field == 'chunks':
+                value = list(value)
+            data[field] = value
+        if self.extra is not None:
+            data.update(self.extra)
+        return data
+
+
+def compact_user(data):
+    """Copy of a user record with its role and attribute values interned"""
+    data = {key: _intern(value) if key in INTERNED_FIELDS else value for key, value in data.items()}
+    if isinstance(data.get('attributes'), dict):
+        data['attributes'] = {_intern(key): _intern(value) for key, value in data['attributes'].items()}
+    return data
+
+
+LOG_STRING_FIELDS = ('user_id', 'access_code', 'file_name', 'status')
+LOG_INT_FIELDS = ('bytes', 'timestamp', 'logged_at')
+
+
+class AccessLogTable:
+    """Append-only, column-per-field access log; rows are addressed by position"""
+
+    def __init__(self):
+        self.strings = {field: [] for field in LOG_STRING_FIELDS}
+        self.ints = {field: array('q') for field in LOG_INT_FIELDS}
+        self.extra = {}   # position -> fields with no column
+
+    def __len__(self):
+        return len(self.strings['user_id'])
+
+    def append(self, data):
+        """Store one event; returns its position"""
+        position = len(self)
+        extra = None
+        for field in LOG_STRING_FIELDS:
+            self.strings[field].append(_intern(data.get(field, _ABSENT)))
+        for field in LOG_INT_FIELDS:
+            value = data.get(field, _ABSENT)
+            if field in TIMESTAMP_FIELDS:
+                stored = encode_timestamp(value)
+            else:
+                stored = value if type(value) is int and value != MISSING else None
+            self.ints[field].append(MISSING if stored is None else stored)
+            if stored is None and value is not _ABSENT:
+                extra = extra or {}
+                extra[field] = value
+        for key, value in data.items():
+            if key not in self.strings and key not in self.ints:
+                extra = extra or {}
+                extra[key] = value
+        if extra:
+            self.extra[position] = extra
+        return position
+
+    def __getitem__(self, position):
+        data = {}
+        for field, column in self.strings.items():
+            value = column[position]
+            if value is not _ABSENT:
+                data[field] = value
+        for field, column in self.ints.items():
+            value = column[position]
+            if value != MISSING:
+                data[field] = decode_timestamp(value) if field in TIMESTAMP_FIELDS else value
+        extra = self.extra.get(position)
+        if extra:
+            data.update(extra)
+        return data
+
+    def __iter__(self):
+        for position in range(len(self)):
+            yield self[position]
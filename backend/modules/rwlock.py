@@ -0,0 +1,47 @@
+# modules/rwlock.py - Reader-writer lock
+#
+# Any number of readers, or one writer. A waiting writer stops new readers from
+# entering, so a steady stream of lookups can't starve inserts. Not reentrant:
+# a thread holding either side must not acquire the lock again.
+
+import threading
+from contextlib import contextmanager
+
+
+class ReadWriteLock:
+    """Shared read / exclusive write lock, writer preferring"""
+
+    def __init__(self):
+        self.cond = threading.Condition(threading.Lock())
+        self.readers = 0
+        self.writer = False
+        self.writers_waiting = 0
+
+    @contextmanager
+    def read(self):
+        with self.cond:
+            while self.writer or self.writers_waiting:
+                self.cond.wait()
+            self.readers += 1
+        try:
+            yield
+        finally:
+            with self.cond:
+                self.readers -= 1
+                if not self.readers:
+                    self.cond.notify_all()
+
+    @contextmanager
+    def write(self):
+        with self.cond:
+            self.writers_waiting += 1
+            while self.writer or self.readers:
+                self.cond.wait()
+            self.writers_waiting -= 1
+            self.writer = True
+        try:
+            yield
+        finally:
+            with self.cond:
+                self.writer = False
+                self.cond.notify_all()
@@ -0,0 +1,324 @@
+# modules/sqlite_database.py - Persistent SQLite backend with the DatabaseManager interface
+#
+# WAL journal: readers never block the writer or each other. Connections come from
+# a bounded pool: each call checks one out, uses it alone and puts it back, so the
+# number of open connections stays at pool_size however many request threads come
+# and go. Each connection caches compiled statements, so the fixed SQL strings
+# below are prepared once per connection. Queried fields live in indexed columns mirroring the Supabase
+# file_shares schema; the full record is kept as JSON next to them.
+
+import json
+import os
+import queue
+import sqlite3
+import threading
+from contextlib import contextmanager
+from datetime import datetime
+
+from modules.stats import StatsRollup, count_upload, count_access
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS file_shares (
+  id INTEGER PRIMARY KEY AUTOINCREMENT,
+  access_code TEXT NOT NULL,
+  uploaded_by_id TEXT,
+  file_name TEXT,
+  file_size INTEGER,
+  ipfs_hash TEXT,
+  created_at TEXT NOT NULL,
+  expires_at TEXT,
+  data TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_file_shares_access_code ON file_shares(access_code);
+CREATE INDEX IF NOT EXISTS idx_file_shares_uploaded_by_id ON file_shares(uploaded_by_id);
+CREATE INDEX IF NOT EXISTS idx_file_shares_created_at ON file_shares(created_at);
+
+CREATE TABLE IF NOT EXISTS users (
+  id TEXT PRIMARY KEY,
+  data TEXT NOT NULL
+);
+
+CREATE TABLE IF NOT EXISTS access_logs (
+  id INTEGER PRIMARY KEY AUTOINCREMENT,
+  access_code TEXT,
+  user_id TEXT,
+  logged_at TEXT NOT NULL,
+  data TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_access_logs_access_code ON access_logs(access_code);
+"""
+
+INSERT_FILE = ("INSERT INTO file_shares (access_code, uploaded_by_id, file_name, file_size, ipfs_hash, created_at, expires_at, data) "
+               "VALUES (?, ?, ?, ?, ?, ?, ?, ?)")
+UPDATE_FILE = ("UPDATE file_shares SET access_code = ?, uploaded_by_id = ?, file_name = ?, file_size = ?, ipfs_hash = ?, "
+               "expires_at = ?, data = ? WHERE id = ?")
+SELECT_FILE_BY_CODE = "SELECT id, data FROM file_shares WHERE access_code = ? ORDER BY id LIMIT 1"
+SELECT_FILE_BY_ID = "SELECT id, data FROM file_shares WHERE id = ?"
+SELECT_FILES_BY_USER = "SELECT id, data FROM file_shares WHERE uploaded_by_id = ? ORDER BY id"
+# Keyset pages: the (uploaded_by_id, rowid) / (access_code, rowid) index order serves these directly
+SELECT_FILES_BY_USER_AFTER = "SELECT id, data FROM file_shares WHERE uploaded_by_id = ? AND id > ? ORDER BY id LIMIT ?"
+SELECT_ALL_FILES = "SELECT id, data FROM file_shares ORDER BY id"
+DELETE_FILE = "DELETE FROM file_shares WHERE id = ?"
+COUNT_FILES = "SELECT COUNT(*) FROM file_shares"
+UPSERT_USER = "INSERT OR REPLACE INTO users (id, data) VALUES (?, ?)"
+SELECT_USER = "SELECT data FROM users WHERE id = ?"
+USER_EXISTS = "SELECT 1 FROM users WHERE id = ?"
+COUNT_USERS = "SELECT COUNT(*) FROM users"
+INSERT_LOG = "INSERT INTO access_logs (access_code, user_id, logged_at, data) VALUES (?, ?, ?, ?)"
+SELECT_LOGS_BY_CODE = "SELECT data FROM access_logs WHERE access_code = ? ORDER BY id"
+SELECT_LOGS_BY_CODE_AFTER = "SELECT id, data FROM access_logs WHERE access_code = ? AND id > ? ORDER BY id LIMIT ?"
+COUNT_LOGS = "SELECT COUNT(*) FROM access_logs"
+
+
+def _row_to_record(row):
+    record = json.loads(row[1])
+    record['id'] = row[0]
+    return record
+
+
+def _file_columns(record):
+    return (record.get('access_code'), record.get('user_id'), record.get('file_name'),
+            record.get('file_size'), record.get('ipfs_hash'))
+
+
+class SQLiteDatabaseManager:
+    """Durable drop-in for DatabaseManager backed by a SQLite file in WAL mode"""
+
+    def __init__(self, path='data/metadata.db', busy_timeout_ms=5000, pool_size=8):
+        self.path = path
+        self.busy_timeout_ms = busy_timeout_ms
+        self.pool_size = pool_size
+        self.pool = queue.LifoQueue()   # idle connections; LIFO keeps the warm ones in use
+        self.opened = 0
+        self.pool_lock = threading.Lock()
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        # Totals are counted once here and then maintained on every write, so /api/stats
+        # never runs COUNT(*); they assume this process is the only writer
+        self.stats = StatsRollup()
+        with self._connection() as conn:
+            conn.executescript(SCHEMA)
+            self.stats.set('files', conn.execute(COUNT_FILES).fetchone()[0])
+            self.stats.set('users', conn.execute(COUNT_USERS).fetchone()[0])
+            self.stats.set('access_logs', conn.execute(COUNT_LOGS).fetchone()[0])
+        print(f"✅ Database Manager initialized (SQLite WAL at {path}, {pool_size} connections)")
+
+    def _open(self):
+        # Autocommit mode; writes open their own transactions in _write()
+        # check_same_thread=False because pooled connections move between threads (one at a time)
+        conn = sqlite3.connect(self.path, isolation_level=None, cached_statements=64, check_same_thread=False)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.execute(f"PRAGMA busy_timeout={int(self.busy_timeout_ms)}")
+        return conn
+
+    @contextmanager
+    def _connection(self):
+        """Check a connection out of the pool, opening one while fewer than pool_size exist"""
+        try:
+            conn = self.pool.get_nowait()
+        except queue.Empty:
+            with self.pool_lock:
+                can_open = self.opened < self.pool_size
+                if can_open:
+                    self.opened += 1
+            if can_open:
+                try:
+                    conn = self._open()
+                except BaseException:
+                    with self.pool_lock:
+                        self.opened -= 1
+                    raise
+            else:
+                conn = self.pool.get()
+        try:
+            yield conn
+        finally:
+            if conn.in_transaction:
+                conn.rollback()
+            self.pool.put(conn)
+
+    @contextmanager
+    def _write(self):
+        """Transaction that takes the write lock up front, so read-modify-write can't interleave"""
+        with self._connection() as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                yield conn
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+            conn.execute("COMMIT")
+
+    def _fetchall(self, sql, params=()):
+        with self._connection() as conn:
+            return conn.execute(sql, params).fetchall()
+
+    def _fetchone(self, sql, params=()):
+        with self._connection() as conn:
+            return conn.execute(sql, params).fetchone()
+
+    def insert_file_record(self, data):
+        """Insert file record into database"""
+        try:
+            data['created_at'] = datetime.now().isoformat()
+            with self._write() as conn:
+                cursor = conn.execute(INSERT_FILE, _file_columns(data) + (
+                    data['created_at'], data.get('expires_at'), json.dumps(data)))
+            data['id'] = cursor.lastrowid
+            self.stats.adjust('files', 1)
+            count_upload(self.stats, data)
+            print(f"✅ File record saved to database (ID: {data['id']})")
+            return data
+        except Exception as e:
+            print(f"❌ Database insert error: {str(e)}")
+            raise
+
+    def get_file_by_access_code(self, access_code):
+        """Get file record by access code"""
+        try:
+            row = self._fetchone(SELECT_FILE_BY_CODE, (access_code,))
+            if row is not None:
+                print(f"✅ File found in database for access code: {access_code}")
+                return _row_to_record(row)
+            print(f"⚠️  No file found for access code: {access_code}")
+            return None
+        except Exception as e:
+            print(f"❌ Database query error: {str(e)}")
+            raise
+
+    def update_file_record(self, access_code, fields):
+        """Update fields of the file record with access_code; returns the record or None"""
+        return self._update(SELECT_FILE_BY_CODE, access_code, fields)
+
+    def update_file_record_by_id(self, record_id, fields):
+        """Update fields of the file record with this id; returns the record or None"""
+        return self._update(SELECT_FILE_BY_ID, record_id, fields)
+
+    def _update(self, select, key, fields):
+        try:
+            with self._write() as conn:
+                row = conn.execute(select, (key,)).fetchone()
+                if row is None:
+                    return None
+                file_record = _row_to_record(row)
+                file_record.update(fields)
+                file_record['updated_at'] = datetime.now().isoformat()
+                conn.execute(UPDATE_FILE, _file_columns(file_record) + (
+                    file_record.get('expires_at'), json.dumps(file_record), file_record['id']))
+            print(f"✅ File record updated (ID: {file_record['id']})")
+            return file_record
+        except Exception as e:
+            print(f"❌ Database update error: {str(e)}")
+            raise
+
+    def delete_file_record(self, access_code):
+        """Delete the file record with access_code; returns the removed record or None"""
+        try:
+            with self._write() as conn:
+                row = conn.execute(SELECT_FILE_BY_CODE, (access_code,)).fetchone()
+                if row is None:
+                    return None
+                conn.execute(DELETE_FILE, (row[0],))
+            self.stats.adjust('files', -1)
+            print(f"✅ File record deleted (ID: {row[0]})")
+            return _row_to_record(row)
+        except Exception as e:
+            print(f"❌ Database delete error: {str(e)}")
+            raise
+
+    def iter_file_records(self):
+        """All file records, oldest first"""
+        return [_row_to_record(row) for row in self._fetchall(SELECT_ALL_FILES)]
+
+    def log_access(self, data):
+        """Log file access event"""
+        try:
+            data['logged_at'] = datetime.now().isoformat()
+            with self._write() as conn:
+                conn.execute(INSERT_LOG, (data.get('access_code'), data.get('user_id'), data['logged_at'], json.dumps(data)))
+            self.stats.adjust('access_logs', 1)
+            count_access(self.stats, data)
+            print(f"✅ Access event logged for user: {data['user_id']}")
+            return True
+        except Exception as e:
+            print(f"❌ Access logging error: {str(e)}")
+            raise
+
+    def log_access_many(self, events):
+        """Append a batch of access events in one transaction (keeps logged_at if already set)"""
+        try:
+            now = datetime.now().isoformat()
+            rows = []
+            for data in events:
+                data.setdefault('logged_at', now)
+                rows.append((data.get('access_code'), data.get('user_id'), data['logged_at'], json.dumps(data)))
+            with self._write() as conn:
+                conn.executemany(INSERT_LOG, rows)
+            self.stats.adjust('access_logs', len(rows))
+            for data in events:
+                count_access(self.stats, data)
+            print(f"✅ {len(events)} access events logged")
+            return True
+        except Exception as e:
+            print(f"❌ Access logging error: {str(e)}")
+            raise
+
+    def insert_user(self, user_id, data):
+        """Insert user into database"""
+        try:
+            with self._write() as conn:
+                is_new = conn.execute(USER_EXISTS, (user_id,)).fetchone() is None
+                conn.execute(UPSERT_USER, (user_id, json.dumps(data)))
+            if is_new:
+                self.stats.adjust('users', 1)
+            print(f"✅ User inserted into database: {user_id}")
+            return True
+        except Exception as e:
+            print(f"❌ User insert error: {str(e)}")
+            raise
+
+    def get_user(self, user_id):
+        """Get user from database"""
+        row = self._fetchone(SELECT_USER, (user_id,))
+        return json.loads(row[0]) if row else {}
+
+    def get_user_files(self, user_id):
+        """Get all files uploaded by user"""
+        return [_row_to_record(row) for row in self._fetchall(SELECT_FILES_BY_USER, (user_id,))]
+
+    def get_user_files_page(self, user_id, after=None, limit=100):
+        """Up to limit files of user_id with id > after; returns (files, next_cursor)"""
+        rows = self._fetchall(SELECT_FILES_BY_USER_AFTER, (user_id, after or 0, limit + 1))
+        next_cursor = rows[limit - 1][0] if len(rows) > limit else None
+        return [_row_to_record(row) for row in rows[:limit]], next_cursor
+
+    def get_access_logs(self, access_code):
+        """Get access logs for a file"""
+        return [json.loads(row[0]) for row in self._fetchall(SELECT_LOGS_BY_CODE, (access_code,))]
+
+    def get_access_logs_page(self, access_code, after=None, limit=100):
+        """Up to limit logs for access_code after the cursor; returns (logs, next_cursor)"""
+        rows = self._fetchall(SELECT_LOGS_BY_CODE_AFTER, (access_code, after or 0, limit + 1))
+        next_cursor = rows[limit - 1][0] if len(rows) > limit else None
+        return [json.loads(row[1]) for row in rows[:limit]], next_cursor
+
+    def get_total_files(self):
+        return self.stats.total('files')
+
+    def get_total_users(self):
+        return self.stats.total('users')
+
+    def get_total_access_logs(self):
+        return self.stats.total('access_logs')
+
+    def close(self):
+        """Close the idle connections; call once requests have stopped"""
+        while True:
+            try:
+                conn = self.pool.get_nowait()
+            except queue.Empty:
+                break
+            conn.close()
+            with self.pool_lock:
+                self.opened -= 1
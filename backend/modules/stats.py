@@ -0,0 +1,172 @@
+# modules/stats.py - Incrementally maintained counters and time-bucketed rollups
+#
+# Writers call incr()/adjust()/observe() as events happen; /api/stats reads the
+# in-memory result instead of counting rows. Event counters and latency
+# histograms are kept per minute (last 24h) and per hour (last 30 days), so any
+# window is a sum over at most a few hundred buckets. Latencies go into log-scale
+# histogram bins (8 per doubling, ~9% resolution) that merge by addition, which
+# is what makes windowed p50/p99 cheap.
+
+import math
+import re
+import threading
+import time
+from collections import Counter
+
+MINUTE = 60
+HOUR = 3600
+BINS_PER_DOUBLING = 8
+
+_WINDOW_UNITS = {'s': 1, 'm': MINUTE, 'h': HOUR, 'd': 24 * HOUR}
+
+
+def parse_window(value):
+    """'15m', '1h', '7d' or plain seconds -> seconds"""
+    match = re.fullmatch(r"(\d+)([smhd]?)", str(value).strip())
+    if not match or int(match.group(1)) <= 0:
+        raise ValueError(f"Invalid stats window: {value}")
+    return int(match.group(1)) * _WINDOW_UNITS[match.group(2) or 's']
+
+
+def _latency_bin(ms):
+    return math.floor(math.log2(max(ms, 0.001)) * BINS_PER_DOUBLING)
+
+
+def _bin_upper_ms(index):
+    return 2 ** ((index + 1) / BINS_PER_DOUBLING)
+
+
+def _percentile(histogram, fraction):
+    total = sum(histogram.values())
+    if not total:
+        return None
+    rank = fraction * total
+    seen = 0
+    for index in sorted(histogram):
+        seen += histogram[index]
+        if seen >= rank:
+            return round(_bin_upper_ms(index), 2)
+
+
+class _Bucket:
+    __slots__ = ('counts', 'latencies')
+
+    def __init__(self):
+        self.counts = Counter()
+        self.latencies = {}   # stage -> Counter of histogram bins
+
+
+class StatsRollup:
+    """Thread-safe running totals plus per-minute and per-hour rollups"""
+
+    def __init__(self, clock=time.time, minute_retention=24 * 60, hour_retention=30 * 24):
+        self.clock = clock
+        self.minute_retention = minute_retention
+        self.hour_retention = hour_retention
+        self.totals = Counter()   # event counters since start, plus gauges set by adjust()
+        self.minutes = {}         # minute start -> _Bucket
+        self.hours = {}           # hour start -> _Bucket
+        self.lock = threading.Lock()
+
+    def _buckets(self, now):
+        minute = int(now // MINUTE) * MINUTE
+        hour = int(now // HOUR) * HOUR
+        minute_bucket = self.minutes.get(minute)
+        if minute_bucket is None:
+            minute_bucket = self.minutes[minute] = _Bucket()
+            self._prune(self.minutes, minute - self.minute_retention * MINUTE)
+        hour_bucket = self.hours.get(hour)
+        if hour_bucket is None:
+            hour_bucket = self.hours[hour] = _Bucket()
+            self._prune(self.hours, hour - self.hour_retention * HOUR)
+        return minute_bucket, hour_bucket
+
+    @staticmethod
+    def _prune(buckets, cutoff):
+        for start in [start for start in buckets if start <= cutoff]:
+            del buckets[start]
+
+    def incr(self, name, value=1):
+        """Count an event (uploads, bytes_in, ...) in the totals and the current buckets"""
+        with self.lock:
+            self.totals[name] += value
+            for bucket in self._buckets(self.clock()):
+                bucket.counts[name] += value
+
+    def adjust(self, name, delta):
+        """Move a gauge (files, users, ...) that is only reported as a current total"""
+        with self.lock:
+            self.totals[name] += delta
+
+    def set(self, name, value):
+        with self.lock:
+            self.totals[name] = value
+
+    def total(self, name):
+        with self.lock:
+            return self.totals[name]
+
+    def observe(self, stage, ms):
+        """Record one latency sample for stage"""
+        index = _latency_bin(ms)
+        with self.lock:
+            for bucket in self._buckets(self.clock()):
+                bucket.latencies.setdefault(stage, Counter())[index] += 1
+
+    def max_window(self):
+        """Longest window the hour buckets still cover"""
+        return self.hour_retention * HOUR
+
+    def window(self, seconds):
+        """Counters and p50/p99 latencies over the last `seconds`"""
+        if seconds > self.max_window():
+            raise ValueError(f"Stats window {seconds}s is longer than the {self.max_window()}s kept")
+        now = self.clock()
+        with self.lock:
+            if seconds <= self.minute_retention * MINUTE:
+                buckets, size = self.minutes, MINUTE
+            else:
+                buckets, size = self.hours, HOUR
+            # Whole buckets that overlap the window; the oldest one may reach slightly past it
+            cutoff = now - seconds - size
+            counts = Counter()
+            latencies = {}
+            for start, bucket in buckets.items():
+                if start > cutoff:
+                    counts.update(bucket.counts)
+                    for stage, histogram in bucket.latencies.items():
+                        latencies.setdefault(stage, Counter()).update(histogram)
+        return {
+            'seconds': seconds,
+            'resolution': 'minute' if size == MINUTE else 'hour',
+            'counts': dict(counts),
+            'latency_ms': {
+                stage: {
+                    'count': sum(histogram.values()),
+                    'p50': _percentile(histogram, 0.50),
+                    'p99': _percentile(histogram, 0.99)
+                }
+                for stage, histogram in latencies.items()
+            }
+        }
+
+    def snapshot(self):
+        with self.lock:
+            return dict(self.totals)
+
+
+def count_upload(stats, record):
+    stats.incr('uploads')
+    stats.incr('bytes_in', record.get('original_size', record.get('file_size', 0)) or 0)
+
+
+def count_access(stats, event):
+    """Roll an access-log event into downloads/bytes_out, denied or failed"""
+    status = event.get('status')
+    if status == 'success':
+        stats.incr('downloads')
+        stats.incr('bytes_out', event.get('bytes', 0) or 0)
+    elif status == 'denied':
+        stats.incr('denied')
+    elif status == 'failed':
+        stats.incr('failed')
@@ -0,0 +1,144 @@
+# modules/stream_cipher.py - Segmented AES-GCM stream (STREAM construction)
+
+import struct
+from abc import ABC, abstractmethod
+from concurrent.futures import ProcessPoolExecutor
+from cryptography.hazmat.primitives.ciphers.aead import AESGCM
+
+SEGMENT_SIZE = 64 * 1024
+TAG_SIZE = 16
+NONCE_PREFIX_SIZE = 7
+
+
+def segment_nonce(nonce_prefix, index, last):
+    """Build the 12-byte GCM nonce for one segment: prefix | counter | last-flag"""
+    return nonce_prefix + struct.pack(">IB", index, 1 if last else 0)
+
+
+def process_batch(decrypt, key, nonce_prefix, start_index, units):
+    """
+    Seal or open a run of consecutive non-final segments. Module-level so it can be
+    shipped to a process pool; segment independence is what makes this safe.
+    """
+    aead = AESGCM(key)
+    op = aead.decrypt if decrypt else aead.encrypt
+    return [op(segment_nonce(nonce_prefix, start_index + i, False), unit, None)
+            for i, unit in enumerate(units)]
+
+
+class _SegmentStream(ABC):
+    """Shared framing: split input into fixed-size units, holding the last one back.
+
+    A unit is only processed as non-final once at least one more byte has arrived,
+    so finalize() always sees the real last unit. Full units are taken straight from
+    a memoryview of the input; only partial units are copied into the buffer.
+
+    With an executor, the non-final units of one update() are split into one batch
+    per worker and processed in parallel; output order is preserved.
+    Subclasses supply the per-segment operation in _transform().
+    """
+
+    # Passed to process_batch so pool workers know which direction to run
+    decrypt = False
+
+    def __init__(self, key, nonce_prefix, unit_size, executor=None, workers=1):
+        if len(nonce_prefix) != NONCE_PREFIX_SIZE:
+            raise ValueError(f"nonce_prefix must be {NONCE_PREFIX_SIZE} bytes")
+        self.key = key
+        self.aead = AESGCM(key)
+        self.nonce_prefix = nonce_prefix
+        self.unit_size = unit_size
+        self.executor = executor
+        self.workers = workers
+        # Process pools pickle their arguments, and memoryviews don't pickle
+        self.copy_units = isinstance(executor, ProcessPoolExecutor)
+        self.index = 0
+        self.buffer = bytearray()
+        self.finalized = False
+
+    @abstractmethod
+    def _transform(self, nonce, unit, last):
+        """Seal or open one segment under its nonce"""
+
+    def _process(self, unit, last):
+        nonce = segment_nonce(self.nonce_prefix, self.index, last)
+        self.index += 1
+        return self._transform(nonce, unit, last)
+
+    def _process_many(self, units):
+        if self.executor is None or len(units) < 2:
+            return [self._process(unit, last=False) for unit in units]
+
+        per_batch = -(-len(units) // self.workers)
+        futures = []
+        for start in range(0, len(units), per_batch):
+            batch = units[start:start + per_batch]
+            if self.copy_units:
+                batch = [bytes(unit) for unit in batch]
+            futures.append(self.executor.submit(
+                process_batch, self.decrypt, self.key, self.nonce_prefix, self.index + start, batch
+            ))
+        self.index += len(units)
+        out = []
+        for future in futures:
+            out.extend(future.result())
+        return out
+
+    def update(self, data):
+        if self.finalized:
+            raise ValueError(f"{type(self).__name__} already finalized")
+        view = memoryview(data)
+        out = []
+        if self.buffer:
+            fill = self.unit_size - len(self.buffer)
+            if len(view) <= fill:
+                self.buffer += view
+                return b""
+            self.buffer += view[:fill]
+            view = view[fill:]
+            out.append(self._process(self.buffer, last=False))
+            self.buffer = bytearray()
+        units = []
+        offset = 0
+        while len(view) - offset > self.unit_size:
+            units.append(view[offset:offset + self.unit_size])
+            offset += self.unit_size
+        out.extend(self._process_many(units))
+        self.buffer += view[offset:]
+        return b"".join(out)
+
+    def finalize(self):
+        if self.finalized:
+            raise ValueError(f"{type(self).__name__} already finalized")
+        self.finalized = True
+        out = self._process(self.buffer, last=True)
+        self.buffer = bytearray()
+        return out
+
+
+class SegmentEncryptor(_SegmentStream):
+    """Incremental AES-GCM encryptor that emits independently authenticated segments.
+
+    Every segment is sealed with its own nonce, so memory stays bounded by the
+    segment size and truncation or reordering is caught on decrypt.
+    """
+
+    def __init__(self, key, nonce_prefix, segment_size=SEGMENT_SIZE, executor=None, workers=1):
+        super().__init__(key, nonce_prefix, segment_size, executor, workers)
+
+    def _transform(self, nonce, unit, last):
+        return self.aead.encrypt(nonce, unit, None)
+
+
+class SegmentDecryptor(_SegmentStream):
+    """Incremental counterpart of SegmentEncryptor; finalize() raises InvalidTag on truncation"""
+
+    decrypt = True
+
+    def __init__(self, key, nonce_prefix, segment_size=SEGMENT_SIZE, executor=None, workers=1):
+        super().__init__(key, nonce_prefix, segment_size + TAG_SIZE, executor, workers)
+
+    def _transform(self, nonce, unit, last):
+        if last and len(unit) < TAG_SIZE:
+            raise ValueError("Truncated ciphertext")
+        return self.aead.decrypt(nonce, unit, None)
@@ -0,0 +1,225 @@
+# modules/sweeper.py - Expiry sweeper and reference-counted blob reclamation
+#
+# Expiries live in a min-heap of (expires_at, access_code); entries are never
+# removed in place, so a record whose expiry changed is simply re-checked when
+# its stale entry reaches the top. Every IPFS hash a record points at (payload,
+# header, dedup chunks) is reference counted; a hash whose count drops to zero
+# is queued and deleted later. Each tick does at most batch_size deletions and
+# stops after budget_ms, so a large backlog is worked off over several ticks.
+#
+# Uploads store blobs through hold(), which takes the reference as the write
+# returns; track() then hands those references to the record. Storage hashes
+# aren't known until a write returns, so reclaim doesn't wait for writes: it
+# notes each hash it deletes against every write in flight, and a write whose
+# hash was deleted under it stores the blob again (or fails, if its input was a
+# stream that can't be replayed) before taking the reference. rewrap() swaps a
+# record's header and its references in one step against expiry.
+
+import heapq
+import threading
+import time
+from collections import Counter, deque
+from datetime import datetime
+
+
+def record_hashes(record):
+    """Every IPFS hash a file record keeps alive"""
+    hashes = [record['ipfs_hash']]
+    if record.get('header_hash'):
+        hashes.append(record['header_hash'])
+    hashes.extend(record.get('chunks', []))
+    return hashes
+
+
+def expiry_timestamp(record):
+    expires_at = record.get('expires_at')
+    return datetime.fromisoformat(expires_at).timestamp() if expires_at else None
+
+
+class ExpirySweeper:
+    """Background sweeper: removes expired file records and deletes blobs nothing references"""
+
+    def __init__(self, db, ipfs, dedup=None, interval=60, batch_size=100, budget_ms=50, clock=time.time):
+        self.db = db
+        self.ipfs = ipfs
+        self.dedup = dedup
+        self.interval = interval
+        self.batch_size = batch_size
+        self.budget_ms = budget_ms
+        self.clock = clock
+        self.heap = []                 # (expires_at, access_code)
+        self.refs = Counter()          # ipfs hash -> referencing records
+        self.reclaim_queue = deque()   # hashes whose count reached zero
+        self.lock = threading.Lock()
+        self.delete_done = threading.Condition(self.lock)
+        self.writes = {}               # in-flight hold() -> hashes deleted since it started
+        self.deleting = None           # hash being deleted right now
+        # Serializes read-modify-write of a record's blobs (expiry, rewrap) so each
+        # replaced blob loses exactly one reference
+        self.records_lock = threading.Lock()
+        self.stop_event = threading.Event()
+        self.thread = None
+        self.records_expired = 0
+        self.blobs_reclaimed = 0
+        self.ticks = 0
+        print(f"✅ Expiry sweeper initialized (every {interval}s, {batch_size} items / {budget_ms}ms per tick)")
+
+    def track(self, record, held=False):
+        """Register a newly stored file record; held means its blobs were stored through hold()"""
+        with self.lock:
+            if not held:
+                for ipfs_hash in record_hashes(record):
+                    self.refs[ipfs_hash] += 1
+            expires_at = expiry_timestamp(record)
+            if expires_at is not None:
+                heapq.heappush(self.heap, (expires_at, record['access_code']))
+
+    def hold(self, store, *args):
+        """Store a blob with store(*args) and take a reference on the hash it returns"""
+        while True:
+            token = object()
+            with self.lock:
+                self.writes[token] = {self.deleting} if self.deleting is not None else set()
+            try:
+                ipfs_hash = store(*args)
+            except BaseException:
+                with self.lock:
+                    del self.writes[token]
+                raise
+            with self.lock:
+                if ipfs_hash not in self.writes.pop(token):
+                    self.refs[ipfs_hash] += 1
+                    return ipfs_hash
+                # The write may have found the blob already there just before it was deleted
+                while self.deleting == ipfs_hash:
+                    self.delete_done.wait()
+            if not all(isinstance(arg, (bytes, bytearray, memoryview)) for arg in args):
+                raise RuntimeError(f"Blob {ipfs_hash} was reclaimed while being stored")
+            print(f"⚠️ Blob {ipfs_hash} was reclaimed while being stored; storing it again")
+
+    def rewrap(self, access_code, store, header, fields):
+        """Store header and make it access_code's header_hash along with fields; returns the
+        new hash, or None if the record is gone"""
+        header_hash = self.hold(store, header)
+        swapped = False
+        try:
+            with self.records_lock:
+                record = self.db.get_file_by_access_code(access_code)
+                if record is not None:
+                    self.db.update_file_record_by_id(record['id'], dict(fields, header_hash=header_hash))
+                    swapped = True
+        finally:
+            # One reference goes either way: the old header's, or the new one's if it never landed
+            if not swapped:
+                self.drop_ref(header_hash)
+            elif record.get('header_hash'):
+                self.drop_ref(record['header_hash'])
+        return header_hash if swapped else None
+
+    def release(self, hashes):
+        """Give back references taken by hold() for an upload that never got a record"""
+        with self.lock:
+            for ipfs_hash in hashes:
+                self._drop(ipfs_hash)
+
+    def add_ref(self, ipfs_hash):
+        with self.lock:
+            self.refs[ipfs_hash] += 1
+
+    def drop_ref(self, ipfs_hash):
+        """Release one reference; the blob is queued for deletion when none are left"""
+        with self.lock:
+            self._drop(ipfs_hash)
+
+    def _drop(self, ipfs_hash):
+        self.refs[ipfs_hash] -= 1
+        if self.refs[ipfs_hash] <= 0:
+            del self.refs[ipfs_hash]
+            self.reclaim_queue.append(ipfs_hash)
+
+    def _expire_next(self, now):
+        """Remove the earliest expired record, if any; returns False when nothing is due"""
+        with self.lock:
+            if not self.heap or self.heap[0][0] > now:
+                return False
+            expires_at, access_code = heapq.heappop(self.heap)
+        with self.records_lock:
+            record = self.db.get_file_by_access_code(access_code)
+            # Stale heap entry: record already gone or its expiry was moved
+            if record is None or expiry_timestamp(record) != expires_at:
+                return True
+            self.db.delete_file_record(access_code)
+        if self.dedup is not None and record.get('chunks'):
+            self.dedup.release_chunks(record['chunks'])
+        with self.lock:
+            for ipfs_hash in record_hashes(record):
+                self._drop(ipfs_hash)
+            self.records_expired += 1
+        print(f"🗑️  Expired file record {access_code} ({record.get('file_name')})")
+        return True
+
+    def _reclaim_next(self):
+        with self.lock:
+            if not self.reclaim_queue:
+                return False
+            ipfs_hash = self.reclaim_queue.popleft()
+            # Re-uploaded since it was queued (same content, same hash): keep it
+            if self.refs[ipfs_hash] > 0:
+                return True
+            self.deleting = ipfs_hash
+            # Any write in flight may be returning this hash; it re-checks against these
+            for reclaimed in self.writes.values():
+                reclaimed.add(ipfs_hash)
+        try:
+            if self.ipfs.delete(ipfs_hash):
+                with self.lock:
+                    self.blobs_reclaimed += 1
+        except Exception as e:
+            print(f"⚠️ Could not reclaim blob {ipfs_hash}: {e}")
+        finally:
+            with self.lock:
+                self.deleting = None
+                self.delete_done.notify_all()
+        return True
+
+    def sweep_once(self):
+        """One bounded increment: expire due records, then reclaim unreferenced blobs"""
+        deadline = time.monotonic() + self.budget_ms / 1000
+        now = self.clock()
+        done = 0
+        while done < self.batch_size and time.monotonic() < deadline and self._expire_next(now):
+            done += 1
+        while done < self.batch_size and time.monotonic() < deadline and self._reclaim_next():
+            done += 1
+        with self.lock:
+            self.ticks += 1
+        return done
+
+    def _run(self):
+        while not self.stop_event.wait(self.interval):
+            try:
+                self.sweep_once()
+            except Exception as e:
+                print(f"❌ Sweeper error: {e}")
+
+    def start(self):
+        self.thread = threading.Thread(target=self._run, daemon=True, name="expiry-sweeper")
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.stop_event.set()
+        if self.thread is not None:
+            self.thread.join()
+
+    def stats(self):
+        with self.lock:
+            return {
+                'pending_expiries': len(self.heap),
+                'tracked_blobs': len(self.refs),
+                'reclaim_queue': len(self.reclaim_queue),
+                'writes_in_flight': len(self.writes),
+                'records_expired': self.records_expired,
+                'blobs_reclaimed': self.blobs_reclaimed,
+                'ticks': self.ticks
+            }
@@ -0,0 +1,189 @@
+# modules/tx_submitter.py - Fire-and-track transaction submission for one account
+#
+# Nonces are assigned locally, so transactions from the same account can be sent
+# back to back without waiting for the previous one to be mined. send() returns a
+# Future as soon as the node has accepted the transaction; one background poller
+# resolves the futures with their receipts. The poller only looks at receipts
+# when a new block has appeared or something was sent since its last check, and
+# checks pending transactions in nonce order, stopping at the first one that
+# isn't mined (later nonces can't be either).
+
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future
+
+from web3 import Web3
+from web3.exceptions import TransactionNotFound
+
+
+class TransactionFailed(Exception):
+    """A transaction was mined but reverted, or was never mined in time"""
+
+
+class _Pending:
+    __slots__ = ('nonce', 'tx_hash', 'future', 'sent_at')
+
+    def __init__(self, nonce, tx_hash, future, sent_at):
+        self.nonce = nonce
+        self.tx_hash = tx_hash
+        self.future = future
+        self.sent_at = sent_at
+
+
+class TransactionSubmitter:
+    """Sends transactions for `account` without blocking on confirmation"""
+
+    def __init__(self, w3, account, private_key=None, poll_interval=0.5, timeout=120, history_size=10000):
+        self.w3 = w3
+        self.account = account
+        self.private_key = private_key
+        self.poll_interval = poll_interval
+        self.timeout = timeout
+        self.history_size = history_size
+        # Held from nonce assignment until the node accepts the transaction, so nonces reach it in order
+        self.nonce_lock = threading.Lock()
+        self.next_nonce = w3.eth.get_transaction_count(account, 'pending')
+        self.lock = threading.Lock()
+        self.wakeup = threading.Condition(self.lock)
+        self.pending = OrderedDict()   # tx hash -> _Pending, in nonce order
+        self.finished = OrderedDict()  # tx hash -> status dict, most recent history_size
+        self.last_block = None
+        self.dirty = False             # sent since the poller last took its snapshot
+        self.sent = 0
+        self.confirmed = 0
+        self.failed = 0
+        self.stopped = False
+        self.thread = threading.Thread(target=self._run, daemon=True, name=f"tx-poller-{account[:10]}")
+        self.thread.start()
+
+    def _resync_nonce(self):
+        try:
+            self.next_nonce = self.w3.eth.get_transaction_count(self.account, 'pending')
+        except Exception as e:
+            print(f"⚠️ Could not resync nonce for {self.account}: {e}")
+
+    def send(self, transaction):
+        """Sign (or have the node sign) and send; returns a Future resolving to the receipt"""
+        with self.nonce_lock:
+            tx = dict(transaction, nonce=self.next_nonce)
+            tx.setdefault('from', self.account)
+            try:
+                if self.private_key:
+                    signed = self.w3.eth.account.sign_transaction(tx, self.private_key)
+                    # eth-account renamed rawTransaction to raw_transaction
+                    raw = getattr(signed, 'raw_transaction', None) or signed.rawTransaction
+                    tx_hash = self.w3.eth.send_raw_transaction(raw)
+                else:
+                    tx_hash = self.w3.eth.send_transaction(tx)
+            except Exception:
+                # The node may have rejected the nonce itself (another sender, a restarted chain)
+                self._resync_nonce()
+                raise
+            self.next_nonce += 1
+            future = Future()
+            future.tx_hash = Web3.to_hex(tx_hash)
+            with self.lock:
+                self.pending[future.tx_hash] = _Pending(tx['nonce'], future.tx_hash, future, time.monotonic())
+                self.sent += 1
+                self.dirty = True
+                self.wakeup.notify()
+        return future
+
+    def submit(self, call, gas):
+        """Send a contract function call (web3 ContractFunction) with a fixed gas limit"""
+        with self.nonce_lock:
+            nonce = self.next_nonce
+        # build_transaction fills in chain id and fees; send() re-stamps the nonce
+        return self.send(call.build_transaction({'from': self.account, 'gas': gas, 'nonce': nonce}))
+
+    def status(self, tx_hash):
+        """'pending', 'confirmed', 'failed' or 'unknown', with block and gas details once mined"""
+        with self.lock:
+            if tx_hash in self.pending:
+                return {'tx_hash': tx_hash, 'status': 'pending', 'nonce': self.pending[tx_hash].nonce}
+            return self.finished.get(tx_hash, {'tx_hash': tx_hash, 'status': 'unknown'})
+
+    def _finish(self, entry, status, receipt=None, error=None):
+        result = {'tx_hash': entry.tx_hash, 'status': status, 'nonce': entry.nonce}
+        if receipt is not None:
+            result['block_number'] = receipt['blockNumber']
+            result['gas_used'] = receipt['gasUsed']
+        if error is not None:
+            result['error'] = error
+        with self.lock:
+            self.pending.pop(entry.tx_hash, None)
+            self.finished[entry.tx_hash] = result
+            while len(self.finished) > self.history_size:
+                self.finished.popitem(last=False)
+            if status == 'confirmed':
+                self.confirmed += 1
+            else:
+                self.failed += 1
+        if status == 'confirmed':
+            entry.future.set_result(receipt)
+        else:
+            entry.future.set_exception(TransactionFailed(f"{entry.tx_hash}: {error}"))
+
+    def poll_once(self):
+        """Resolve every pending transaction that has been mined; returns how many"""
+        with self.lock:
+            dirty, self.dirty = self.dirty, False
+            entries = sorted(self.pending.values(), key=lambda entry: entry.nonce)
+        block = self.w3.eth.block_number
+        if block == self.last_block and not dirty:
+            self._expire()
+            return 0
+        self.last_block = block
+        resolved = 0
+        for entry in entries:
+            try:
+                receipt = self.w3.eth.get_transaction_receipt(entry.tx_hash)
+            except TransactionNotFound:
+                break
+            if receipt is None:
+                break
+            if receipt['status'] == 1:
+                self._finish(entry, 'confirmed', receipt)
+            else:
+                self._finish(entry, 'failed', receipt, error='reverted')
+            resolved += 1
+        self._expire()
+        return resolved
+
+    def _expire(self):
+        deadline = time.monotonic() - self.timeout
+        with self.lock:
+            expired = [entry for entry in self.pending.values() if entry.sent_at < deadline]
+        for entry in expired:
+            self._finish(entry, 'failed', error=f'not mined within {self.timeout}s')
+
+    def _run(self):
+        while True:
+            with self.lock:
+                while not self.pending and not self.stopped:
+                    self.wakeup.wait()
+                if self.stopped:
+                    return
+            try:
+                self.poll_once()
+            except Exception as e:
+                print(f"⚠️ Receipt poll failed: {e}")
+            time.sleep(self.poll_interval)
+
+    def close(self):
+        with self.lock:
+            self.stopped = True
+            self.wakeup.notify()
+        self.thread.join()
+
+    def stats(self):
+        with self.lock:
+            return {
+                'account': self.account,
+                'next_nonce': self.next_nonce,
+                'pending': len(self.pending),
+                'sent': self.sent,
+                'confirmed': self.confirmed,
+                'failed': self.failed
+            }
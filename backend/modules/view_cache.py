@@ -0,0 +1,122 @@
+# modules/view_cache.py - Read-through cache for contract view calls
+#
+# Results are keyed by (function name, args) and live for one block: when the
+# chain head moves, everything is dropped. Asking the node for the head on every
+# read would cost as much as the read itself, so the head is checked at most
+# every block_check_interval seconds, and that round trip happens outside the
+# lock so other readers keep hitting the cache meanwhile. Local writes invalidate the keys they
+# touch as soon as they are sent, so this process reads its own writes once
+# they are mined. Methods opt in with the @cached_view decorator.
+
+import functools
+import threading
+import time
+from collections import OrderedDict
+
+_MISSING = object()
+
+
+class ViewCache:
+    """LRU of view-call results, cleared whenever a new block is seen"""
+
+    def __init__(self, block_number_fn, max_entries=10000, block_check_interval=0.5):
+        self.block_number_fn = block_number_fn
+        self.max_entries = max_entries
+        self.block_check_interval = block_check_interval
+        self.entries = OrderedDict()   # (function, args) -> result
+        self.block = None
+        self.generation = 0            # bumped by every clear or invalidation
+        self.next_block_check = 0.0
+        self.checks_started = 0        # head checks are numbered so a slow, older answer can't win
+        self.checks_applied = 0
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+        self.blocks_seen = 0
+
+    def _check_block(self):
+        """Ask the node for the head if a check is due; the call itself runs without the lock"""
+        with self.lock:
+            now = time.monotonic()
+            if now < self.next_block_check:
+                return
+            self.next_block_check = now + self.block_check_interval
+            self.checks_started += 1
+            check = self.checks_started
+        try:
+            block = self.block_number_fn()
+        except Exception:
+            return
+        with self.lock:
+            if check < self.checks_applied:
+                return
+            self.checks_applied = check
+            if block != self.block:
+                self.block = block
+                self.blocks_seen += 1
+                self.generation += 1
+                self.entries.clear()
+
+    def get_or_call(self, key, call):
+        """Cached result for key, or call() (outside the lock) and cache it; exceptions aren't cached"""
+        self._check_block()
+        with self.lock:
+            if key in self.entries:
+                self.entries.move_to_end(key)
+                self.hits += 1
+                return self.entries[key]
+            self.misses += 1
+            generation = self.generation
+        result = call()
+        with self.lock:
+            # Don't store a result that may predate a newer block or an invalidation
+            if self.generation == generation:
+                self.entries[key] = result
+                while len(self.entries) > self.max_entries:
+                    self.entries.popitem(last=False)
+        return result
+
+    def invalidate(self, function, *args):
+        with self.lock:
+            if self.entries.pop((function, args), _MISSING) is not _MISSING:
+                self.invalidations += 1
+            self.generation += 1
+            # Forces a head check too: the write may be mined by the next read
+            self.next_block_check = 0.0
+
+    def clear(self):
+        with self.lock:
+            self.generation += 1
+            self.entries.clear()
+
+    def stats(self):
+        with self.lock:
+            total = self.hits + self.misses
+            return {
+                'entries': len(self.entries),
+                'block': self.block,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_ratio': round(self.hits / total, 3) if total else 0.0,
+                'invalidations': self.invalidations,
+                'blocks_seen': self.blocks_seen
+            }
+
+
+def cached_view(function, normalize=None):
+    """
+    Decorate a method that makes a view call so its result is cached in
+    self.view_cache under (function, args). normalize(*args) -> args tuple
+    canonicalizes the key (e.g. checksum addresses). No cache, no caching.
+    """
+    def decorator(method):
+        @functools.wraps(method)
+        def wrapper(self, *args):
+            cache = getattr(self, 'view_cache', None)
+            if cache is None:
+                return method(self, *args)
+            key_args = normalize(*args) if normalize else args
+            return cache.get_or_call((function, key_args), lambda: method(self, *args))
+        return wrapper
+    return decorator
@@ -0,0 +1,171 @@
+# test_access_log_writer.py - Batched asynchronous access-log writes
+import sys
+import threading
+import time
+sys.path.append('/app')
+
+from modules.database import DatabaseManager
+from modules.access_log_writer import AccessLogWriter
+from testutil import quiet, run
+
+
+def make_db():
+    """In-memory DB plus its real log_access_many, for wrapping"""
+    with quiet():
+        db = DatabaseManager()
+    return db, db.log_access_many
+
+
+def gated(write):
+    """A log_access_many that blocks until the returned event is set"""
+    gate = threading.Event()
+    return gate, lambda events: gate.wait() and write(events)
+
+
+def log_many(writer, count, access_code, user_id='u'):
+    with quiet():
+        return [writer.log({'user_id': user_id, 'access_code': access_code, 'status': 'success'})
+                for _ in range(count)]
+
+
+def test_read_your_writes():
+    print("\n1. Read-your-writes...")
+    db, _ = make_db()
+    with quiet():
+        writer = AccessLogWriter(db, batch_size=50, flush_interval=60)
+        for i in range(120):
+            writer.log({'user_id': f'u{i}', 'access_code': 'AC1', 'status': 'success'})
+        logs = writer.get_access_logs('AC1')
+        assert writer.get_total_access_logs() == 120
+        writer.close()
+    assert [l['user_id'] for l in logs] == [f'u{i}' for i in range(120)]
+    print("   ✓ All 120 events readable immediately, in order")
+
+
+def test_batching():
+    print("\n2. Batching...")
+    db, write = make_db()
+    batches = []
+    db.log_access_many = lambda events: batches.append(len(events)) or write(events)
+    with quiet():
+        writer = AccessLogWriter(db, batch_size=50, flush_interval=0.2)
+    log_many(writer, 120, 'AC1')
+    time.sleep(0.5)
+    assert sum(batches) == 120 and max(batches) <= 50 and len(batches) <= 4
+    assert len(db.access_logs) == 120 and writer.stats()['queued'] == 0
+    with quiet():
+        writer.close()
+    print(f"   ✓ Committed as batches {batches}, the remainder after flush_interval")
+
+
+def test_backpressure():
+    print("\n3. Backpressure...")
+    db, write = make_db()
+    gate, db.log_access_many = gated(write)
+    with quiet():
+        writer = AccessLogWriter(db, batch_size=1, flush_interval=0.01, max_queue=2, put_timeout=5)
+    threading.Timer(0.2, gate.set).start()
+    start = time.perf_counter()
+    log_many(writer, 4, 'AC2')
+    blocked = time.perf_counter() - start
+    assert blocked >= 0.15 and writer.stats()['events_dropped'] == 0
+    with quiet():
+        writer.close()
+        assert len(db.get_access_logs('AC2')) == 4
+    print(f"   ✓ Caller waited {blocked * 1000:.0f}ms for space, nothing dropped")
+
+
+def test_drain_on_close():
+    print("\n4. Drain on shutdown...")
+    db, _ = make_db()
+    with quiet():
+        writer = AccessLogWriter(db, batch_size=1000, flush_interval=60)
+    log_many(writer, 10, 'AC3')
+    with quiet():
+        writer.close()
+    assert len(db.get_access_logs('AC3')) == 10
+    print("   ✓ 10 queued events committed on close")
+
+
+def test_commit_outside_lock():
+    print("\n5. Commit outside the lock...")
+    db, write = make_db()
+    gate, db.log_access_many = gated(write)
+    with quiet():
+        writer = AccessLogWriter(db, batch_size=1, flush_interval=0.01)
+    log_many(writer, 1, 'AC4')
+    time.sleep(0.05)  # the writer thread is now inside the blocked commit
+    start = time.perf_counter()
+    log_many(writer, 1, 'AC4')
+    waited = time.perf_counter() - start
+    gate.set()
+    with quiet():
+        writer.close()
+    assert waited < 0.05 and len(db.get_access_logs('AC4')) == 2
+    print(f"   ✓ log() returned in {waited * 1000:.1f}ms while a commit was stuck")
+
+
+def test_retry_with_backoff():
+    print("\n6. Retry with backoff...")
+    db, write = make_db()
+    failures = [2]
+
+    def flaky(events):
+        if failures[0]:
+            failures[0] -= 1
+            raise IOError("database is locked")
+        return write(events)
+
+    db.log_access_many = flaky
+    with quiet():
+        writer = AccessLogWriter(db, batch_size=10, flush_interval=0.01, retry_backoff=0.05)
+    log_many(writer, 5, 'AC5')
+    time.sleep(0.05)
+    assert len(writer.get_access_logs('AC5')) == 5
+    with quiet():
+        writer.close()
+    stats = writer.stats()
+    assert len(db.get_access_logs('AC5')) == 5
+    assert stats['retries'] == 2 and stats['events_dropped'] == 0
+    print(f"   ✓ Failed batch stayed readable; committed after {stats['retries']} retries")
+
+
+def test_give_up_and_count():
+    print("\n7. Give up and count...")
+    db, _ = make_db()
+
+    def broken(events):
+        raise IOError("disk full")
+
+    db.log_access_many = broken
+    with quiet():
+        writer = AccessLogWriter(db, batch_size=10, flush_interval=0.01, retry_attempts=3, retry_backoff=0.01)
+    log_many(writer, 4, 'AC6')
+    with quiet():
+        writer.close()
+    stats = writer.stats()
+    assert stats['events_dropped'] == 4 and stats['retries'] == 2 and stats['queued'] == 0
+    print(f"   ✓ {stats['events_dropped']} events reported as dropped")
+
+
+def test_full_queue_drops():
+    print("\n8. Full queue...")
+    db, _ = make_db()
+    writes = []
+    gate, db.log_access_many = gated(lambda events: writes.append(len(events)))
+    with quiet():
+        writer = AccessLogWriter(db, batch_size=1, flush_interval=0.01, max_queue=1, put_timeout=0.05)
+    results = log_many(writer, 4, 'AC9')
+    stats = writer.stats()
+    gate.set()
+    with quiet():
+        writer.close()
+    assert log_many(writer, 1, 'AC9') == [False]
+    assert results == [True, True, False, False]
+    assert stats['events_dropped'] == 2 and stats['queued'] == 2 and writes == [1, 1]
+    assert writer.stats()['events_dropped'] == 3
+    print("   ✓ Overflow and post-close events dropped and counted; only the writer thread wrote")
+
+
+if __name__ == '__main__':
+    run("Access Log Writer", globals())
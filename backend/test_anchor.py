@@ -0,0 +1,181 @@
+# test_anchor.py - Merkle proofs and batched on-chain anchoring of uploads
+import sys
+import os
+import tempfile
+import time
+sys.path.append('/app')
+
+from modules.merkle import leaf_hash, build_levels, merkle_root, inclusion_proof, verify_proof
+from modules.anchor import MerkleAnchor
+from modules.database import DatabaseManager
+from modules.sqlite_database import SQLiteDatabaseManager
+from testutil import quiet, run
+
+
+def make_db():
+    with quiet():
+        return DatabaseManager()
+
+
+def recording_anchor_fn():
+    """anchor_fn that succeeds, plus the (root, count) of every call"""
+    sent = []
+
+    def anchor_fn(root, count):
+        sent.append((root, count))
+        return f'0xtx{len(sent)}'
+    return anchor_fn, sent
+
+
+def store(db, anchor, user, prefix, count):
+    with quiet():
+        for i in range(count):
+            anchor.add(db.insert_file_record({'user_id': user, 'access_code': f'{prefix}{i}', 'file_name': f'{prefix}{i}'}))
+
+
+def wait_for(condition, timeout=5):
+    deadline = time.monotonic() + timeout
+    while not condition() and time.monotonic() < deadline:
+        time.sleep(0.01)
+
+
+def test_inclusion_proofs():
+    print("\n1. Inclusion proofs...")
+    for n in range(1, 34):
+        leaves = [leaf_hash(f'leaf{i}'.encode()) for i in range(n)]
+        levels = build_levels(leaves)
+        root = merkle_root(levels)
+        for i in range(n):
+            proof = inclusion_proof(levels, i)
+            assert verify_proof(leaves[i], proof, root) and verify_proof(leaves[i], proof, root.hex())
+            assert len(proof) <= n.bit_length()
+        if n > 1:
+            assert not verify_proof(leaf_hash(b'other'), inclusion_proof(levels, 0), root)
+            assert not verify_proof(leaves[1], inclusion_proof(levels, 0), root)
+    # An interior node can't stand in for a leaf
+    levels = build_levels([leaf_hash(b'a'), leaf_hash(b'b'), leaf_hash(b'c'), leaf_hash(b'd')])
+    assert leaf_hash(levels[0][0] + levels[0][1]) != levels[1][0]
+    assert build_levels([leaf_hash(b'a')])[-1][0] == leaf_hash(b'a')
+    print("   ✓ Proofs verify for 1-33 leaves; wrong leaves are rejected")
+
+
+def test_size_triggered_batches():
+    print("\n2. Size-triggered batch...")
+    db = make_db()
+    anchor_fn, sent = recording_anchor_fn()
+    with quiet():
+        anchor = MerkleAnchor(db, anchor_fn, batch_size=100, interval=60)
+        store(db, anchor, 'alice', 'AC', 250)
+        wait_for(lambda: len(sent) >= 2)
+        assert [count for _, count in sent] == [100, 100] and anchor.stats()['pending'] == 50
+        result = MerkleAnchor.verify(db.get_file_by_access_code('AC150'))
+        anchor.close()
+    assert result['verified'] and result['tx_hash'] == '0xtx2' and result['index'] == 50
+    print("   ✓ 250 uploads -> 2 transactions before the interval, 50 leaves waiting")
+
+
+def test_close_flushes_and_tampering_fails():
+    print("\n3. Close and verify...")
+    db = make_db()
+    anchor_fn, sent = recording_anchor_fn()
+    with quiet():
+        anchor = MerkleAnchor(db, anchor_fn, batch_size=100, interval=60)
+        store(db, anchor, 'alice', 'AC', 250)
+        anchor.close()
+        assert all(MerkleAnchor.verify(db.get_file_by_access_code(f'AC{i}'))['verified'] for i in range(250))
+        db.update_file_record('AC7', {'file_name': 'swapped.pdf'})
+        assert not MerkleAnchor.verify(db.get_file_by_access_code('AC7'))['verified']
+        # A policy rewrap replaces header_hash, which isn't anchored
+        db.update_file_record('AC8', {'header_hash': 'Qmnew'})
+        assert MerkleAnchor.verify(db.get_file_by_access_code('AC8'))['verified']
+    assert len(sent) == 3 and sent[-1][1] == 50
+    print("   ✓ 250 records in 3 transactions; an edited record fails its proof")
+
+
+def test_interval_and_retry():
+    print("\n4. Interval and retry...")
+    db = make_db()
+    calls = []
+
+    def flaky(root, count):
+        calls.append(count)
+        if len(calls) == 1:
+            raise ConnectionError("node unavailable")
+        return '0xretry'
+
+    with quiet():
+        anchor = MerkleAnchor(db, flaky, batch_size=100, interval=0.1)
+        store(db, anchor, 'bob', 'B', 3)
+        wait_for(lambda: anchor.stats()['batches'] >= 1)
+        anchor.close()
+        assert MerkleAnchor.verify(db.get_file_by_access_code('B2'))['tx_hash'] == '0xretry'
+    assert calls == [3, 3] and anchor.stats()['failures'] == 1
+    print("   ✓ Partial batch sent after the interval; failed attempt retried")
+
+
+def reverted_anchor():
+    """An anchor whose one queued batch has just been reverted, and the set of roots on chain"""
+    db, chain = make_db(), set()
+
+    def reverting(root, count):
+        raise RuntimeError("0xbad: reverted")
+
+    with quiet():
+        anchor = MerkleAnchor(db, reverting, batch_size=100, interval=60, anchored_fn=chain.__contains__)
+        store(db, anchor, 'carol', 'C', 1)
+        assert anchor.flush() is None
+    return db, anchor, chain
+
+
+def test_reverted_batch_requeued():
+    print("\n5. Reverted transaction...")
+    db, anchor, _ = reverted_anchor()
+    with quiet():
+        assert 'anchor' not in db.get_file_by_access_code('C0')
+        anchor.close()
+    assert anchor.stats()['pending'] == 1 and anchor.stats()['failures'] == 2
+    print("   ✓ No proof recorded, batch re-queued")
+
+
+def test_root_already_on_chain():
+    print("\n6. Root already on chain...")
+    db, anchor, chain = reverted_anchor()
+
+    def mined_but_lost(root, count):
+        chain.add(root)
+        raise TimeoutError("no receipt before the timeout")
+
+    with quiet():
+        anchor.anchor_fn = mined_but_lost
+        assert anchor.flush() in chain
+        result = MerkleAnchor.verify(db.get_file_by_access_code('C0'))
+        anchor.close()
+    assert result['verified'] and result['root'] in chain and result['tx_hash'] is None
+    assert anchor.stats()['pending'] == 0 and anchor.stats()['batches'] == 1
+    print("   ✓ Proofs written against the existing root")
+
+
+def test_duplicate_access_codes():
+    print("\n7. Duplicate access codes...")
+    with quiet():
+        dbs = [DatabaseManager(), SQLiteDatabaseManager(os.path.join(tempfile.mkdtemp(), 'anchor.db'))]
+    for db in dbs:
+        anchor_fn, _ = recording_anchor_fn()
+        with quiet():
+            anchor = MerkleAnchor(db, anchor_fn, batch_size=100, interval=60)
+            old = db.insert_file_record({'user_id': 'dave', 'access_code': 'DUP', 'file_name': 'old'})
+            anchor.add(old)
+            anchor.flush()
+            new = db.insert_file_record({'user_id': 'dave', 'access_code': 'DUP', 'file_name': 'new'})
+            anchor.add(new)
+            anchor.flush()
+            anchor.close()
+            records = {r['id']: r for r in db.iter_file_records()}
+        assert MerkleAnchor.verify(records[old['id']])['verified']
+        assert MerkleAnchor.verify(records[new['id']])['verified']
+        assert records[old['id']]['anchor']['root'] != records[new['id']]['anchor']['root']
+    print("   ✓ Each record keeps its own proof, in memory and in SQLite")
+
+
+if __name__ == '__main__':
+    run("Merkle Anchoring", globals())
@@ -0,0 +1,112 @@
+# test_blob_cache.py - Byte-budgeted 2Q cache in front of IPFSManager
+import os
+import sys
+import contextlib
+import threading
+import time
+sys.path.append('/app')
+
+from modules.blob_cache import BlobCache
+from modules.ipfs_standin import StandInIPFSServer
+from modules.ipfs_storage import IPFSManager
+from testutil import quiet, run
+
+
+def blob(kb):
+    return bytes(kb * 1024)
+
+
+@contextlib.contextmanager
+def cached_manager(cache_bytes):
+    """IPFSManager on the 'http' backend against a throwaway stand-in daemon"""
+    server = StandInIPFSServer().start()
+    try:
+        with quiet():
+            ipfs = IPFSManager(backend='http', port=server.port, cache_bytes=cache_bytes)
+        yield ipfs, server
+    finally:
+        server.stop()
+
+
+def test_byte_budget():
+    print("\n1. Byte budget...")
+    cache = BlobCache(max_bytes=100 * 1024)
+    for i in range(20):
+        cache.put(f'k{i}', blob(10))
+    cache.put('huge', blob(60))
+    stats = cache.stats()
+    assert stats['bytes'] <= 100 * 1024 and stats['evictions'] > 0
+    assert cache.get('huge') is None
+    print(f"   ✓ {stats['bytes'] // 1024} KB cached, {stats['evictions']} evictions")
+
+
+def test_scan_resistance():
+    print("\n2. Scan resistance...")
+    cache = BlobCache(max_bytes=100 * 1024)
+    hot = ['hot0', 'hot1', 'hot2']
+    for key in hot:
+        cache.put(key, blob(10))
+    for i in range(10):
+        cache.put(f'warmup{i}', blob(10))    # pushes the hot keys out of A1in into the ghost list
+    for key in hot:
+        cache.put(key, blob(10))             # re-referenced while remembered -> main LRU
+    for i in range(200):
+        cache.put(f'scan{i}', blob(10))
+    assert all(cache.get(key) is not None for key in hot)
+    print("   ✓ Hot objects kept through 200 cold reads")
+
+
+def test_single_flight_fetch():
+    print("\n3. Single-flight fetch...")
+    cache = BlobCache(max_bytes=100 * 1024)
+    calls = []
+
+    def slow_fetch():
+        calls.append(1)
+        time.sleep(0.05)
+        return blob(1)
+
+    threads = [threading.Thread(target=cache.get_or_fetch, args=('shared', slow_fetch)) for _ in range(8)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert len(calls) == 1
+    print("   ✓ One fetch for 8 concurrent readers")
+
+
+def test_read_through():
+    print("\n4. IPFSManager read-through...")
+    with cached_manager(8 * 1024 * 1024) as (ipfs, server):
+        data = os.urandom(1024 * 1024)
+        with quiet():
+            ipfs_hash = ipfs.add(data)
+        assert b"".join(ipfs.cat(ipfs_hash, 64 * 1024)) == data
+        server.blobs.clear()
+        assert b"".join(ipfs.cat(ipfs_hash, 64 * 1024)) == data
+        assert ipfs.get(ipfs_hash) == data
+        stats = ipfs.cache.stats()
+    assert stats['hits'] == 2 and stats['misses'] == 1
+    print("   ✓ Second and third reads served from cache")
+
+
+def test_streamed_fills():
+    print("\n5. Streamed fills...")
+    with cached_manager(4 * 1024 * 1024) as (ipfs, _):
+        small, large = os.urandom(512 * 1024), os.urandom(2 * 1024 * 1024)
+        with quiet():
+            small_hash, large_hash = ipfs.add(small), ipfs.add(large)
+        first, second = ipfs.cat(small_hash, 64 * 1024), ipfs.cat(small_hash, 64 * 1024)
+        next(first), next(second)
+        assert ipfs.cache.fill_bytes == 64 * 1024 and ipfs.cache.filling == {small_hash}
+        assert len(b"".join(second)) + 64 * 1024 == len(small) and ipfs.cache.fill_bytes == 64 * 1024
+        first.close()
+        assert ipfs.cache.fill_bytes == 0 and not ipfs.cache.filling and ipfs.cache.get(small_hash) is None
+        assert b"".join(ipfs.cat(large_hash, 64 * 1024)) == large
+        assert ipfs.cache.fill_bytes == 0 and ipfs.cache.get(large_hash) is None
+        assert b"".join(ipfs.cat(small_hash, 64 * 1024)) == small and ipfs.cache.get(small_hash) == small
+    print("   ✓ One copy per object, budget returned, objects over max_object_bytes pass through")
+
+
+if __name__ == '__main__':
+    run("Hot-Object Cache", globals())
@@ -0,0 +1,96 @@
+# test_blob_store.py - Disk-backed content-addressed blob store
+import os
+import sys
+import tempfile
+sys.path.append('/app')
+
+from modules.blob_store import DiskBlobStore
+from modules.ipfs_storage import IPFSManager
+from testutil import quiet, raises, run
+
+DATA = os.urandom(200 * 1024)
+
+
+def make_store():
+    with quiet():
+        return DiskBlobStore(tempfile.mkdtemp())
+
+
+def make_manager(backend='disk', root=None):
+    with quiet():
+        return IPFSManager(backend=backend, root=root or tempfile.mkdtemp())
+
+
+def test_sharded_layout():
+    print("\n1. Add and sharded layout...")
+    store = make_store()
+    digest = store.add(DATA)
+    assert len(digest) == 64
+    assert store.path(digest) == os.path.join(store.root, 'objects', digest[:2], digest[2:4], digest)
+    assert os.listdir(store.tmp_dir) == []
+    print("   ✓ Stored under objects/aa/bb/<sha256>, no temp files left")
+
+
+def test_streaming_add():
+    print("\n2. Streaming add...")
+    store = make_store()
+    digest = store.add(DATA)
+    assert store.add_stream([DATA[i:i + 4096] for i in range(0, len(DATA), 4096)]) == digest
+    assert store.size(digest) == len(DATA)
+    print("   ✓ Same content, same object")
+
+
+def test_mmap_read():
+    print("\n3. mmap read...")
+    store = make_store()
+    view = store.get(store.add(DATA))
+    assert isinstance(view, memoryview) and view == DATA
+    assert bytes(store.get(store.add(b""))) == b""
+    print("   ✓ Memoryview matches the stored bytes")
+
+
+def test_atomic_write():
+    print("\n4. Atomic write...")
+    store = make_store()
+
+    def broken():
+        yield b"partial"
+        raise IOError("upload aborted")
+
+    raises(IOError, store.add_stream, broken())
+    assert os.listdir(store.tmp_dir) == []
+    print("   ✓ Temp file discarded on error")
+
+
+def test_persistence_across_managers():
+    print("\n5. Persistence across managers...")
+    root = tempfile.mkdtemp()
+    with quiet():
+        ipfs_hash = make_manager(root=root).add(b"hello blobs")
+        assert bytes(make_manager(root=root).get(ipfs_hash)) == b"hello blobs"
+    print("   ✓ Blob readable from a fresh manager")
+
+
+def test_read_racing_delete():
+    print("\n6. Read racing a delete...")
+    manager = make_manager()
+    with quiet():
+        ipfs_hash = manager.add(b"swept soon")
+        read = manager.blob_store.get
+        manager.blob_store.get = lambda key: manager.blob_store.delete(key) and read(key)
+        assert "IPFS hash not found" in str(raises(FileNotFoundError, manager.get, ipfs_hash))
+    print("   ✓ Missing blob takes the not-found path")
+
+
+def test_malformed_keys():
+    print("\n7. Malformed keys...")
+    for backend in ('disk', 'memory'):
+        manager = make_manager(backend)
+        for key in ('Qm0123456789abcdef', 'Qm' + 'z' * 64, '../etc/passwd'):
+            with quiet():
+                assert "IPFS hash not found" in str(raises(FileNotFoundError, manager.get, key))
+    print("   ✓ Short, non-hex and path-like keys raise FileNotFoundError, as on the memory backend")
+
+
+if __name__ == '__main__':
+    run("Disk Blob Store", globals())
@@ -0,0 +1,137 @@
+# test_cpabe_hybrid.py - Hybrid key wrapping through ABEManager, and CP-ABE key persistence
+import sys
+import json
+import os
+import re
+import stat
+import struct
+import tempfile
+sys.path.append('/app')
+
+from cryptography.hazmat.primitives.keywrap import aes_key_wrap, aes_key_unwrap
+
+from modules.abe_crypto import ABEManager
+from modules.cpabe_hybrid import (CHARM_AVAILABLE, attribute_tag, legacy_attribute_tag, load_or_create_keys,
+                                  policy_tags)
+from modules.envelope import KEY_SCHEME_CPABE, parse_header
+from modules.policy import compile_policy
+from modules.stream_cipher import SEGMENT_SIZE
+from testutil import quiet, raises, run
+
+
+class FakeKeyWrapper:
+    """Stands in for CPABEKeyWrapper: the policy travels with the wrapped key and is enforced on unwrap"""
+
+    def __init__(self, kek):
+        self.kek = kek
+        self.unwraps = 0
+
+    def wrap(self, data_key, policy):
+        encoded = json.dumps(policy).encode()
+        return struct.pack(">I", len(encoded)) + encoded + aes_key_wrap(self.kek, data_key)
+
+    def _open(self, wrapped):
+        (length,) = struct.unpack_from(">I", wrapped, 0)
+        return json.loads(bytes(wrapped[4:4 + length])), aes_key_unwrap(self.kek, bytes(wrapped[4 + length:]))
+
+    def unwrap(self, wrapped, user_attributes):
+        self.unwraps += 1
+        policy, data_key = self._open(wrapped)
+        if not compile_policy(policy).evaluate(user_attributes):
+            raise PermissionError("Access policy not satisfied: CP-ABE key does not match ciphertext policy")
+        return data_key
+
+    def authority_unwrap(self, wrapped, policy):
+        return self._open(wrapped)[1]
+
+
+POLICY = {'role': ['manager', 'hr']}
+MANAGER = {'role': 'manager'}
+DATA = os.urandom(3 * SEGMENT_SIZE + 11)
+
+
+def hybrid_manager():
+    """Hybrid ABEManager over a FakeKeyWrapper, and the wrapper"""
+    with quiet():
+        wrapper = FakeKeyWrapper(os.urandom(32))
+        return ABEManager(mode='hybrid', key_wrapper=wrapper), wrapper
+
+
+def test_hybrid_round_trip():
+    print("\n1. Hybrid round trip...")
+    hybrid, wrapper = hybrid_manager()
+    blob = hybrid.encrypt(DATA, POLICY)
+    header, _ = parse_header(blob)
+    assert header.key_scheme == KEY_SCHEME_CPABE and len(header.key) > 32
+    with quiet():
+        assert hybrid.decrypt(blob, MANAGER) == DATA
+    assert wrapper.unwraps == 1
+    print(f"   ✓ {len(header.key)} byte wrapped key in the envelope; payload decrypts")
+
+
+def test_no_wrapper_no_key():
+    print("\n2. Symmetric manager...")
+    hybrid, _ = hybrid_manager()
+    blob = hybrid.encrypt(DATA, POLICY)
+    with quiet():
+        raises(ValueError, ABEManager().decrypt, blob, MANAGER)
+        raises(PermissionError, hybrid.decrypt, blob, {'role': 'engineer'})
+    print("   ✓ No wrapper, no key; wrong role denied")
+
+
+def test_rewrap():
+    print("\n3. Rewrap...")
+    hybrid, _ = hybrid_manager()
+    header_bytes, payload = hybrid.split_envelope(hybrid.encrypt(DATA, POLICY))
+    new_header = hybrid.rewrap(bytes(header_bytes), {'role': 'engineer'})
+    with quiet():
+        assert hybrid.decrypt(new_header + payload, {'role': 'engineer'}) == DATA
+    print("   ✓ Data key re-wrapped under the new policy")
+
+
+def test_key_persistence():
+    print("\n4. Key persistence...")
+    calls = []
+
+    def setup():
+        calls.append(1)
+        return {'g': len(calls)}, {'alpha': len(calls)}
+
+    with tempfile.TemporaryDirectory() as root, quiet():
+        path = os.path.join(root, 'keys', 'cpabe_keys')
+        dumps, loads = (lambda keys: json.dumps(keys).encode()), (lambda raw: json.loads(raw))
+        first = load_or_create_keys(path, setup, dumps, loads)
+        assert stat.S_IMODE(os.stat(path).st_mode) == 0o600
+        assert load_or_create_keys(path, setup, dumps, loads) == first and len(calls) == 1
+        assert os.listdir(os.path.dirname(path)) == ['cpabe_keys']
+        assert load_or_create_keys(None, setup, dumps, loads) == ({'g': 2}, {'alpha': 2})
+    print("   ✓ Setup runs once; the saved pair is reused and kept 0600")
+
+
+def test_attribute_tags():
+    print("\n5. Attribute tags...")
+    pairs = [('dept', 'r-d'), ('dept', 'rd'), ('dept', 'r_d'), ('a', 'bc'), ('ab', 'c'), ('a:b', 'c'), ('a', 'b:c'),
+             ('role', 'manager'), ('role', 'Manager '), ('x', ''), ('', 'x'), ('level', 1), ('level', '1')]
+    tags = [attribute_tag(key, value) for key, value in pairs]
+    assert len(set(tags)) == len(pairs) - 1 and attribute_tag('role', 'manager') == attribute_tag('ROLE', 'Manager')
+    assert all(re.fullmatch(r"[A-Z2-7]*-[A-Z2-7]*", tag) for tag in tags)
+    assert legacy_attribute_tag('dept', 'r-d') == legacy_attribute_tag('dept', 'rd')
+    assert policy_tags('dept:r-d or dept:rd') == tuple(sorted(tags[:2]))
+    print(f"   ✓ {len(set(tags))} distinct tags, e.g. role:manager -> {attribute_tag('role', 'manager')}")
+
+
+def test_charm_key_wrapper():
+    print("\n6. Charm key wrapper...")
+    if not CHARM_AVAILABLE:
+        print("   - Charm-crypto not installed, skipped")
+        return
+    with tempfile.TemporaryDirectory() as root, quiet():
+        path = os.path.join(root, 'cpabe_keys')
+        blob = ABEManager(mode='hybrid', key_path=path).encrypt(DATA, POLICY)
+        # A new process (new wrapper) loads the same master key
+        assert ABEManager(mode='hybrid', key_path=path).decrypt(blob, MANAGER) == DATA
+    print("   ✓ Hybrid blob decrypts after a restart")
+
+
+if __name__ == '__main__':
+    run("Hybrid Key Wrapping", globals())
@@ -0,0 +1,59 @@
+# test_database.py - DatabaseManager secondary indexes
+import sys
+import time
+sys.path.append('/app')
+
+from modules.database import DatabaseManager
+from testutil import quiet, run
+
+
+def populated_db():
+    """20000 files over 100 owners, and one access log per file over 50 access codes"""
+    with quiet():
+        db = DatabaseManager()
+        for i in range(20000):
+            db.insert_file_record({'user_id': f'user{i % 100}', 'access_code': f'AC{i}', 'file_name': f'f{i}'})
+            db.log_access({'user_id': f'user{i % 100}', 'access_code': f'AC{i % 50}', 'status': 'success'})
+    return db
+
+
+def test_index_lookups():
+    print("\n1. Index lookups...")
+    db = populated_db()
+    with quiet():
+        assert db.get_file_by_access_code('AC1234')['file_name'] == 'f1234'
+        assert db.get_file_by_access_code('missing') is None
+        files = db.get_user_files('user7')
+        assert files == [f for f in db.iter_file_records() if f['user_id'] == 'user7']
+        logs = db.get_access_logs('AC3')
+    assert logs == [l for l in db.access_logs if l['access_code'] == 'AC3'] and len(logs) == 400
+    print("   ✓ Access code, owner and log lookups match a scan")
+
+
+def test_update_and_delete():
+    print("\n2. Update and delete...")
+    db = populated_db()
+    with quiet():
+        db.update_file_record('AC5', {'user_id': 'new-owner', 'access_code': 'AC5b'})
+        assert db.get_file_by_access_code('AC5') is None
+        assert [f['file_name'] for f in db.get_user_files('new-owner')] == ['f5']
+        db.delete_file_record('AC5b')
+        assert db.get_file_by_access_code('AC5b') is None and db.get_user_files('new-owner') == []
+        assert len(db.get_user_files('user5')) == 199
+    print("   ✓ Indexes follow key changes and deletions")
+
+
+def test_lookup_cost():
+    print("\n3. Lookup cost...")
+    db = populated_db()
+    with quiet():
+        start = time.perf_counter()
+        for i in range(10000):
+            db.get_file_by_access_code(f'AC{i}')
+        elapsed = time.perf_counter() - start
+    assert elapsed < 1.0
+    print(f"   ✓ 10000 lookups in {elapsed * 1000:.1f}ms over 20000 records")
+
+
+if __name__ == '__main__':
+    run("Database Indexes", globals())
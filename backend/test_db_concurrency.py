@@ -0,0 +1,147 @@
+# test_db_concurrency.py - DatabaseManager under many concurrent threads
+import sys
+import contextlib
+import os
+import random
+import tempfile
+import threading
+import time
+sys.path.append('/app')
+
+from modules.database import DatabaseManager
+from modules.sqlite_database import SQLiteDatabaseManager
+from modules.rwlock import ReadWriteLock
+from testutil import quiet, run
+
+THREADS = 16
+
+
+@contextlib.contextmanager
+def frequent_switches():
+    """Force frequent thread switches so races have a chance to show up"""
+    switch_interval = sys.getswitchinterval()
+    sys.setswitchinterval(1e-5)
+    try:
+        yield
+    finally:
+        sys.setswitchinterval(switch_interval)
+
+
+def hammer(db, per_thread):
+    """Every thread inserts, looks up, renames and logs its own files while the others do the same"""
+    errors = []
+    barrier = threading.Barrier(THREADS)
+
+    def worker(t):
+        rng = random.Random(t)
+        try:
+            barrier.wait()
+            for i in range(per_thread):
+                code = f'T{t}-{i}'
+                db.insert_file_record({'user_id': f'user{t % 4}', 'access_code': code, 'file_name': code})
+                db.log_access({'user_id': f'user{t}', 'access_code': f'AC{i % 8}', 'status': 'success'})
+                probe = f'T{t}-{rng.randrange(i + 1)}'
+                found = db.get_file_by_access_code(probe) or db.get_file_by_access_code(probe + 'r')
+                assert found is not None and found['file_name'] == probe, probe
+                if i % 10 == 0:
+                    assert db.update_file_record(code, {'access_code': code + 'r'}) is not None
+                db.get_user_files_page(f'user{rng.randrange(4)}', limit=20)
+        except Exception as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=worker, args=(t,)) for t in range(THREADS)]
+    with quiet():
+        start = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        elapsed = time.perf_counter() - start
+    assert not errors, errors[:3]
+    return elapsed
+
+
+def check(db, per_thread):
+    total = THREADS * per_thread
+    with quiet():
+        records = db.iter_file_records()
+        assert sorted(r['id'] for r in records) == list(range(1, total + 1))
+        assert db.get_total_files() == total and db.get_total_access_logs() == total
+        for t in range(THREADS):
+            for i in range(per_thread):
+                code = f'T{t}-{i}' + ('r' if i % 10 == 0 else '')
+                assert db.get_file_by_access_code(code)['file_name'] == f'T{t}-{i}'
+        for u in range(4):
+            ids = [r['id'] for r in db.get_user_files(f'user{u}')]
+            assert ids == sorted(ids) and len(ids) == total // 4
+        assert sum(len(db.get_access_logs(f'AC{c}')) for c in range(8)) == total
+
+
+def run_threads(target, count):
+    threads = [threading.Thread(target=target) for _ in range(count)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+
+def test_readers_share_lock():
+    print("\n1. Reader-writer lock, readers...")
+    lock = ReadWriteLock()
+    inside = []
+    both_in = threading.Event()
+
+    def reader():
+        with lock.read():
+            inside.append(1)
+            if len(inside) == 2:
+                both_in.set()
+            assert both_in.wait(2)
+
+    run_threads(reader, 2)
+    assert both_in.is_set()
+    print("   ✓ Two readers held the lock at once")
+
+
+def test_writers_exclude_each_other():
+    print("\n2. Reader-writer lock, writers...")
+    lock = ReadWriteLock()
+    counter = [0]
+
+    def writer():
+        for _ in range(2000):
+            with lock.write():
+                value = counter[0]
+                counter[0] = value + 1
+
+    with frequent_switches():
+        run_threads(writer, 4)
+    assert counter[0] == 8000
+    print("   ✓ No lost updates across 4 writers")
+
+
+def test_in_memory_store():
+    print(f"\n3. In-memory DatabaseManager, {THREADS} threads...")
+    with quiet():
+        db = DatabaseManager()
+    with frequent_switches():
+        elapsed = hammer(db, 400)
+    check(db, 400)
+    print(f"   ✓ {THREADS * 400} inserts with lookups, renames and logs in {elapsed:.2f}s; "
+          f"ids unique and indexes consistent")
+
+
+def test_sqlite_store():
+    print(f"\n4. SQLiteDatabaseManager, {THREADS} threads...")
+    with tempfile.TemporaryDirectory() as tmp:
+        with quiet():
+            db = SQLiteDatabaseManager(os.path.join(tmp, 'metadata.db'))
+        with frequent_switches():
+            elapsed = hammer(db, 60)
+        check(db, 60)
+        db.close()
+    print(f"   ✓ {THREADS * 60} inserts with lookups, renames and logs in {elapsed:.2f}s")
+
+
+if __name__ == '__main__':
+    run("Database Concurrency", globals())
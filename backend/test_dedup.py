@@ -0,0 +1,106 @@
+# test_dedup.py - Content-defined chunking and convergent chunk encryption
+import os
+import sys
+sys.path.append('/app')
+
+from modules.dedup import FastCDC, DedupStore, NUMPY_AVAILABLE
+from modules.ipfs_storage import IPFSManager
+from testutil import quiet, raises, run
+
+SIZES = (8 * 1024, 32 * 1024, 128 * 1024)
+DATA = os.urandom(2 * 1024 * 1024)
+EDITED = DATA[:500000] + b"inserted bytes" + DATA[500000:]
+
+
+def chunker():
+    return FastCDC(min_size=SIZES[0], avg_size=SIZES[1], max_size=SIZES[2])
+
+
+def make_store(secret=b"test-secret", ipfs=None):
+    with quiet():
+        return DedupStore(ipfs or IPFSManager(), secret, *SIZES)
+
+
+def reference_chunks(cdc, data):
+    chunks, pos = [], 0
+    while pos < len(data):
+        size = cdc.cut(data, pos, len(data))
+        chunks.append(data[pos:pos + size])
+        pos += size
+    return chunks
+
+
+def test_chunk_boundaries():
+    print("\n1. FastCDC boundaries...")
+    cdc = chunker()
+    chunks = list(cdc.split([DATA]))
+    assert b"".join(chunks) == DATA
+    assert all(SIZES[0] <= len(c) <= SIZES[2] for c in chunks[:-1])
+    assert list(cdc.split(DATA[i:i + 1000] for i in range(0, len(DATA), 1000))) == chunks
+    # The batched (numpy) path must cut exactly where the byte-at-a-time loop does
+    for size in (len(DATA), 0, 100, 8 * 1024 + 63, 8 * 1024 + 64, 200 * 1024):
+        assert list(cdc.split([DATA[:size]])) == reference_chunks(cdc, DATA[:size])
+    print(f"   ✓ {len(chunks)} chunks, independent of input block size (numpy: {NUMPY_AVAILABLE})")
+
+
+def test_insertion_stability():
+    print("\n2. Insertion stability...")
+    chunks = list(chunker().split([DATA]))
+    shared = set(chunks) & set(chunker().split([EDITED]))
+    assert len(shared) >= len(chunks) - 2
+    print(f"   ✓ {len(shared)}/{len(chunks)} chunks unchanged")
+
+
+def test_convergent_storage():
+    print("\n3. Convergent storage...")
+    store = make_store()
+    with quiet():
+        store.put([DATA])
+        restored = b"".join(store.get(store.put([EDITED])))
+    assert restored == EDITED
+    stats = store.stats()
+    assert stats['chunks_reused'] >= len(list(chunker().split([DATA]))) - 2 and stats['dedup_ratio'] > 1.9
+    print(f"   ✓ Dedup ratio {stats['dedup_ratio']}x")
+
+
+def test_keyed_convergence():
+    print("\n4. Keyed convergence...")
+    store = make_store()
+    with quiet():
+        manifest = store.put([DATA])
+    chunk = next(chunker().split([DATA]))
+    assert make_store(b"other-secret").chunk_key(chunk) != store.chunk_key(chunk)
+    unkeyed = make_store("", store.ipfs)
+    assert b"".join(unkeyed.get(manifest)) == DATA
+    raises(RuntimeError, unkeyed.put, [DATA])
+    print("   ✓ Keys depend on the deployment secret; none configured, no new chunks")
+
+
+def test_release_reports_orphans():
+    print("\n5. Reference counts...")
+    store = make_store()
+    with quiet():
+        first = store.put([DATA])
+        store.put([EDITED])
+    orphaned = store.release(first)
+    assert 0 < len(orphaned) <= 2
+    print(f"   ✓ {len(orphaned)} chunks orphaned")
+
+
+def test_restart_restores_counts():
+    print("\n6. Restart...")
+    before = make_store()
+    with quiet():
+        first, second = before.put([DATA]), before.put([EDITED])
+    after = make_store(ipfs=before.ipfs)
+    for manifest in (first, second):
+        after.restore({'chunks': [entry[0] for entry in manifest['chunks']],
+                       'chunk_sizes': [entry[2] for entry in manifest['chunks']]})
+    for key in ('unique_chunks', 'logical_bytes', 'stored_bytes', 'dedup_ratio'):
+        assert after.stats()[key] == before.stats()[key], key
+    assert sorted(after.release(first)) == sorted(before.release(first))
+    print(f"   ✓ {after.stats()['unique_chunks']} chunks and ratio {after.stats()['dedup_ratio']}x restored")
+
+
+if __name__ == '__main__':
+    run("Dedup Store", globals())
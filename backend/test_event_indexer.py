@@ -0,0 +1,214 @@
+# test_event_indexer.py - Contract event index: ranges, decoding and reorgs
+import sys
+import hashlib
+import json
+import time
+sys.path.append('/app')
+
+from eth_abi import encode
+from eth_utils import event_abi_to_log_topic
+from web3 import Web3
+
+from modules.event_indexer import EventIndexer
+from testutil import quiet, raises, run
+
+CONTRACT = Web3.to_checksum_address('0x' + '11' * 20)
+ALICE = Web3.to_checksum_address('0x' + 'a1' * 20)
+BOB = Web3.to_checksum_address('0x' + 'b0' * 20)
+
+
+class FakeChain:
+    """Blocks, logs and transactions as the node's JSON-RPC would return them"""
+
+    def __init__(self, contract):
+        self.contract = contract
+        self.topic = {abi['name']: event_abi_to_log_topic(abi) for abi in contract.abi if abi['type'] == 'event'}
+        self.blocks = []
+        self.txs = {}
+        self.fork = 0
+        self.get_logs_calls = 0
+        self.mine()   # genesis
+
+    @property
+    def block_number(self):
+        return len(self.blocks) - 1
+
+    def mine(self, *events):
+        """Append a block holding (sender, function, args, event, topics, data) transactions"""
+        number = len(self.blocks)
+        block_hash = hashlib.sha256(f'{self.fork}:{number}'.encode()).digest()
+        logs = []
+        for i, (sender, function, args, event, topics, data) in enumerate(events):
+            tx_hash = hashlib.sha256(f'{self.fork}:{number}:{i}'.encode()).digest()
+            self.txs[Web3.to_hex(tx_hash)] = {'from': sender, 'input': self.contract.encodeABI(fn_name=function, args=args)}
+            logs.append({
+                'address': CONTRACT, 'topics': [self.topic[event]] + topics, 'data': data,
+                'blockNumber': number, 'blockHash': block_hash, 'transactionHash': tx_hash,
+                'transactionIndex': i, 'logIndex': i, 'removed': False
+            })
+        self.blocks.append({'hash': block_hash, 'logs': logs})
+
+    def reorg(self, keep):
+        """Drop every block above `keep`; new blocks get different hashes"""
+        self.fork += 1
+        del self.blocks[keep + 1:]
+
+    def get_block(self, number):
+        if number > self.block_number:
+            raise ValueError(f"Block {number} not found")
+        return {'hash': self.blocks[number]['hash']}
+
+    def get_logs(self, params):
+        self.get_logs_calls += 1
+        wanted = set(params['topics'][0])
+        return [log for block in self.blocks[params['fromBlock']:params['toBlock'] + 1] for log in block['logs']
+                if Web3.to_hex(log['topics'][0]) in wanted]
+
+    def get_transaction(self, tx_hash):
+        return self.txs[tx_hash]
+
+
+def register(address, bcid, public_key):
+    return (address, 'registerUser', [bcid, public_key], 'UserRegistered',
+            [bytes(12) + bytes.fromhex(address[2:])], encode(['string', 'uint256'], [bcid, 1700000000]))
+
+
+def share(sender, cid, owner_bcid, policy):
+    return (sender, 'shareFile', [cid, 'k', policy], 'FileShared',
+            [Web3.keccak(text=cid)], encode(['string', 'uint256'], [owner_bcid, 1700000001]))
+
+
+def access(sender, cid):
+    return (sender, 'logFileAccess', [cid], 'FileAccessed',
+            [Web3.keccak(text=cid), bytes(12) + bytes.fromhex(sender[2:])], encode(['uint256'], [1700000002]))
+
+
+class FakeWeb3:
+    def __init__(self, chain):
+        self.eth = chain
+
+
+def synced_indexer():
+    """Nine blocks (a registration, two shares, two accesses) indexed in ranges of 3"""
+    with open('contracts/FileSharing_ABI.json') as f:
+        contract = Web3().eth.contract(address=CONTRACT, abi=json.load(f))
+    chain = FakeChain(contract)
+    chain.mine(register(ALICE, 'alice-bcid', 'alice-pk'))
+    chain.mine(share(ALICE, 'QmA', 'alice-bcid', 'role:hr'), share(ALICE, 'QmB', 'alice-bcid', 'role:eng'))
+    for _ in range(5):
+        chain.mine()
+    chain.mine(access(BOB, 'QmA'), access(BOB, 'QmA'))
+    indexer = EventIndexer(FakeWeb3(chain), contract, max_range=3, reorg_depth=16)
+    added = indexer.sync_once()
+    return chain, indexer, added
+
+
+def failing_get_logs(params):
+    raise ConnectionError("node down")
+
+
+def test_initial_sync():
+    print("\n1. Initial sync...")
+    chain, indexer, added = synced_indexer()
+    assert added == 5 and indexer.synced and indexer.last_block == chain.block_number
+    assert chain.get_logs_calls == 3
+    meta = indexer.get_file('QmA')
+    assert meta['owner'] == ALICE and meta['owner_bcid'] == 'alice-bcid' and meta['access_policy'] == 'role:hr'
+    assert meta['is_active'] and meta['indexed_block'] == 8
+    user = indexer.get_user(ALICE.lower())
+    assert user['bcid'] == 'alice-bcid' and user['publicKey'] == 'alice-pk' and user['isRegistered']
+    assert [a['accessor'] for a in indexer.get_accesses('QmA')] == [BOB, BOB]
+    assert indexer.get_file('QmZ') is None and indexer.get_user(BOB) is None
+    print(f"   ✓ 9 blocks in {chain.get_logs_calls} eth_getLogs calls; cids, policies and keys recovered")
+
+
+def test_idle_sync():
+    print("\n2. Idle sync...")
+    chain, indexer, _ = synced_indexer()
+    calls = chain.get_logs_calls
+    assert indexer.sync_once() == 0 and chain.get_logs_calls == calls
+    chain.mine(share(BOB, 'QmC', 'bob-bcid', 'role:ops'))
+    assert indexer.sync_once() == 1 and indexer.get_file('QmC')['owner'] == BOB
+    print("   ✓ Nothing new costs one hash check; only new blocks are read")
+
+
+def test_shallow_reorg():
+    print("\n3. Reorg...")
+    chain, indexer, _ = synced_indexer()
+    chain.mine(share(BOB, 'QmC', 'bob-bcid', 'role:ops'))
+    indexer.sync_once()
+    # QmC's block is replaced by one sharing QmD
+    chain.reorg(8)
+    chain.mine(share(BOB, 'QmD', 'bob-bcid', 'role:ops'))
+    chain.mine()
+    with quiet():
+        indexer.sync_once()
+    assert indexer.get_file('QmC') is None and indexer.get_file('QmD')['block_number'] == 9
+    assert indexer.get_file('QmA') is not None and indexer.stats()['reorgs'] == 1
+    print("   ✓ Orphaned block's events dropped, new branch indexed")
+
+
+def test_deep_reorg():
+    print("\n4. Deep reorg...")
+    chain, indexer, _ = synced_indexer()
+    # Below every remembered block (and the accesses with it)
+    chain.reorg(0)
+    chain.mine(share(ALICE, 'QmE', 'alice-bcid', 'role:hr'))
+    for _ in range(30):
+        chain.mine()
+    with quiet():
+        indexer.sync_once()
+    assert indexer.get_file('QmA') is None and indexer.get_accesses('QmA') == []
+    assert indexer.get_file('QmE') is not None and indexer.last_block == chain.block_number
+    print("   ✓ Index rebuilt from the start block")
+
+
+def test_lookup_cost():
+    print("\n5. Lookup cost...")
+    _, indexer, _ = synced_indexer()
+    start = time.perf_counter()
+    for _ in range(10000):
+        indexer.get_file('QmA')
+    per_lookup = (time.perf_counter() - start) / 10000 * 1e6
+    assert per_lookup < 200
+    print(f"   ✓ {per_lookup:.1f}µs per metadata lookup")
+
+
+def test_failed_poll_clears_synced():
+    print("\n6. Failed poll...")
+    chain, indexer, _ = synced_indexer()
+    get_logs, chain.get_logs = chain.get_logs, failing_get_logs
+    chain.mine(share(BOB, 'QmF', 'bob-bcid', 'role:ops'))
+    raises(ConnectionError, indexer.sync_once)
+    assert not indexer.synced and indexer.stats()['sync_failures'] == 1
+    chain.get_logs = get_logs
+    indexer.sync_once()
+    assert indexer.synced and indexer.get_file('QmF') is not None
+    print("   ✓ Reads go back to the node until a poll succeeds")
+
+
+def test_lag_clears_synced():
+    print("\n7. Falling behind...")
+    chain, indexer, _ = synced_indexer()
+    get_logs = chain.get_logs
+    # Two blocks arrive during every range read
+    chain.get_logs = lambda params: (chain.mine(), chain.mine(), get_logs(params))[-1]
+    chain.mine()
+    indexer.sync_once()
+    assert not indexer.synced and indexer.last_block < chain.block_number
+    chain.get_logs = get_logs
+    indexer.sync_once()
+    assert indexer.synced
+    print("   ✓ Lag past max_lag clears synced; catching up restores it")
+
+
+def test_stalled_poller_goes_stale():
+    print("\n8. Stalled poller...")
+    _, indexer, _ = synced_indexer()
+    indexer.synced_at -= indexer.stale_after + 1
+    assert not indexer.synced
+    print(f"   ✓ No successful poll for {indexer.stale_after}s clears synced")
+
+
+if __name__ == '__main__':
+    run("Event Indexer", globals())
@@ -0,0 +1,69 @@
+# test_ipfs_http.py - IPFS HTTP client against the offline stand-in server
+import os
+import sys
+import contextlib
+from concurrent.futures import ThreadPoolExecutor
+sys.path.append('/app')
+
+from modules.ipfs_http import IPFSHTTPClient, IPFSHTTPError
+from modules.ipfs_standin import StandInIPFSServer
+from modules.ipfs_storage import IPFSManager
+from testutil import quiet, raises, run
+
+
+@contextlib.contextmanager
+def standin():
+    """A throwaway stand-in daemon, stopped on exit"""
+    server = StandInIPFSServer().start()
+    try:
+        yield server
+    finally:
+        server.stop()
+
+
+def make_client(server):
+    return IPFSHTTPClient(port=server.port, pool_size=4, chunk_size=64 * 1024)
+
+
+def test_streaming_add_cat():
+    print("\n1. Streaming add/cat...")
+    with standin() as server:
+        client = make_client(server)
+        data = os.urandom(3 * 1024 * 1024 + 7)
+        cid = client.add_stream(data[i:i + 100000] for i in range(0, len(data), 100000))
+        chunks = list(client.cat(cid))
+    assert b"".join(chunks) == data and len(chunks) > 1
+    print(f"   ✓ {len(data)} bytes round-tripped in {len(chunks)} chunks")
+
+
+def test_missing_hash():
+    print("\n2. Missing hash...")
+    with standin() as server:
+        error = raises(IPFSHTTPError, make_client(server).get, 'QmMissing')
+    assert 'not found' in str(error)
+    print("   ✓ Daemon error message passed through")
+
+
+def test_concurrent_requests():
+    print("\n3. Concurrent requests...")
+    blobs = [os.urandom(50000) for _ in range(16)]
+    with standin() as server, ThreadPoolExecutor(max_workers=8) as pool:
+        client = make_client(server)
+        cids = list(pool.map(client.add, blobs))
+        assert list(pool.map(client.get, cids)) == blobs
+    print("   ✓ 16 uploads and reads through a 4-connection pool")
+
+
+def test_manager_backend():
+    print("\n4. IPFSManager backend...")
+    with standin() as server, quiet():
+        ipfs = IPFSManager(backend='http', port=server.port)
+        ipfs_hash = ipfs.add(b"hello daemon")
+        assert ipfs.get(ipfs_hash) == b"hello daemon"
+        assert b"".join(ipfs.cat(ipfs_hash, 4)) == b"hello daemon"
+        assert ipfs.delete(ipfs_hash) and not ipfs.delete(ipfs_hash)
+    print("   ✓ add/get/cat/delete go over HTTP")
+
+
+if __name__ == '__main__':
+    run("IPFS HTTP Client", globals())
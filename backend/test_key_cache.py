@@ -0,0 +1,69 @@
+# test_key_cache.py - Derived key cache eviction, TTL and warm-up
+import sys
+sys.path.append('/app')
+
+from modules.key_cache import KeyCache
+from modules.abe_crypto import ABEManager
+from modules.blockchain import BlockchainManager
+from testutil import quiet, run
+
+
+def counting_abe():
+    """ABEManager plus the list of tag sets its KDF was run for"""
+    with quiet():
+        abe = ABEManager()
+    calls = []
+    derive = abe._derive_private_key
+    abe._derive_private_key = lambda tags: calls.append(tags) or derive(tags)
+    return abe, calls
+
+
+def test_eviction_and_ttl():
+    print("\n1. Eviction and TTL...")
+    now = [0.0]
+    cache = KeyCache(max_entries=2, ttl_seconds=10, clock=lambda: now[0])
+    cache.put('a', 1)
+    cache.put('b', 2)
+    cache.get('a')
+    cache.put('c', 3)
+    assert cache.get('b') is None and cache.get('a') == 1
+    now[0] = 11
+    assert cache.get('a') is None
+    print("   ✓ Least recently used and expired entries dropped")
+
+
+def test_canonical_tag_set():
+    print("\n2. Canonical tag set...")
+    abe, calls = counting_abe()
+    k1 = abe.generate_user_keys({'role': 'engineer', 'dept': 'IT'})
+    k2 = abe.generate_user_keys({'dept': 'IT', 'role': 'engineer'})
+    assert k1['private_key'] == k2['private_key'] and len(calls) == 1
+    print("   ✓ Attribute order doesn't matter; second call served from cache")
+
+
+def test_warm_up():
+    print("\n3. Warm-up hook...")
+    abe, calls = counting_abe()
+    abe.warm_user_keys({'role': 'hr'}).result()
+    abe.generate_user_keys({'role': 'hr'})
+    assert len(calls) == 1
+    print("   ✓ Request after warm-up paid no KDF cost")
+
+
+def test_registration_path():
+    print("\n4. Registration path...")
+    abe, calls = counting_abe()
+    # /api/register calls the off-chain register_user; no node needed for it
+    blockchain = BlockchainManager.__new__(BlockchainManager)
+    blockchain.users = {}
+    with quiet():
+        user_id = blockchain.register_user('carol', {'role': 'auditor'})
+        abe.warm_user_keys({'role': 'auditor'}).result()
+    assert blockchain.users[user_id]['attributes'] == {'role': 'auditor'}
+    abe.generate_user_keys({'role': 'auditor'})
+    assert len(calls) == 1
+    print("   ✓ Registered user's keys derived before their first request")
+
+
+if __name__ == '__main__':
+    run("Derived Key Cache", globals())
@@ -0,0 +1,85 @@
+# test_pagination.py - Keyset-paginated file and access-log listings
+import sys
+import os
+import tempfile
+sys.path.append('/app')
+
+from modules.database import DatabaseManager
+from modules.sqlite_database import SQLiteDatabaseManager
+from modules.access_log_writer import AccessLogWriter
+from testutil import quiet, run
+
+
+def walk(fetch_page, limit, cursor=None):
+    """Follow next_cursor from cursor; returns all items and the page count"""
+    items, pages = [], 0
+    while True:
+        page, cursor = fetch_page(cursor, limit)
+        items.extend(page)
+        pages += 1
+        if cursor is None:
+            return items, pages
+
+
+def filled_backends():
+    """An in-memory and a SQLite manager, each with 250 files over 3 owners and 101 logs over 2 codes"""
+    with quiet():
+        dbs = [DatabaseManager(), SQLiteDatabaseManager(os.path.join(tempfile.mkdtemp(), 'metadata.db'))]
+        for db in dbs:
+            for i in range(250):
+                db.insert_file_record({'user_id': f'user{i % 3}', 'access_code': f'AC{i}', 'file_name': f'f{i}'})
+            db.log_access_many([{'user_id': f'u{i}', 'access_code': f'AC{i % 2}', 'status': 'success'}
+                                for i in range(101)])
+    return dbs
+
+
+def test_pages_match_full_listing():
+    print("\n1. Full listing...")
+    for db in filled_backends():
+        files, pages = walk(lambda cursor, size: db.get_user_files_page('user1', cursor, size), 20)
+        assert [f['file_name'] for f in files] == [f['file_name'] for f in db.get_user_files('user1')]
+        assert len(files) == 83 and pages == 5
+        logs, pages = walk(lambda cursor, size: db.get_access_logs_page('AC0', cursor, size), 17)
+        assert logs == db.get_access_logs('AC0') and len(logs) == 51 and pages == 3
+    print("   ✓ Cursor pages concatenate to the full listing, in memory and in SQLite")
+
+
+def test_last_page_ends_listing():
+    print("\n2. Exact multiple of the limit...")
+    for db in filled_backends():
+        page, cursor = db.get_access_logs_page('AC1', None, 50)
+        assert len(page) == 50 and cursor is None
+        assert db.get_user_files_page('nobody') == ([], None)
+    print("   ✓ next_cursor is None on the last page, not an empty page after it")
+
+
+def test_delete_while_paging():
+    print("\n3. Delete while paging...")
+    for db in filled_backends():
+        first, cursor = db.get_user_files_page('user1', None, 10)
+        with quiet():
+            db.delete_file_record(first[3]['access_code'])
+        rest, _ = walk(lambda c, size: db.get_user_files_page('user1', c, size), 10, cursor)
+        del first[3]
+        assert [f['file_name'] for f in first + rest] == [f['file_name'] for f in db.get_user_files('user1')]
+    print("   ✓ Deleting a row already paged past doesn't shift the rest")
+
+
+def test_writer_queued_events():
+    print("\n4. Access log writer...")
+    with quiet():
+        db = DatabaseManager()
+        db.log_access_many([{'user_id': f'u{i}', 'access_code': 'AC1', 'status': 'success'} for i in range(30)])
+        writer = AccessLogWriter(db, batch_size=1000, flush_interval=60)
+        for i in range(30, 35):
+            writer.log({'user_id': f'u{i}', 'access_code': 'AC1', 'status': 'success'})
+        first, cursor = writer.get_access_logs_page('AC1', None, 20)
+        last, end = writer.get_access_logs_page('AC1', cursor, 20)
+        writer.close()
+    assert len(first) == 20 and end is None
+    assert [l['user_id'] for l in first + last] == [f'u{i}' for i in range(35)]
+    print("   ✓ 30 committed + 5 queued events across two pages, in order")
+
+
+if __name__ == '__main__':
+    run("Paginated Listings", globals())
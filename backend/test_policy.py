@@ -0,0 +1,66 @@
+# test_policy.py - Compiled policy engine
+import sys
+sys.path.append('/app')
+
+from modules.policy import compile_policy, MAX_POLICY_ATTRIBUTES
+from modules.abe_crypto import ABEManager
+from testutil import quiet, raises, run
+
+EXPRESSION = '(role:manager or role:hr) and dept:IT'
+
+
+def test_dict_policies():
+    print("\n1. Dict policies...")
+    policy = compile_policy({'role': ['manager', 'hr'], 'dept': 'IT'})
+    assert policy.evaluate({'role': 'Manager', 'dept': 'it'})
+    assert not policy.evaluate({'role': 'hr'})
+    assert not policy.evaluate({'role': 'engineer', 'dept': 'IT'})
+    assert compile_policy({}).evaluate({})
+    print("   ✓ Any listed value per key, case-insensitive")
+
+
+def test_expressions():
+    print("\n2. Boolean expressions...")
+    expr = compile_policy(EXPRESSION)
+    assert expr.evaluate({'role': 'hr', 'dept': 'IT'})
+    assert not expr.evaluate({'role': 'hr', 'dept': 'HR'})
+    assert compile_policy('role:admin or (dept:IT and level:senior)').evaluate({'dept': 'IT', 'level': 'senior'})
+    for bad in ['role:manager and', '(role:hr', 'role']:
+        raises(ValueError, compile_policy, bad)
+    print("   ✓ Expressions parsed and malformed ones rejected")
+
+
+def test_cache_and_batch():
+    print("\n3. Cache and batch API...")
+    assert compile_policy({'role': ['manager', 'hr']}) is compile_policy({'role': ['manager', 'hr']})
+    expr = compile_policy(EXPRESSION)
+    users = [{'role': r, 'dept': d} for r in ['manager', 'hr', 'engineer'] for d in ['IT', 'HR']] * 1000
+    assert expr.evaluate_many(users) == [expr.evaluate(u) for u in users]
+    print(f"   ✓ Batch of {len(users)} attribute sets matches single evaluation")
+
+
+def test_abe_manager_agrees():
+    print("\n4. ABEManager integration...")
+    with quiet():
+        abe = ABEManager()
+    assert abe.check_access({'role': 'HR'}, {'role': ['manager', 'hr']})
+    assert not abe.check_access({'role': 'engineer'}, {'role': ['manager', 'hr']})
+    blob = abe.encrypt(b"policy", EXPRESSION)
+    assert abe.decrypt(blob, {'role': 'manager', 'dept': 'IT'}) == b"policy"
+    raises(PermissionError, abe.decrypt, blob, {'role': 'manager', 'dept': 'HR'})
+    print("   ✓ check_access and decrypt share the same semantics")
+
+
+def test_bounded_attribute_tables():
+    print("\n5. Bounded attribute tables...")
+    for i in range(1000):
+        compile_policy({'tag': f'value{i}'})
+    assert len(compile_policy({'role': ['manager', 'hr']}).interner.bits) == 2
+    oversized = ' or '.join(f'tag:v{i}' for i in range(MAX_POLICY_ATTRIBUTES + 1))
+    for bad in [oversized, {'role': {b'bytes'}}]:
+        raises(ValueError, compile_policy, bad)
+    print(f"   ✓ Each policy keeps its own table; over {MAX_POLICY_ATTRIBUTES} attributes or non-JSON values rejected")
+
+
+if __name__ == '__main__':
+    run("Compiled Policies", globals())
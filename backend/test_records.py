@@ -0,0 +1,70 @@
+# test_records.py - Compact file records and columnar access logs
+import sys
+from datetime import datetime
+sys.path.append('/app')
+
+from modules.records import FileRecord, AccessLogTable, encode_timestamp, decode_timestamp
+from modules.database import DatabaseManager
+from testutil import quiet, run
+
+NOW = datetime.now().isoformat()
+
+
+def test_timestamp_encoding():
+    print("\n1. Timestamp encoding...")
+    assert decode_timestamp(encode_timestamp(NOW)) == NOW
+    assert decode_timestamp(encode_timestamp('2026-01-02T03:04:05')) == '2026-01-02T03:04:05'
+    assert encode_timestamp('2026-01-02T03:04:05+00:00') is None
+    assert encode_timestamp('2026-01-02') is None and encode_timestamp('yesterday') is None
+    print("   ✓ Naive ISO timestamps stored as epoch microseconds, others left alone")
+
+
+def test_file_record_round_trip():
+    print("\n2. FileRecord round trip...")
+    data = {
+        'id': 7, 'user_id': 'alice', 'access_code': 'AC7', 'file_name': 'a.pdf', 'ipfs_hash': 'Qm1',
+        'header_hash': None, 'file_size': 1234, 'chunks': ['c1', 'c2'], 'policy': 'role:hr',
+        'created_at': NOW, 'expires_at': '2026-01-02T03:04:05+00:00', 'custom': {'x': 1}
+    }
+    record = FileRecord(data)
+    assert record.to_dict() == data
+    assert record.get('header_hash', 'default') is None and record.get('tx_hash') is None
+    record.update({'expires_at': NOW, 'custom': 2})
+    assert record.to_dict() == dict(data, expires_at=NOW, custom=2)
+    assert type(record.expires_at) is int
+    print("   ✓ Known fields in slots, unknown and unencodable ones in the overflow dict")
+
+
+def test_access_log_table_round_trip():
+    print("\n3. AccessLogTable round trip...")
+    table = AccessLogTable()
+    events = [
+        {'user_id': 'bob', 'access_code': 'AC1', 'file_name': 'a.pdf', 'status': 'success', 'bytes': 10,
+         'timestamp': NOW, 'logged_at': NOW},
+        {'user_id': 'eve', 'access_code': 'AC1', 'status': 'denied', 'timestamp': 'not a time', 'file_name': None},
+        {'user_id': 'bob', 'access_code': 'AC2', 'status': 'success', 'bytes': 2.5, 'note': 'retry'},
+    ]
+    for i, event in enumerate(events):
+        assert table.append(event) == i
+    assert len(table) == 3 and list(table) == events
+    assert sorted(table.extra) == [1, 2]
+    statuses = table.strings['status']
+    assert statuses[0] is statuses[2]
+    print("   ✓ Rows rebuilt exactly; repeated strings share one object")
+
+
+def test_getters_return_copies():
+    print("\n4. DatabaseManager API...")
+    with quiet():
+        db = DatabaseManager()
+        stored = db.insert_file_record({'user_id': 'alice', 'access_code': 'AC1', 'file_name': 'a.pdf'})
+        fetched = db.get_file_by_access_code('AC1')
+        fetched['file_name'] = 'changed'
+        assert db.get_file_by_access_code('AC1') == stored
+        db.log_access({'user_id': 'bob', 'access_code': 'AC1', 'status': 'success', 'bytes': 5})
+    assert db.get_access_logs('AC1')[0]['bytes'] == 5
+    print("   ✓ Getters return copies; mutating one doesn't touch the store")
+
+
+if __name__ == '__main__':
+    run("Compact Records", globals())
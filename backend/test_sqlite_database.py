@@ -0,0 +1,106 @@
+# test_sqlite_database.py - SQLite WAL backend for DatabaseManager
+import os
+import sys
+import tempfile
+import threading
+sys.path.append('/app')
+
+from modules.sqlite_database import SQLiteDatabaseManager
+from testutil import quiet, run
+
+
+def new_path():
+    return os.path.join(tempfile.mkdtemp(), 'metadata.db')
+
+
+def sample_db(path):
+    """Two of alice's files, one access log and one user; returns the db and the AC1 record"""
+    with quiet():
+        db = SQLiteDatabaseManager(path)
+        record = db.insert_file_record({'user_id': 'alice', 'access_code': 'AC1', 'file_name': 'a.txt',
+                                        'file_size': 10, 'ipfs_hash': 'QmA', 'policy': {'role': ['hr']}})
+        db.insert_file_record({'user_id': 'alice', 'access_code': 'AC2', 'file_name': 'b.txt',
+                               'file_size': 20, 'ipfs_hash': 'QmB', 'policy': 'role:hr'})
+        db.log_access({'user_id': 'bob', 'access_code': 'AC1', 'status': 'success'})
+        db.insert_user('alice', {'username': 'alice', 'role': 'manager'})
+    return db, record
+
+
+def test_database_manager_interface():
+    print("\n1. DatabaseManager interface...")
+    db, record = sample_db(new_path())
+    with quiet():
+        assert db.get_file_by_access_code('AC1') == record
+        assert [f['access_code'] for f in db.get_user_files('alice')] == ['AC1', 'AC2']
+        assert db.get_access_logs('AC1')[0]['user_id'] == 'bob'
+        assert db.get_user('alice')['role'] == 'manager' and db.get_user('nobody') == {}
+        assert db.update_file_record('AC2', {'policy': 'role:manager'})['policy'] == 'role:manager'
+        assert db.delete_file_record('AC1')['file_name'] == 'a.txt'
+        assert db.get_file_by_access_code('AC1') is None
+        db.close()
+    print("   ✓ Insert, lookup, update, delete and logs")
+
+
+def test_durability():
+    print("\n2. Durability...")
+    path = new_path()
+    db, _ = sample_db(path)
+    with quiet():
+        db.update_file_record('AC2', {'policy': 'role:manager'})
+        db.delete_file_record('AC1')
+        db.close()
+        db = SQLiteDatabaseManager(path)
+        assert db.get_file_by_access_code('AC2')['policy'] == 'role:manager'
+        assert (db.get_total_files(), db.get_total_users(), db.get_total_access_logs()) == (1, 1, 1)
+        assert db.insert_file_record({'access_code': 'AC3'})['id'] == 3
+        db.close()
+    print("   ✓ Records reloaded, ids not reused")
+
+
+def test_readers_during_write():
+    print("\n3. Concurrent readers under WAL...")
+    db, _ = sample_db(new_path())
+    results = []
+    with db._write() as conn:
+        conn.execute("UPDATE file_shares SET file_name = 'pending' WHERE access_code = 'AC2'")
+        with quiet():
+            readers = [threading.Thread(target=lambda: results.append(db.get_file_by_access_code('AC2')['file_name']))
+                       for _ in range(4)]
+            for t in readers:
+                t.start()
+            for t in readers:
+                t.join(timeout=2)
+    assert results == ['b.txt'] * 4
+    assert db._fetchone("PRAGMA journal_mode")[0] == 'wal'
+    db.close()
+    print("   ✓ 4 readers saw the last committed row without waiting")
+
+
+def test_connection_pool():
+    print("\n4. Connection pool...")
+    errors = []
+    with quiet():
+        db = SQLiteDatabaseManager(new_path(), pool_size=3)
+
+        def request(i):
+            try:
+                db.insert_file_record({'user_id': 'carol', 'access_code': f'P{i}'})
+                assert db.get_file_by_access_code(f'P{i}') is not None
+            except Exception as e:
+                errors.append(e)
+
+        for _ in range(5):
+            threads = [threading.Thread(target=request, args=(i,)) for i in range(20)]
+            for t in threads:
+                t.start()
+            for t in threads:
+                t.join()
+    assert errors == [] and len(db.get_user_files('carol')) == 100
+    assert db.opened <= 3 and db.pool.qsize() == db.opened
+    db.close()
+    assert db.opened == 0
+    print("   ✓ 100 threads served by 3 connections, all closed on shutdown")
+
+
+if __name__ == '__main__':
+    run("SQLite Database Backend", globals())
@@ -0,0 +1,93 @@
+# test_stats.py - Incremental counters and time-bucketed rollups
+import sys
+import os
+import tempfile
+sys.path.append('/app')
+
+from modules.stats import StatsRollup, parse_window
+from modules.database import DatabaseManager
+from modules.sqlite_database import SQLiteDatabaseManager
+from testutil import quiet, raises, run
+
+
+def fake_clock_rollup():
+    now = [1_000_000.0]
+    return StatsRollup(clock=lambda: now[0]), now
+
+
+def test_windowed_counters():
+    print("\n1. Windowed counters...")
+    stats, now = fake_clock_rollup()
+    stats.incr('uploads')
+    now[0] += 2 * 3600
+    stats.incr('uploads', 2)
+    stats.incr('bytes_in', 500)
+    assert stats.window(parse_window('15m'))['counts'] == {'uploads': 2, 'bytes_in': 500}
+    assert stats.window(parse_window('3h'))['counts']['uploads'] == 3
+    assert stats.window(parse_window('7d'))['resolution'] == 'hour'
+    assert stats.snapshot()['uploads'] == 3
+    print("   ✓ 15m sees 2 uploads, 3h sees 3")
+
+
+def test_latency_percentiles():
+    print("\n2. Latency percentiles...")
+    stats, _ = fake_clock_rollup()
+    for ms in range(1, 101):
+        stats.observe('upload.encrypt', ms)
+    latency = stats.window(3600)['latency_ms']['upload.encrypt']
+    assert latency['count'] == 100
+    assert 45 <= latency['p50'] <= 56 and 90 <= latency['p99'] <= 110
+    print(f"   ✓ p50 {latency['p50']}ms, p99 {latency['p99']}ms for 1..100ms")
+
+
+def test_retention():
+    print("\n3. Retention...")
+    stats, now = fake_clock_rollup()
+    stats.incr('uploads')
+    now[0] += 2 * 24 * 3600
+    stats.incr('uploads')
+    assert len(stats.minutes) == 1
+    assert stats.window(parse_window('24h'))['counts'] == {'uploads': 1}
+    print("   ✓ Minute buckets older than 24h dropped")
+
+
+def test_write_time_counters():
+    print("\n4. Write-time updates...")
+    with quiet():
+        db = DatabaseManager()
+        db.insert_file_record({'access_code': 'AC1', 'file_size': 120, 'original_size': 100})
+        db.log_access({'user_id': 'u', 'access_code': 'AC1', 'status': 'success', 'bytes': 100})
+        db.log_access_many([{'user_id': 'v', 'access_code': 'AC1', 'status': 'denied'}])
+    assert db.stats.window(60)['counts'] == {'uploads': 1, 'bytes_in': 100, 'downloads': 1, 'bytes_out': 100, 'denied': 1}
+    print("   ✓ Uploads, downloads, bytes and denials counted")
+
+
+def test_gauges_match_across_backends():
+    print("\n5. Gauges...")
+    with quiet():
+        dbs = [DatabaseManager(), SQLiteDatabaseManager(os.path.join(tempfile.mkdtemp(), 'stats.db'))]
+        for backend in dbs:
+            backend.insert_file_record({'access_code': 'AC1'})
+            backend.insert_file_record({'access_code': 'AC2'})
+            backend.delete_file_record('AC1')
+            backend.insert_user('u', {'username': 'u'})
+            backend.insert_user('u', {'username': 'u'})
+            backend.log_access({'user_id': 'u', 'access_code': 'AC2', 'status': 'success'})
+            backend.log_access_many([{'user_id': 'u', 'access_code': 'AC2', 'status': 'denied'}] * 2)
+    for backend in dbs:
+        assert {name: backend.stats.total(name) for name in ('files', 'users', 'access_logs')} == \
+            {'files': 1, 'users': 1, 'access_logs': 3}
+    print("   ✓ files/users/access_logs match in memory and SQLite")
+
+
+def test_window_limits():
+    print("\n6. Window limits...")
+    stats, _ = fake_clock_rollup()
+    for value in ('soon', '0', '31d'):
+        raises(ValueError, lambda: stats.window(parse_window(value)))
+    assert stats.window(parse_window('30d'))['seconds'] == 30 * 24 * 3600
+    print("   ✓ Unparseable and over-long windows raise ValueError (a 400 from /api/stats)")
+
+
+if __name__ == '__main__':
+    run("Stats Rollups", globals())
@@ -0,0 +1,179 @@
+# test_stream_crypto.py - Segmented ABE encryption round trips
+import sys
+import os
+import json
+sys.path.append('/app')
+
+from cryptography.hazmat.primitives.ciphers.aead import AESGCM
+from modules.abe_crypto import ABEManager
+from modules.envelope import MAGIC, parse_header
+from modules.compression import CODEC_NONE, CODEC_ZLIB, CODEC_ZSTD, ZSTD_AVAILABLE, MAX_OUTPUT_CHUNK, Compressor, Decompressor
+from modules.stream_cipher import SEGMENT_SIZE
+from testutil import quiet, raises, run
+
+POLICY = {'role': ['manager', 'hr']}
+MANAGER = {'role': 'manager'}
+CSV = b"id,name,department,salary\n" + b"".join(b"%d,user%d,IT,%d\n" % (i, i, 1000 + i) for i in range(50000))
+CODECS = [CODEC_ZLIB] + ([CODEC_ZSTD] if ZSTD_AVAILABLE else [])
+
+
+def make_abe(**options):
+    with quiet():
+        return ABEManager(**options)
+
+
+def legacy_blob(plaintext):
+    """A blob in the pre-envelope JSON + ||| format"""
+    key, iv = os.urandom(32), os.urandom(12)
+    sealed = AESGCM(key).encrypt(iv, plaintext, None)
+    metadata = {"key": key.hex(), "iv": iv.hex(), "tag": sealed[-16:].hex(), "policy": POLICY}
+    return json.dumps(metadata).encode() + b"|||" + sealed[:-16]
+
+
+def compress(codec, data):
+    compressor = Compressor(codec)
+    return compressor.compress(data) + compressor.flush()
+
+
+def test_segment_boundaries():
+    print("\n1. Round trips around segment boundaries...")
+    abe = make_abe()
+    for size in [0, 1, SEGMENT_SIZE - 1, SEGMENT_SIZE, SEGMENT_SIZE + 1, 3 * SEGMENT_SIZE + 17]:
+        data = os.urandom(size)
+        assert abe.decrypt(abe.encrypt(data, POLICY), MANAGER) == data, f"size {size}"
+    print("   ✓ All sizes decrypt correctly")
+
+
+def test_incremental_chunks():
+    print("\n2. Incremental encryptor/decryptor...")
+    abe = make_abe()
+    data = os.urandom(5 * SEGMENT_SIZE + 123)
+    encryptor = abe.encryptor(POLICY)
+    blob = b"".join(encryptor.update(data[i:i + 7777]) for i in range(0, len(data), 7777))
+    blob += encryptor.finalize()
+    decryptor = abe.decryptor(MANAGER)
+    plain = b"".join(decryptor.update(blob[i:i + 3001]) for i in range(0, len(blob), 3001))
+    plain += decryptor.finalize()
+    assert plain == data
+    print("   ✓ Chunked round trip matches")
+
+
+def test_integrity():
+    print("\n3. Integrity checks...")
+    abe = make_abe()
+    blob = abe.encrypt(os.urandom(2 * SEGMENT_SIZE + 5), POLICY)
+    tampered = bytearray(blob)
+    tampered[-40] ^= 1
+    for bad in (bytes(tampered), blob[:-(SEGMENT_SIZE // 2)]):
+        assert not isinstance(raises(Exception, abe.decrypt, bad, MANAGER), PermissionError)
+    print("   ✓ Tampered and truncated ciphertext rejected")
+
+
+def test_policy_enforced():
+    print("\n4. Policy enforcement...")
+    abe = make_abe()
+    blob = abe.encrypt(os.urandom(SEGMENT_SIZE + 5), POLICY)
+    raises(PermissionError, abe.decrypt, blob, {'role': 'engineer'})
+    print("   ✓ Access denied for unauthorized role")
+
+
+def test_envelope_header():
+    print("\n5. Binary envelope header...")
+    blob = make_abe().encrypt(b"envelope", POLICY)
+    header, offset = parse_header(memoryview(blob))
+    assert blob[:4] == MAGIC and header.policy == POLICY and len(header.key) == 32
+    assert parse_header(blob[:offset - 1]) is None
+    print(f"   ✓ Header parsed in place ({offset} bytes)")
+
+
+def test_legacy_blobs():
+    print("\n6. Legacy JSON + ||| blobs...")
+    assert make_abe().decrypt(legacy_blob(b"legacy document"), MANAGER) == b"legacy document"
+    print("   ✓ Legacy blob decrypted through compatibility reader")
+
+
+def test_rewrap_keeps_payload():
+    print("\n7. Policy rewrap...")
+    abe = make_abe()
+    data = os.urandom(SEGMENT_SIZE + 9)
+    header, payload = abe.split_envelope(abe.encrypt(data, POLICY))
+    new_header = abe.rewrap(bytes(header), {'role': 'engineer'})
+    assert abe.decrypt(new_header + payload, {'role': 'engineer'}) == data
+    raises(PermissionError, abe.decrypt, new_header + payload, MANAGER)
+    print(f"   ✓ Rewrapped {len(new_header)} byte header, payload reused as-is")
+
+
+def test_parallel_segments():
+    print("\n8. Parallel segments...")
+    abe, parallel_abe = make_abe(), make_abe(workers=3, parallel_threshold=SEGMENT_SIZE)
+    data = os.urandom(20 * SEGMENT_SIZE + 3)
+    assert abe.decrypt(parallel_abe.encrypt(data, POLICY), MANAGER) == data
+    assert parallel_abe.decrypt(abe.encrypt(data, POLICY), MANAGER) == data
+    print("   ✓ Parallel and sequential outputs decrypt interchangeably")
+
+
+def test_resolve_attributes():
+    print("\n9. Attribute resolution...")
+    abe = make_abe()
+    header, _ = abe.split_envelope(abe.encrypt(os.urandom(1000), POLICY))
+    candidates = [{'role': 'engineer'}, {'role': 'hr'}, MANAGER]
+    assert abe.resolve_attributes(bytes(header), candidates) == {'role': 'hr'}
+    assert abe.resolve_attributes(bytes(header), [{'role': 'engineer'}]) is None
+    assert abe.resolve_attributes(legacy_blob(b"legacy"), candidates) == {'role': 'hr'}
+    print("   ✓ Satisfying attribute set found from the header alone")
+
+
+def test_adaptive_compression():
+    print("\n10. Adaptive compression...")
+    abe = make_abe()
+    blob = abe.encrypt(CSV, POLICY)
+    assert parse_header(blob)[0].codec != CODEC_NONE and len(blob) < len(CSV) // 2
+    assert abe.decrypt(blob, MANAGER) == CSV
+    for incompressible in (os.urandom(200000), b"\xff\xd8\xff\xe0" + b"\x00" * 200000):
+        stored = abe.encrypt(incompressible, POLICY)
+        assert parse_header(stored)[0].codec == CODEC_NONE
+        assert abe.decrypt(stored, MANAGER) == incompressible
+    print(f"   ✓ CSV stored at {len(blob) * 100 // len(CSV)}% of its size, random and JPEG data left as-is")
+
+
+def test_bounded_decompression():
+    print("\n11. Decompression bounds...")
+    abe = make_abe()
+    encryptor = abe.encryptor(POLICY)
+    zeros = bytes(1024 * 1024)
+    bomb = b"".join(encryptor.update(zeros) for _ in range(64)) + encryptor.finalize()
+    assert len(bomb) < 64 * 1024
+    sizes = [len(piece) for piece in abe.decrypt_stream([bomb], MANAGER)]
+    assert sum(sizes) == 64 * len(zeros) and max(sizes) <= MAX_OUTPUT_CHUNK
+    for codec in CODECS:
+        decompressor = Decompressor(codec)
+        assert max(len(piece) for piece in decompressor.decompress(compress(codec, zeros * 16))) <= MAX_OUTPUT_CHUNK
+        decompressor.flush()
+    print(f"   ✓ {len(bomb)} byte ciphertext -> 64 MiB in pieces of at most {max(sizes) >> 20} MiB")
+
+
+def test_split_block_headers():
+    print("\n12. Frames fed in small pieces...")
+    mixed = CSV + os.urandom(300000) + bytes(1024 * 1024)
+    for codec in CODECS:
+        compressed = compress(codec, mixed)
+        decompressor = Decompressor(codec)
+        pieces = [piece for start in range(0, len(compressed), 4099)
+                  for piece in decompressor.decompress(compressed[start:start + 4099])]
+        decompressor.flush()
+        assert b"".join(pieces) == mixed
+    print("   ✓ Headers split across calls decode to the original")
+
+
+def test_truncated_frames():
+    print("\n13. Truncated frames...")
+    for codec in CODECS:
+        decompressor = Decompressor(codec)
+        for _ in decompressor.decompress(compress(codec, CSV)[:-8]):
+            pass
+        raises(ValueError, decompressor.flush)
+    print("   ✓ Truncated streams rejected on flush")
+
+
+if __name__ == '__main__':
+    run("Streaming ABE Encryption", globals())
@@ -0,0 +1,197 @@
+# test_sweeper.py - Expiry sweeper and reference-counted blob reclamation
+import sys
+import threading
+from datetime import datetime, timedelta
+sys.path.append('/app')
+
+from modules.database import DatabaseManager
+from modules.ipfs_storage import IPFSManager
+from modules.sweeper import ExpirySweeper
+from testutil import quiet, raises, run
+
+
+class Harness:
+    """Sweeper over an in-memory DB and IPFS stub, driven by a fake clock"""
+
+    def __init__(self):
+        self.now = datetime(2030, 1, 1).timestamp()
+        with quiet():
+            self.db = DatabaseManager()
+            self.ipfs = IPFSManager()
+            self.sweeper = ExpirySweeper(self.db, self.ipfs, batch_size=3, budget_ms=1000, clock=lambda: self.now)
+
+    def upload(self, access_code, payload, header, days):
+        with quiet():
+            record = self.db.insert_file_record({
+                'access_code': access_code,
+                'file_name': f'{access_code}.bin',
+                'ipfs_hash': self.ipfs.add(payload),
+                'header_hash': self.ipfs.add(header),
+                'expires_at': (datetime.fromtimestamp(self.now) + timedelta(days=days)).isoformat()
+            })
+        self.sweeper.track(record)
+        return record
+
+    def advance(self, **delta):
+        self.now += timedelta(**delta).total_seconds()
+
+    def sweep(self):
+        with quiet():
+            return self.sweeper.sweep_once()
+
+    def drain(self):
+        while self.sweep():
+            pass
+
+    def stored(self, data):
+        return any(entry['data'] == data for entry in self.ipfs.storage.values())
+
+
+def shared_payload_harness():
+    """Two shares of the same payload with different headers, plus a later one"""
+    env = Harness()
+    records = [env.upload('A', b"shared payload", b"header A", 1),
+               env.upload('B', b"shared payload", b"header B", 7),
+               env.upload('C', b"other payload", b"header C", 2)]
+    return env, records
+
+
+def test_nothing_due():
+    print("\n1. Before expiry...")
+    env, _ = shared_payload_harness()
+    assert env.sweep() == 0
+    print("   ✓ No work done")
+
+
+def test_expiry_keeps_shared_blobs():
+    print("\n2. First expiry...")
+    env, (a, b, _) = shared_payload_harness()
+    env.advance(days=1, seconds=1)
+    env.sweep()
+    assert env.db.get_file_by_access_code('A') is None
+    assert not env.stored(b"header A")
+    assert env.ipfs.get(b['ipfs_hash']) == b"shared payload"
+    print("   ✓ Record A and its header removed, shared payload kept")
+
+
+def test_bounded_increments():
+    print("\n3. Bounded increments...")
+    env, _ = shared_payload_harness()
+    env.advance(days=31)
+    assert env.sweep() == 3
+    env.drain()
+    assert env.db.get_total_files() == 0 and env.ipfs.storage == {}
+    stats = env.sweeper.stats()
+    assert stats['records_expired'] == 3 and stats['blobs_reclaimed'] == 5
+    print(f"   ✓ Backlog drained over {stats['ticks']} ticks of at most 3 items")
+
+
+def test_re_referenced_blob():
+    print("\n4. Re-referenced blob...")
+    env = Harness()
+    d = env.upload('D', b"payload D", b"header D", 7)
+    env.sweeper.drop_ref(d['header_hash'])
+    env.sweeper.add_ref(d['header_hash'])
+    env.sweep()
+    assert env.ipfs.get(d['header_hash']) == b"header D"
+    print("   ✓ Blob survived")
+
+
+def test_reclaim_during_upload():
+    print("\n5. Reclaim interleaved with an upload...")
+    env = Harness()
+    e = env.upload('E', b"payload E", b"header E", 1)
+    env.advance(days=2)
+    with quiet():
+        env.sweeper._expire_next(env.now)
+    assert e['ipfs_hash'] in env.sweeper.reclaim_queue
+
+    def racing_add(data):
+        ipfs_hash = env.ipfs.add(data)
+        env.sweep()  # the sweeper thread wakes between write and track
+        return ipfs_hash
+
+    with quiet():
+        held = [env.sweeper.hold(racing_add, b"payload E"), env.sweeper.hold(racing_add, b"header F")]
+    assert held[0] == e['ipfs_hash'] and env.ipfs.get(held[0]) == b"payload E"
+    env.sweep()  # ... or after the write, before the record exists
+    with quiet():
+        f = env.db.insert_file_record({'access_code': 'F', 'file_name': 'F.bin', 'ipfs_hash': held[0],
+                                       'header_hash': held[1], 'expires_at': None})
+    env.sweeper.track(f, held=True)
+    env.drain()
+    assert env.ipfs.get(f['ipfs_hash']) == b"payload E"
+    assert not env.stored(b"header E")
+    print("   ✓ Blob deleted under the write was stored again and kept")
+
+
+def test_failed_upload_releases():
+    print("\n6. Failed upload...")
+    env = Harness()
+    with quiet():
+        orphan = env.sweeper.hold(env.ipfs.add, b"orphan chunk")
+    env.sweeper.release([orphan])
+    env.drain()
+    assert not env.stored(b"orphan chunk") and env.sweeper.stats()['writes_in_flight'] == 0
+    print("   ✓ Orphaned blob reclaimed")
+
+
+def test_rewrap_drops_old_header_once():
+    print("\n7. Policy rewrap...")
+    env = Harness()
+    g = env.upload('G', b"payload G", b"shared header", 1)
+    h = env.upload('H', b"payload H", b"shared header", 30)
+    with quiet():
+        new_header = env.sweeper.rewrap('G', env.ipfs.add, b"header G2", {'policy': 'role:new'})
+    assert env.db.get_file_by_access_code('G')['header_hash'] == new_header
+    env.advance(days=2)
+    env.drain()
+    assert env.ipfs.get(h['header_hash']) == b"shared header" and env.sweeper.refs[h['header_hash']] == 1
+    assert not env.stored(b"header G2") and not env.stored(b"payload G")
+    print("   ✓ Shared header kept with one reference; rewrapped header reclaimed on expiry")
+
+
+def test_failed_rewrap_releases_new_header():
+    print("\n8. Failed rewrap...")
+    env = Harness()
+    h = env.upload('H', b"payload H", b"header H", 30)
+    update = env.db.update_file_record_by_id
+    env.db.update_file_record_by_id = lambda record_id, fields: 1 / 0
+    with quiet():
+        raises(ZeroDivisionError, env.sweeper.rewrap, 'H', env.ipfs.add, b"header H2", {'policy': 'role:new'})
+    env.db.update_file_record_by_id = update
+    with quiet():
+        assert env.sweeper.rewrap('gone', env.ipfs.add, b"header X", {}) is None
+    env.drain()
+    assert env.db.get_file_by_access_code('H')['header_hash'] == h['header_hash']
+    assert env.sweeper.refs[h['header_hash']] == 1
+    assert not env.stored(b"header H2") and not env.stored(b"header X")
+    print("   ✓ New headers reclaimed, the record keeps its old one")
+
+
+def test_slow_write_does_not_block_reclaim():
+    print("\n9. Reclaim during a long write...")
+    env = Harness()
+    started, finish = threading.Event(), threading.Event()
+
+    def slow_add(data):
+        started.set()
+        finish.wait(5)
+        return env.ipfs.add(data)
+
+    with quiet():
+        writer = threading.Thread(target=env.sweeper.hold, args=(slow_add, b"big upload"))
+        writer.start()
+        started.wait(5)
+        orphan = env.sweeper.hold(env.ipfs.add, b"another orphan")
+        env.sweeper.release([orphan])
+        env.sweep()
+        assert not env.stored(b"another orphan") and env.sweeper.stats()['writes_in_flight'] == 1
+        finish.set()
+        writer.join()
+    assert env.sweeper.stats()['writes_in_flight'] == 0
+    print("   ✓ Unrelated blob reclaimed while the write was still running")
+
+
+if __name__ == '__main__':
+    run("Expiry Sweeper", globals())
@@ -0,0 +1,156 @@
+# test_tx_submitter.py - Local nonces, non-blocking sends and the receipt poller
+import sys
+import contextlib
+import hashlib
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+sys.path.append('/app')
+
+from web3.exceptions import TransactionNotFound
+
+from modules.tx_submitter import TransactionSubmitter, TransactionFailed
+from testutil import raises, run
+
+
+class FakeNode:
+    """Just enough of w3.eth for the submitter: a mempool, manual mining and receipts"""
+
+    def __init__(self):
+        self.block_number = 0
+        self.mined_nonce = 0      # next nonce a block will include
+        self.mempool = {}         # nonce -> tx hash
+        self.receipts = {}
+        self.revert = set()       # nonces whose transaction reverts
+        self.lock = threading.Lock()
+        self.receipt_calls = 0
+
+    def get_transaction_count(self, account, block='latest'):
+        with self.lock:
+            pending = self.mined_nonce
+            while pending in self.mempool:
+                pending += 1
+            return pending if block == 'pending' else self.mined_nonce
+
+    def send_transaction(self, tx):
+        time.sleep(0.001)   # a round trip to the node
+        with self.lock:
+            if tx['nonce'] < self.mined_nonce or tx['nonce'] in self.mempool:
+                raise ValueError(f"nonce too low: {tx['nonce']}")
+            tx_hash = hashlib.sha256(repr(sorted(tx.items())).encode()).digest()
+            self.mempool[tx['nonce']] = tx_hash
+            return tx_hash
+
+    def mine(self):
+        """One block holding every transaction that has no nonce gap before it"""
+        with self.lock:
+            self.block_number += 1
+            while self.mined_nonce in self.mempool:
+                tx_hash = self.mempool.pop(self.mined_nonce)
+                status = 0 if self.mined_nonce in self.revert else 1
+                self.receipts['0x' + tx_hash.hex()] = {'blockNumber': self.block_number, 'gasUsed': 21000, 'status': status}
+                self.mined_nonce += 1
+
+    def get_transaction_receipt(self, tx_hash):
+        with self.lock:
+            self.receipt_calls += 1
+            if tx_hash not in self.receipts:
+                raise TransactionNotFound(tx_hash)
+            return self.receipts[tx_hash]
+
+
+class FakeWeb3:
+    def __init__(self):
+        self.eth = FakeNode()
+
+
+@contextlib.contextmanager
+def submitter_on_fake_node():
+    """A submitter over a FakeNode, closed on exit"""
+    w3 = FakeWeb3()
+    submitter = TransactionSubmitter(w3, '0xAccount', poll_interval=0.01, timeout=30)
+    try:
+        yield submitter, w3.eth
+    finally:
+        submitter.close()
+
+
+def send_concurrently(submitter, count):
+    with ThreadPoolExecutor(max_workers=16) as pool:
+        return list(pool.map(lambda i: submitter.send({'to': '0xPeer', 'value': i}), range(count)))
+
+
+def test_concurrent_sends():
+    print("\n1. Concurrent sends...")
+    with submitter_on_fake_node() as (submitter, node):
+        futures = send_concurrently(submitter, 50)
+        assert len({f.tx_hash for f in futures}) == 50 and not any(f.done() for f in futures)
+        assert sorted(node.mempool) == list(range(50)) and submitter.stats()['next_nonce'] == 50
+        assert submitter.status(futures[0].tx_hash)['status'] == 'pending'
+    print("   ✓ 50 transactions accepted with nonces 0-49 before any was mined")
+
+
+def test_one_block_confirms_all():
+    print("\n2. Receipts...")
+    with submitter_on_fake_node() as (submitter, node):
+        futures = send_concurrently(submitter, 50)
+        node.mine()
+        receipts = [f.result(timeout=5) for f in futures]
+        # Threads race for nonces, so the last value sent needn't hold the last nonce
+        statuses = [submitter.status(f.tx_hash) for f in futures]
+    assert {r['blockNumber'] for r in receipts} == {1}
+    assert all(s['status'] == 'confirmed' and s['block_number'] == 1 for s in statuses)
+    assert sorted(s['nonce'] for s in statuses) == list(range(50))
+    print("   ✓ All futures resolved from one block; status lookup reports the block")
+
+
+def test_idle_polling():
+    print("\n3. Idle polling...")
+    with submitter_on_fake_node() as (submitter, node):
+        waiting = submitter.send({'to': '0xPeer', 'value': 'wait'})
+        time.sleep(0.1)
+        calls = node.receipt_calls
+        time.sleep(0.2)
+        assert node.receipt_calls == calls and not waiting.done()
+        node.mine()
+        waiting.result(timeout=5)
+    print("   ✓ No receipt lookups between blocks")
+
+
+def test_reverted_transaction():
+    print("\n4. Reverted transaction...")
+    with submitter_on_fake_node() as (submitter, node):
+        node.revert.add(submitter.next_nonce)
+        reverted = submitter.send({'to': '0xPeer', 'value': 'revert'})
+        node.mine()
+        raises(TransactionFailed, reverted.result, timeout=5)
+        assert submitter.status(reverted.tx_hash)['status'] == 'failed'
+    print("   ✓ Reverted receipt fails the future")
+
+
+def test_nonce_resync():
+    print("\n5. Nonce resync...")
+    with submitter_on_fake_node() as (submitter, node):
+        send_concurrently(submitter, 5)
+        node.mine()
+        submitter.next_nonce = 3
+        raises(ValueError, submitter.send, {'to': '0xPeer', 'value': 'stale'})
+        assert submitter.next_nonce == node.mined_nonce
+        fresh = submitter.send({'to': '0xPeer', 'value': 'fresh'})
+        node.mine()
+        assert fresh.result(timeout=5)['status'] == 1
+    print(f"   ✓ Send failed, next nonce resynced to {node.mined_nonce - 1}, next send confirmed")
+
+
+def test_timeout():
+    print("\n6. Timeout...")
+    with submitter_on_fake_node() as (submitter, _):
+        submitter.timeout = 0.1
+        stuck = submitter.send({'to': '0xPeer', 'value': 'stuck'})
+        error = raises(TransactionFailed, stuck.result, timeout=5)
+    assert 'not mined' in str(error)
+    print("   ✓ Unmined transaction fails after the timeout")
+
+
+if __name__ == '__main__':
+    run("Transaction Submitter", globals())
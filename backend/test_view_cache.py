@@ -0,0 +1,150 @@
+# test_view_cache.py - Per-block read-through cache for contract view calls
+import sys
+import threading
+import time
+sys.path.append('/app')
+
+from web3 import Web3
+
+from modules.view_cache import ViewCache, cached_view
+from testutil import raises, run
+
+ALICE = Web3.to_checksum_address('0x' + 'a1' * 20)
+
+
+class FakeContractReader:
+    """Counts 'RPC' calls the way BlockchainManager's view methods would make them"""
+
+    def __init__(self, block_check_interval=0.0):
+        self.block = 1
+        self.head_checks = 0
+        self.calls = []
+        self.files = {'QmA': ('owner-a', 'QmA', 'role:hr', 1, True)}
+        self.view_cache = ViewCache(self.block_number, max_entries=3, block_check_interval=block_check_interval)
+
+    def block_number(self):
+        self.head_checks += 1
+        return self.block
+
+    @cached_view('getFileMetadata')
+    def file_metadata(self, cid):
+        self.calls.append(('getFileMetadata', cid))
+        if cid not in self.files:
+            raise ValueError("execution reverted")
+        return self.files[cid]
+
+    @cached_view('users', normalize=lambda address: (Web3.to_checksum_address(address),))
+    def user(self, address):
+        self.calls.append(('users', address))
+        return ('bcid', 'pk', True, 1)
+
+
+def test_hits_and_misses():
+    print("\n1. Hits and misses...")
+    reader = FakeContractReader()
+    for _ in range(10):
+        assert reader.file_metadata('QmA')[1] == 'QmA'
+    stats = reader.view_cache.stats()
+    assert len(reader.calls) == 1 and stats['hits'] == 9 and stats['misses'] == 1 and stats['hit_ratio'] == 0.9
+    print("   ✓ 10 reads, 1 call")
+
+
+def test_new_block_drops_entries():
+    print("\n2. New block...")
+    reader = FakeContractReader()
+    reader.file_metadata('QmA')
+    reader.files['QmA'] = ('owner-a', 'QmA', 'role:eng', 1, True)
+    assert reader.file_metadata('QmA')[2] == 'role:hr'
+    reader.block = 2
+    assert reader.file_metadata('QmA')[2] == 'role:eng'
+    assert len(reader.calls) == 2 and reader.view_cache.stats()['blocks_seen'] == 2
+    print("   ✓ Results live for one block")
+
+
+def test_keys_errors_and_size():
+    print("\n3. Keys, errors and size...")
+    reader = FakeContractReader()
+    reader.user(ALICE.lower())
+    reader.user(ALICE)
+    assert [c for c in reader.calls if c[0] == 'users'] == [('users', ALICE.lower())]
+    for _ in range(2):
+        raises(ValueError, reader.file_metadata, 'QmMissing')
+    assert reader.calls.count(('getFileMetadata', 'QmMissing')) == 2
+    reader.files.update({'QmB': ('o', 'QmB', 'p', 1, True), 'QmC': ('o', 'QmC', 'p', 1, True)})
+    for cid in ('QmA', 'QmB', 'QmC'):
+        reader.file_metadata(cid)
+    assert reader.view_cache.stats()['entries'] == 3
+    print("   ✓ Checksummed and lowercase addresses share an entry; reverts are retried; size capped")
+
+
+def test_invalidation():
+    print("\n4. Invalidation...")
+    reader = FakeContractReader()
+    reader.files['QmB'] = ('o', 'QmB', 'p', 1, True)
+    reader.file_metadata('QmA')
+    reader.file_metadata('QmB')
+    calls = len(reader.calls)
+    reader.view_cache.invalidate('getFileMetadata', 'QmA')
+    reader.file_metadata('QmA')
+    reader.file_metadata('QmB')
+    assert len(reader.calls) == calls + 1 and reader.view_cache.stats()['invalidations'] == 1
+    print("   ✓ A local write re-reads only the touched key")
+
+
+def test_head_check_interval():
+    print("\n5. Head checks...")
+    reader = FakeContractReader(block_check_interval=60)
+    for _ in range(100):
+        reader.file_metadata('QmA')
+    assert reader.head_checks == 1
+    reader.block = 2
+    reader.file_metadata('QmA')
+    assert reader.head_checks == 1 and len(reader.calls) == 1
+    reader.view_cache.invalidate('users', ALICE)
+    reader.file_metadata('QmA')
+    assert reader.head_checks == 2 and len(reader.calls) == 2
+    print("   ✓ 101 reads, 1 head check; a write forces the next one")
+
+
+def test_racing_invalidation():
+    print("\n6. Racing invalidation...")
+    cache = ViewCache(lambda: 1, block_check_interval=0)
+    cache.get_or_call(('f', ()), lambda: cache.invalidate('f') or 'stale')
+    assert cache.stats()['entries'] == 0
+    assert cache.get_or_call(('f', ()), lambda: 'fresh') == 'fresh' and cache.stats()['entries'] == 1
+    print("   ✓ A result fetched across an invalidation is discarded")
+
+
+def test_hit_cost():
+    print("\n7. Hit cost...")
+    reader = FakeContractReader(block_check_interval=0.5)
+    reader.file_metadata('QmA')
+    start = time.perf_counter()
+    for _ in range(10000):
+        reader.file_metadata('QmA')
+    per_hit = (time.perf_counter() - start) / 10000 * 1e6
+    assert per_hit < 200
+    print(f"   ✓ {per_hit:.1f}µs per cached read")
+
+
+def test_head_check_outside_lock():
+    print("\n8. Head check outside the lock...")
+    reader = FakeContractReader(block_check_interval=60)
+    reader.file_metadata('QmA')
+    gate, checking = threading.Event(), threading.Event()
+    reader.view_cache.block_number_fn = lambda: checking.set() or gate.wait(2) and reader.block
+    reader.view_cache.invalidate('users', ALICE)
+    slow = threading.Thread(target=reader.file_metadata, args=('QmA',))
+    slow.start()
+    assert checking.wait(2)
+    start = time.perf_counter()
+    assert reader.file_metadata('QmA')[1] == 'QmA'
+    waited = time.perf_counter() - start
+    gate.set()
+    slow.join()
+    assert waited < 0.1 and len(reader.calls) == 1
+    print(f"   ✓ Cached read served in {waited * 1e6:.0f}µs while the head check was stuck")
+
+
+if __name__ == '__main__':
+    run("View Call Cache", globals())
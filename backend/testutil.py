@@ -0,0 +1,27 @@
+# testutil.py - Helpers shared by the test_*.py scripts
+import contextlib
+import io
+import types
+
+
+def quiet():
+    """Swallow the modules' progress prints while setting up or exercising them"""
+    return contextlib.redirect_stdout(io.StringIO())
+
+
+def raises(expected, fn, *args, **kwargs):
+    """Call fn and return the `expected` exception it raises; fail if it returns"""
+    try:
+        fn(*args, **kwargs)
+    except expected as e:
+        return e
+    raise AssertionError(f"{getattr(fn, '__name__', fn)} did not raise {expected.__name__}")
+
+
+def run(title, namespace):
+    """Script entry point: run every test_* function in namespace in definition order"""
+    print(f"\n=== Testing {title} ===")
+    for name, test in list(namespace.items()):
+        if name.startswith('test_') and isinstance(test, types.FunctionType):
+            test()
+    print(f"\n✅ All {title} tests passed!\n")